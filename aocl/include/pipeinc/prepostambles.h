@@ -0,0 +1,70 @@
+/* ********************************************************************************************* */
+/* * Example of pre/postamble functions checking iterations of a pipelined loop                * */
+/* * Author: André Bannwart Perina                                                             * */
+/* ********************************************************************************************* */
+/* * Copyright (c) 2017 André B. Perina                                                        * */
+/* *                                                                                           * */
+/* * Permission is hereby granted, free of charge, to any person obtaining a copy of this      * */
+/* * software and associated documentation files (the "Software"), to deal in the Software     * */
+/* * without restriction, including without limitation the rights to use, copy, modify,        * */
+/* * merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        * */
+/* * permit persons to whom the Software is furnished to do so, subject to the following       * */
+/* * conditions:                                                                               * */
+/* *                                                                                           * */
+/* * The above copyright notice and this permission notice shall be included in all copies     * */
+/* * or substantial portions of the Software.                                                  * */
+/* *                                                                                           * */
+/* * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       * */
+/* * INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  * */
+/* * PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE * */
+/* * FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      * */
+/* * OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    * */
+/* * DEALINGS IN THE SOFTWARE.                                                                 * */
+/* ********************************************************************************************* */
+
+int gIssued;
+int gRetired;
+int gInconsistent;
+
+#define PREAMBLE(a, aSz, b, bSz, bC, bCSz, off, b2, b2Sz, c, cSz, cC, cCSz) {\
+	int _i;\
+\
+	gIssued = 0;\
+	gRetired = 0;\
+	gInconsistent = 0;\
+\
+	off = 0;\
+	for(_i = 0; _i < aSz; _i++)\
+		a[_i] = _i;\
+}
+
+/* Each iteration gets its own inputs. With pipeline, it is issued before the previous ones are retired */
+#define LOOPPREAMBLE(a, aSz, b, bSz, bC, bCSz, off, b2, b2Sz, c, cSz, cC, cCSz, loopFlag) {\
+	int _i;\
+\
+	off++;\
+	for(_i = 0; _i < aSz; _i++)\
+		a[_i]++;\
+	for(_i = 0; _i < b2Sz; _i++)\
+		b2[_i] = 2 * a[_i];\
+\
+	loopFlag = (++gIssued < 16);\
+}
+
+/* Outputs of each iteration must match the inputs it was issued with */
+#define LOOPPOSTAMBLE(a, aSz, b, bSz, bC, bCSz, off, b2, b2Sz, c, cSz, cC, cCSz, loopFlag) {\
+	int _i;\
+\
+	for(_i = 0; _i < bSz; _i++) {\
+		if(b[_i] != a[_i] + off)\
+			gInconsistent++;\
+		if(c[_i] != b2[_i] + 1)\
+			gInconsistent++;\
+	}\
+\
+	gRetired++;\
+}
+
+#define POSTAMBLE(a, aSz, b, bSz, bC, bCSz, off, b2, b2Sz, c, cSz, cC, cCSz) {\
+	printf("%d iterations retired, %d inconsistent elements\n", gRetired, gInconsistent);\
+}
@@ -0,0 +1,44 @@
+/* ********************************************************************************************* */
+/* * Example kernel 3                                                                           * */
+/* * Author: André Bannwart Perina                                                             * */
+/* ********************************************************************************************* */
+/* * Copyright (c) 2017 André B. Perina                                                        * */
+/* *                                                                                           * */
+/* * Permission is hereby granted, free of charge, to any person obtaining a copy of this      * */
+/* * software and associated documentation files (the "Software"), to deal in the Software     * */
+/* * without restriction, including without limitation the rights to use, copy, modify,        * */
+/* * merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        * */
+/* * permit persons to whom the Software is furnished to do so, subject to the following       * */
+/* * conditions:                                                                               * */
+/* *                                                                                           * */
+/* * The above copyright notice and this permission notice shall be included in all copies     * */
+/* * or substantial portions of the Software.                                                  * */
+/* *                                                                                           * */
+/* * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       * */
+/* * INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  * */
+/* * PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE * */
+/* * FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      * */
+/* * OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    * */
+/* * DEALINGS IN THE SOFTWARE.                                                                 * */
+/* ********************************************************************************************* */
+
+/**
+ * @brief This is an example kernel, as referenced in pipeinc.xml. It adds an offset to a vector.
+ * @param a Operand.
+ * @param b Resulting vector.
+ * @param off Offset.
+ */
+__kernel void inc(__global float * restrict a, __global float * restrict b, float off) {
+	int i = get_global_id(0);
+	b[i] = a[i] + off;
+}
+
+/**
+ * @brief This is an example kernel, as referenced in pipeinc.xml. It increments a vector.
+ * @param b2 Operand.
+ * @param c Resulting vector.
+ */
+__kernel void inc2(__global float * restrict b2, __global float * restrict c) {
+	int i = get_global_id(0);
+	c[i] = b2[i] + 1;
+}
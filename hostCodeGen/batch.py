@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Batch Generation of Host Codes                                                            #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import GenerationCache
+from codeemitter import CodeEmitter
+from descriptor import DescriptorError
+
+
+# Generate one host code. job is (xmlFile, targetFile, cacheDir or None, options of CodeEmitter).
+# Returns (xmlFile, targetFile, elapsed seconds, status, error message or None), where status is
+# "generated", "unchanged" (generated, but target already had the same contents) or "cached"
+# (descriptor not changed since last generation, nothing was done)
+def generate(job):
+	xmlFile, targetFile, cacheDir, options = job
+	then = time.perf_counter()
+
+	try:
+		if cacheDir is not None:
+			cache = GenerationCache(cacheDir)
+			key = cache.key(xmlFile, options)
+
+			if cache.isFresh(key, targetFile):
+				return xmlFile, targetFile, time.perf_counter() - then, "cached", None
+
+		ce = CodeEmitter(xmlFile, targetFile, **options)
+		ce.printAll()
+		written = ce.writeTargetFile()
+
+		if cacheDir is not None:
+			cache.store(key, ce.targetFiles())
+	except (DescriptorError, OSError) as e:
+		return xmlFile, targetFile, time.perf_counter() - then, None, str(e)
+	# Any other failure is reported for this descriptor only, instead of aborting the whole batch
+	except Exception as e:
+		return xmlFile, targetFile, time.perf_counter() - then, None, "{}: {}".format(type(e).__name__, e)
+
+	return xmlFile, targetFile, time.perf_counter() - then, "generated" if written else "unchanged", None
+
+
+# Expand command-line specs into jobs for generate(). Each spec is either "KERNELSXML:TARGETFILE"
+# or a (glob of) KERNELSXML, whose target is "<outDir>/<basename of KERNELSXML>.c"
+def expandJobs(specs, outDir=".", cacheDir=None, options=None):
+	options = options or {}
+	jobs = []
+
+	for spec in specs:
+		xmlPattern, sep, targetFile = spec.partition(":")
+
+		if sep:
+			jobs.append((xmlPattern, targetFile, cacheDir, options))
+		else:
+			# Patterns without match are kept, so that the missing file is reported as an error
+			for xmlFile in sorted(glob.glob(xmlPattern)) or [xmlPattern]:
+				stem = os.path.splitext(os.path.basename(xmlFile))[0]
+				jobs.append((xmlFile, os.path.join(outDir, "{}.c".format(stem)), cacheDir, options))
+
+	return jobs
+
+
+# Generate all jobs in parallel using a pool of worker processes. Results are yielded as in generate(),
+# in the same order as jobs
+def generateBatch(jobs, workers=None):
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	workers = max(1, min(workers, len(jobs)))
+
+	# No point in paying for process startup with a single worker
+	if 1 == workers:
+		for job in jobs:
+			yield generate(job)
+	else:
+		# Several descriptors are sent to a worker at once to amortise inter-process communication
+		chunkSize = max(1, len(jobs) // (4 * workers))
+
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			for result in executor.map(generate, jobs, chunksize=chunkSize):
+				yield result
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Benchmark of the Host Code Generator                                                      #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+from cache import generatorDigest
+from codeemitter import CodeEmitter
+
+
+# Kinds of variables in synthetic descriptors:
+#   array: float arrays with K members;
+#   scalar: single float values (passed without buffers);
+#   vector: arrays of K OpenCL vector types (all types known by CodeEmitter, in turns);
+#   forcepointer: single float values passed through buffers;
+#   novalidation: float arrays with K members, outputs without validation.
+CASES = ("array", "scalar", "vector", "forcepointer", "novalidation")
+
+
+# Write a synthetic descriptor with nKernels kernels of nArgs arguments (half inputs, half outputs),
+# each array carrying nElements inline members
+def writeDescriptor(xmlFile, case, nKernels, nArgs, nElements):
+	vectorTypes = sorted(CodeEmitter._vectorTypes.items())
+	vectorTypesIt = itertools.cycle(vectorTypes)
+
+	with open(xmlFile, "w") as f:
+		f.write(
+			(
+				'<?xml version="1.0" encoding="utf-8"?>\n'
+				'<kernels binary="program.aocx" profile="yes" preamble="yes" postamble="yes" looppreamble="yes" looppostamble="yes" cleanup="yes">\n'
+			)
+		)
+
+		for i in range(nKernels):
+			f.write(
+				(
+					'	<kernel name="kernel{0}" order="{1}">\n'
+					'		<ndrange dim="1">\n'
+					'			<global>{2}</global>\n'
+					'		</ndrange>\n'.format(i, i + 1, nElements)
+				)
+			)
+
+			for j in range(nArgs):
+				tag = "input" if j < (nArgs + 1) // 2 else "output"
+				attrib = 'name="k{}v{}" arg="{}"'.format(i, j, j)
+
+				if "scalar" == case:
+					attrib += ' type="float" nmemb="1"'
+					data = "{}.5".format(j)
+				elif "forcepointer" == case:
+					attrib += ' type="float" nmemb="1" forcepointer="true"'
+					data = "{}.5".format(j)
+				elif "vector" == case:
+					type, (nLanes, _) = next(vectorTypesIt)
+					attrib += ' type="{}" nmemb="{}"'.format(type, nElements)
+					member = "{{{}}}".format(", ".join(str(l) for l in range(nLanes)))
+					data = ", ".join(itertools.repeat(member, nElements))
+				else:
+					attrib += ' type="float" nmemb="{}"'.format(nElements)
+					data = ", ".join(str(x % 1000) for x in range(nElements))
+
+				if "output" == tag:
+					if "novalidation" == case:
+						attrib += ' novalidation="true"'
+						data = None
+					else:
+						attrib += ' epsilon="0.001"'
+
+				if data is None:
+					f.write(
+						'		<{} {} />\n'.format(tag, attrib)
+					)
+				else:
+					f.write(
+						'		<{0} {1}>{2}</{0}>\n'.format(tag, attrib, data)
+					)
+
+			f.write(
+				'	</kernel>\n'
+			)
+
+		f.write(
+			'</kernels>\n'
+		)
+
+
+# Generate a host code, returning (elapsed seconds, peak RSS in bytes, bytes of all generated files).
+# Runs in a fresh worker process, so that peak memory is not inherited from previous measurements
+def measure(job):
+	xmlFile, targetFile, options = job
+
+	then = time.perf_counter()
+	ce = CodeEmitter(xmlFile, targetFile, **options)
+	ce.printAll()
+	ce.writeTargetFile()
+	elapsed = time.perf_counter() - then
+
+	# ru_maxrss is in kilobytes on Linux, bytes on macOS
+	peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if "darwin" != sys.platform:
+		peakRss *= 1024
+
+	return elapsed, peakRss, sum(os.path.getsize(x) for x in ce.targetFiles())
+
+
+# Run benchmark for every combination of cases, kernels, args and elements. Yields one result dict
+# per combination
+def run(cases, kernels, args, elements, repeat=3, options=None):
+	options = options or {}
+
+	with tempfile.TemporaryDirectory(prefix="hostCodeGenBench") as workDir:
+		xmlFile = os.path.join(workDir, "kernels.xml")
+		targetFile = os.path.join(workDir, "host.c")
+
+		for case, nKernels, nArgs, nElements in itertools.product(cases, kernels, args, elements):
+			writeDescriptor(xmlFile, case, nKernels, nArgs, nElements)
+
+			# One process per repetition: peak memory of a process never goes down
+			with multiprocessing.Pool(processes=1, maxtasksperchild=1) as pool:
+				samples = pool.map(measure, [(xmlFile, targetFile, options)] * repeat, chunksize=1)
+
+			times = [s[0] for s in samples]
+
+			yield {
+				"case": case,
+				"kernels": nKernels,
+				"args": nArgs,
+				"elements": nElements,
+				"descriptorBytes": os.path.getsize(xmlFile),
+				"outputBytes": samples[-1][2],
+				"wallTimeMin": min(times),
+				"wallTimeMean": sum(times) / len(times),
+				"peakRss": max(s[1] for s in samples)
+			}
+
+
+if "__main__" == __name__:
+	parser = argparse.ArgumentParser(
+		prog="benchmark",
+		description="Benchmark host code generation on synthetic descriptors. Every combination of the supplied values is measured."
+	)
+	parser.add_argument("-C", "--cases", nargs="+", choices=CASES, default=list(CASES), help="kinds of variables (default: all)")
+	parser.add_argument("-k", "--kernels", nargs="+", type=int, default=[1, 16], help="numbers of kernels (default: 1 16)")
+	parser.add_argument("-a", "--args", nargs="+", type=int, default=[2, 16], help="numbers of arguments per kernel (default: 2 16)")
+	parser.add_argument("-e", "--elements", nargs="+", type=int, default=[10, 10000], help="numbers of inline members per array (default: 10 10000)")
+	parser.add_argument("-r", "--repeat", type=int, default=3, help="repetitions of each measurement (default: 3)")
+	parser.add_argument("-s", "--stream", action="store_true", help="measure streaming generation (see hostCodeGen -s)")
+	parser.add_argument("-d", "--data-threshold", type=int, metavar="CHARS", default=None, help="measure generation with separate data source (see hostCodeGen -d)")
+	parser.add_argument("-o", "--output", metavar="JSONFILE", default=None, help="write results as JSON to JSONFILE (\"-\" for standard output)")
+	args = parser.parse_args()
+
+	# Options of CodeEmitter
+	options = {}
+	if args.stream:
+		options["streaming"] = True
+	if args.data_threshold is not None:
+		options["dataThreshold"] = args.data_threshold
+
+	results = []
+	log = sys.stderr if "-" == args.output else sys.stdout
+
+	log.write("{:<13} {:>7} {:>5} {:>9} {:>12} {:>12} {:>10} {:>10}\n".format(
+		"case", "kernels", "args", "elements", "xml (B)", "output (B)", "time (s)", "peak (MB)"
+	))
+
+	for r in run(args.cases, args.kernels, args.args, args.elements, args.repeat, options):
+		results.append(r)
+		log.write("{:<13} {:>7} {:>5} {:>9} {:>12} {:>12} {:>10.4f} {:>10.1f}\n".format(
+			r["case"], r["kernels"], r["args"], r["elements"], r["descriptorBytes"], r["outputBytes"],
+			r["wallTimeMin"], r["peakRss"] / (1 << 20)
+		))
+		log.flush()
+
+	if args.output is not None:
+		report = {
+			"generator": generatorDigest(),
+			"python": platform.python_version(),
+			"options": options,
+			"repeat": args.repeat,
+			"results": results
+		}
+
+		if "-" == args.output:
+			json.dump(report, sys.stdout, indent=1)
+			sys.stdout.write("\n")
+		else:
+			with open(args.output, "w") as f:
+				json.dump(report, f, indent=1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Content-Hash Cache of Generated Host Codes                                                #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+import hashlib
+import json
+import os
+import tempfile
+
+import codeemitter
+import descriptor
+
+
+# Digest of the generator itself (computed once). Any change to the modules that shape the generated
+# code works as a new generator version and invalidates all cache entries
+_generatorDigest = None
+
+
+def generatorDigest():
+	global _generatorDigest
+
+	if _generatorDigest is None:
+		h = hashlib.sha256()
+		for module in (codeemitter, descriptor):
+			with open(module.__file__, "rb") as f:
+				h.update(f.read())
+		_generatorDigest = h.hexdigest()
+
+	return _generatorDigest
+
+
+# Cache of generated host codes. Each target has one small entry file in the cache folder holding the
+# key it was generated from, plus the size and mtime that every file written for the target (the
+# target itself and its data source, if any) had right after generation
+class GenerationCache:
+	_cacheDir = ""
+
+
+	def __init__(self, cacheDir):
+		self._cacheDir = cacheDir
+		os.makedirs(self._cacheDir, exist_ok=True)
+
+
+	# Return the key of a generation: hash of the descriptor contents, generator version and options
+	def key(self, xmlFile, options=None):
+		h = hashlib.sha256()
+		h.update(generatorDigest().encode())
+		h.update(repr(sorted((options or {}).items())).encode())
+
+		# Descriptor is hashed in chunks, as it may carry large inline data
+		with open(xmlFile, "rb") as f:
+			for chunk in iter(lambda: f.read(1 << 20), b""):
+				h.update(chunk)
+
+		return h.hexdigest()
+
+
+	def _entryFile(self, targetFile):
+		name = hashlib.sha1(os.path.abspath(targetFile).encode()).hexdigest()
+		return os.path.join(self._cacheDir, "{}.json".format(name))
+
+
+	# Return True if targetFile was generated from key and none of its files was modified since
+	def isFresh(self, key, targetFile):
+		try:
+			with open(self._entryFile(targetFile), "r") as f:
+				entry = json.load(f)
+
+			if entry.get("key") != key or not entry.get("files"):
+				return False
+
+			for fileName, size, mtime in entry["files"]:
+				st = os.stat(fileName)
+				if size != st.st_size or mtime != st.st_mtime_ns:
+					return False
+		except (OSError, ValueError, TypeError):
+			return False
+
+		return True
+
+
+	# Record that targetFiles (already written, the first one being the target) were generated from key
+	def store(self, key, targetFiles):
+		files = []
+		for fileName in targetFiles:
+			st = os.stat(fileName)
+			files.append([os.path.abspath(fileName), st.st_size, st.st_mtime_ns])
+
+		targetFile = targetFiles[0]
+		entry = {"key": key, "target": os.path.abspath(targetFile), "files": files}
+
+		# Entries are replaced atomically, as several batch workers may share the cache folder
+		fd, tmpName = tempfile.mkstemp(dir=self._cacheDir, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "w") as f:
+				json.dump(entry, f)
+			os.replace(tmpName, self._entryFile(targetFile))
+		except BaseException:
+			os.unlink(tmpName)
+			raise
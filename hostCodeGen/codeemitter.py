@@ -25,17 +25,26 @@
 # #############################################################################################
 
 
-import math
-from xml.etree import ElementTree
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import descriptor
+import instrumentation
 
 
 class CodeEmitter:
 	_targetFile = ""
-	_xmlRoot = ()
-	# Type of arguments used in the PRE/POSTAMBLE functions
-	_varTypeList = []
-	# Name of arguments used in the PRE/POSTAMBLE functions
-	_varNameList = []
+	_descriptor = None
+	_out = None
+	# Nodes visited while instrumented (a list, so that it can be shared by counting lists)
+	_nodeCounter = None
+	# Output is copied in chunks of this many characters
+	_chunkSize = 1 << 20
+	# In streaming mode, output is kept in memory until it reaches this many characters
+	_spoolSize = 1 << 24
 	# Mappers between C types and their printf format flags
 	_printfMapper = {
 		"char": "c",
@@ -128,1303 +137,4338 @@ class CodeEmitter:
 	}
 
 
-	def __init__(self, xmlFile, targetFile):
-		self._xmlRoot = ElementTree.parse(xmlFile).getroot()
+	# Sections of the host code, in emission order: (progress message, method, separator after section)
+	_sections = (
+		("Printing header...", "printHeader", False),
+		("Printing queue declarations...", "printQueueDeclarations", False),
+		("Printing program declarations...", "printProgramDeclarations", False),
+		("Printing kernel declarations...", "printKernelDeclarations", False),
+		("Printing last declarations...", "printLastDeclarations", True),
+		("Printing variables declaration...", "printVariablesDeclaration", True),
+		("Printing getPlatformIDs section...", "printGetPlatformIDs", True),
+		("Printing getDevicesIDs section...", "printGetDevicesIDs", True),
+		("Printing createContext section...", "printCreateContext", True),
+		("Printing createCommandQueue sections...", "printCreateCommandQueues", True),
+		("Printing createAndBuildProgram sections...", "printCreateAndBuildProgram", True),
+		("Printing createKernel sections...", "printCreateKernels", True),
+		("Printing createBuffer sections...", "printCreateBuffers", True),
+		("Printing setKernelArgs sections...", "printSetKernelsArgs", True),
+		("Printing loop header...", "printLoopHeader", True),
+		("Printing enqueueKernel sections...", "printEnqueueKernel", True),
+		("Printing enqueueReadBuffer sections...", "printEnqueueReadBuffer", True),
+		("Printing loop footer...", "printLoopFooter", True),
+		("Printing postamble...", "printPostamble", True),
+		("Printing profile section...", "printProfileResults", True),
+		("Printing validation sections...", "printValidation", True),
+		("Printing error goto label...", "printErrorLabel", True),
+		("Printing buffers deallocation sections...", "printFreeBuffers", True),
+		("Printing variable deallocs...", "printFreeVariables", True),
+		("Printing kernels deallocation sections...", "printFreeKernels", True),
+		("Printing program deallocation section...", "printFreeProgram", True),
+		("Printing queues deallocation sections...", "printFreeQueues", True),
+		("Printing last OpenCL deallocs...", "printFreeFinalOpenCL", True),
+		("Printing cleanup function...", "printCleanup", True),
+		("Printing footer...", "printFooter", False)
+	)
+
+
+	# Kernel description is taken from xmlFile, which may be any source accepted by descriptor.load() (a
+	# path, a file object, an XML string or an already parsed Descriptor). targetFile is only needed by
+	# writeTargetFile() and by the data source.
+	# If streaming is True, the XML is parsed incrementally, large inline data is kept in a spool file
+	# instead of memory and the generated code is buffered in a temporary file once it grows large.
+	# If dataThreshold is supplied, inline arrays with at least dataThreshold characters are moved to a
+	# separate data source (see dataTargetFile())
+	def __init__(self, xmlFile, targetFile=None, streaming=False, dataThreshold=None):
+		if dataThreshold is not None and targetFile is None:
+			raise ValueError("a data source requires a target file")
+
+		# XML is parsed only once, all sections are rendered from this model
+		self._descriptor = descriptor.load(xmlFile, streaming)
+		self._out = self._newBuffer(streaming)
 
-		# Clean file
 		self._targetFile = targetFile
-		with open(self._targetFile, "w") as f:
-			pass
+
+		# Variables whose inline data goes to the data source
+		self._dataVariables = []
+		self._dataOut = None
+
+		if dataThreshold is not None:
+			for k in self._descriptor.kernels:
+				for v in k.ioVariables():
+					if v.isPointer and v.text is not None and len(v.text) >= dataThreshold:
+						self._dataVariables.append(v)
+
+			if self._dataVariables:
+				self._dataOut = self._newBuffer(streaming)
+
+		# Type of arguments used in the PRE/POSTAMBLE functions. These lists are per instance, so that
+		# several emitters can live in the same process
+		self._varTypeList = []
+		# Name of arguments used in the PRE/POSTAMBLE functions
+		self._varNameList = []
+
+		# Populate lists of arguments for PRE/POSTAMBLE functions
+		# Variables of a shared buffer are passed once
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if v.isBufferOwner:
+					self._varTypeList.append("{}{}".format(v.type, " *" if v.isPointer else ""))
+					self._varNameList.append(v.name)
+					self._varTypeList.append("unsigned int")
+					self._varNameList.append(v.nmemb)
+
+				if v.isValidated:
+					self._varTypeList.append("{}{}".format(v.type, " *" if v.isPointer else ""))
+					self._varNameList.append("{}C".format(v.name))
+					self._varTypeList.append("unsigned int")
+					self._varNameList.append(v.nmemb)
 
 
-	# Print header: includes, macros and first declarations of main()
-	def printHeader(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'/* ********************************************************************************************* */\n'
-					'/* * C Template for Kernel Execution                                                           * */\n'
-					'/* * Author: André Bannwart Perina                                                             * */\n'
-					'/* ********************************************************************************************* */\n'
-					'/* * Copyright (c) 2017 André B. Perina                                                        * */\n'
-					'/* *                                                                                           * */\n'
-					'/* * Permission is hereby granted, free of charge, to any person obtaining a copy of this      * */\n'
-					'/* * software and associated documentation files (the "Software"), to deal in the Software     * */\n'
-					'/* * without restriction, including without limitation the rights to use, copy, modify,        * */\n'
-					'/* * merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        * */\n'
-					'/* * permit persons to whom the Software is furnished to do so, subject to the following       * */\n'
-					'/* * conditions:                                                                               * */\n'
-					'/* *                                                                                           * */\n'
-					'/* * The above copyright notice and this permission notice shall be included in all copies     * */\n'
-					'/* * or substantial portions of the Software.                                                  * */\n'
-					'/* *                                                                                           * */\n'
-					'/* * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       * */\n'
-					'/* * INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  * */\n'
-					'/* * PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE * */\n'
-					'/* * FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      * */\n'
-					'/* * OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    * */\n'
-					'/* * DEALINGS IN THE SOFTWARE.                                                                 * */\n'
-					'/* ********************************************************************************************* */\n'
-					'\n'
-					'#include <CL/opencl.h>\n'
-					'#include <errno.h>\n'
-					'#include <stdbool.h>\n'
-					'#include <stdio.h>\n'
-					'#include <string.h>\n'
-					'#include <sys/time.h>\n'
-					'\n'
-					'#include "common.h"\n'
-					'\n'
-				)
-			)
-
-			# Populate lists of arguments for PRE/POSTAMBLE functions
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
-
-						if ("input" == v.tag) or ("output" == v.tag):
-							self._varTypeList.append("{}{}".format(v.attrib["type"], " *" if (int(v.attrib["nmemb"]) > 1) or forcePointer else ""))
-							self._varNameList.append(v.attrib["name"])
-							self._varTypeList.append("unsigned int")
-							self._varNameList.append(v.attrib["nmemb"])
-	
-						if ("output" == v.tag) and (("novalidation" not in v.attrib) or (v.attrib["novalidation"] != "true")):
-							self._varTypeList.append("{}{}".format(v.attrib["type"], " *" if (int(v.attrib["nmemb"])  > 1) or forcePointer else ""))
-							self._varNameList.append("{}C".format(v.attrib["name"]))
-							self._varTypeList.append("unsigned int")
-							self._varNameList.append(v.attrib["nmemb"])
-
-			# If any PRE/POSTAMBLE function was enabled, include the respective header
-			if any(x in ["preamble", "postamble", "looppreamble", "looppostamble", "cleanup"] for x in self._xmlRoot.attrib):
-				f.write(
-					(
-						'/**\n'
-						' * @brief Header where pre/postamble macro functions should be located.\n'
-						' *        Function headers:\n'
-					)
-				)
+	# Output buffer: in memory, or spooled to a temporary file once it grows large
+	def _newBuffer(self, streaming):
+		if streaming:
+			return tempfile.SpooledTemporaryFile(max_size=self._spoolSize, mode="w+")
+		else:
+			return io.StringIO()
 
-				functions = ("PREAMBLE", "POSTAMBLE", "LOOPPREAMBLE", "LOOPPOSTAMBLE", "CLEANUP")
-				usesLoopVar = (False, False, True, True, False)
-				for i in range(0, len(functions)):
-					f.write(
-						' *            {}('.format(functions[i])
-					)
 
-					firstExec = True
-					for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
-						if not firstExec:
-							f.write(', ')
-						else:
-							firstExec = False
+	# Print all sections in order. If supplied, callback(message) is called before each section. If stats
+	# (instrumentation.SectionStats) is supplied, elapsed time, bytes emitted and nodes visited are
+	# recorded for each section
+	def printAll(self, callback=None, stats=None):
+		sections = list(self._sections)
+		if self._dataOut is not None:
+			sections.append(("Printing data source...", "printDataSource", False))
 
-						f.write(
-							'{}'.format(v)
-						)
+		if stats is not None:
+			self._beginInstrumentation()
 
-						if int(n) > 1:
-							f.write(
-								', {}Sz'.format(v)
-							)
+		try:
+			for message, section, separator in sections:
+				if callback is not None:
+					callback(message)
 
-					if usesLoopVar[i]:
-						f.write(', loopFlag);\n')
-					else:
-						f.write(');\n')
+				if stats is not None:
+					then = time.perf_counter()
+					nBytes = self._out.count + (self._dataOut.count if self._dataOut is not None else 0)
+					nNodes = self._nodeCounter[0]
+
+				getattr(self, section)()
+
+				if separator:
+					self.printSeparator()
+
+				if stats is not None:
+					nBytes = self._out.count + (self._dataOut.count if self._dataOut is not None else 0) - nBytes
+					stats.add(section, time.perf_counter() - then, nBytes, self._nodeCounter[0] - nNodes)
+		finally:
+			if stats is not None:
+				self._endInstrumentation()
 
-				f.write(
-						' *        where:\n'
-				)
 
-				for i in range(0, len(self._varNameList), 2):
-					f.write(
-						' *            {0}: variable ({1});\n'.format(self._varNameList[i], self._varTypeList[i])
-					)
+	# Replace outputs and kernel/variable lists of the model with counting ones
+	def _beginInstrumentation(self):
+		self._nodeCounter = [0]
+		self._out = instrumentation.CountingWriter(self._out)
+		if self._dataOut is not None:
+			self._dataOut = instrumentation.CountingWriter(self._dataOut)
+
+		self._descriptor.kernels = instrumentation.CountingList(self._descriptor.kernels, self._nodeCounter)
+		for k in self._descriptor.kernels:
+			k.variables = instrumentation.CountingList(k.variables, self._nodeCounter)
+
+
+	# Restore everything replaced by _beginInstrumentation()
+	def _endInstrumentation(self):
+		self._out = self._out.unwrap()
+		if self._dataOut is not None:
+			self._dataOut = self._dataOut.unwrap()
+
+		self._descriptor.kernels = list(self._descriptor.kernels)
+		for k in self._descriptor.kernels:
+			k.variables = list(k.variables)
+
+
+	# Return everything that was printed so far
+	def getSource(self):
+		self._out.seek(0)
+		source = self._out.read()
+		return source
+
+
+	# Copy printed source to a writable object, in chunks
+	def copySource(self, f):
+		self._out.seek(0)
+		shutil.copyfileobj(self._out, f, self._chunkSize)
+
+
+	# Return the data source printed so far (None if no inline data was moved out of the host code)
+	def getDataSource(self):
+		if self._dataOut is None:
+			return None
+
+		self._dataOut.seek(0)
+		source = self._dataOut.read()
+		return source
+
 
-					if int(self._varNameList[i + 1]) > 1:
-						f.write(
-							' *            {}Sz: number of members in variable (unsigned int);\n'.format(self._varNameList[i])
-						)
+	# Name of data source for a target, placed beside it (e.g. "src/host.c" -> "src/hostData.c")
+	@staticmethod
+	def dataTargetFile(targetFile):
+		root, ext = os.path.splitext(targetFile)
+		return "{}Data{}".format(root, ext or ".c")
 
-				f.write(
-					(
-						' *            loopFlag: loop condition variable (bool).\n'
-						' */\n'
-						'#include "prepostambles.h"\n'
-						'\n'
-					)
-				)
 
-			f.write(
-				(
-					'/**\n'
-					' * @brief Test if two operands are outside an epsilon range.\n'
-					' *\n'
-					' * @param a First operand.\n'
-					' * @param b Second operand.\n'
-					' * @param e Epsilon value.\n'
-					' */\n'
-					'#define TEST_EPSILON(a, b, e) (((a > b) && (a - b > e)) || ((b >= a) && (b - a > e)))\n'
-					'\n'
-					'/**\n'
-					' * @brief Standard statements for function error handling and printing.\n'
-					' *\n'
-					' * @param funcName Function name that failed.\n'
-					' */\n'
-					'#define FUNCTION_ERROR_STATEMENTS(funcName) {\\\n'
-					'	rv = EXIT_FAILURE;\\\n'
-					'	PRINT_FAIL();\\\n'
-					'	fprintf(stderr, "Error: %s failed with return code %d.\\n", funcName, fRet);\\\n'
-					'}\n'
-					'\n'
-					'/**\n'
-					' * @brief Standard statements for POSIX error handling and printing.\n'
-					' *\n'
-					' * @param arg Arbitrary string to the printed at the end of error string.\n'
-					' */\n'
-					'#define POSIX_ERROR_STATEMENTS(arg) {\\\n'
-					'	rv = EXIT_FAILURE;\\\n'
-					'	PRINT_FAIL();\\\n'
-					'	fprintf(stderr, "Error: %s: %s\\n", strerror(errno), arg);\\\n'
-					'}\n'
-					'\n'
-					'int main(void) {\n'
-					'	/* Return variable */\n'
-					'	int rv = EXIT_SUCCESS;\n'
-					'\n'
-					'	/* OpenCL and aux variables */\n'
-					'	int i = 0, j = 0;\n'
-					'	cl_int platformsLen, devicesLen, fRet;\n'
-					'	cl_platform_id *platforms = NULL;\n'
-					'	cl_device_id *devices = NULL;\n'
-					'	cl_context context = NULL;\n'
-				)
-			)
+	# Return all files written by writeTargetFile(): the target and, if used, its data source
+	def targetFiles(self):
+		if self._dataOut is None:
+			return [self._targetFile]
 
+		return [self._targetFile, self.dataTargetFile(self._targetFile)]
 
-	# Print queue declarations for each kernel
-	def printQueueDeclarations(self):
-		with open(self._targetFile, "a") as f:
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					f.write(
-						'	cl_command_queue queue{} = NULL;\n'.format(k.attrib["name"].title())
-					)
 
+	# Write inline data (a string or data spilled by streaming parser) directly into output
+	def _writeData(self, text, f=None):
+		if f is None:
+			f = self._out
 
-	# Print variable declarations related to the program
-	def printProgramDeclarations(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'	FILE *programFile = NULL;\n'
-					'	long programSz;\n'
-					'	char *programContent = NULL;\n'
-					'	cl_int programRet;\n'
-					'	cl_program program = NULL;\n'
-				)
-			)
+		if isinstance(text, str):
+			f.write(text)
+		else:
+			text.copyTo(f, self._chunkSize)
 
 
-	# Print kernel declarations
-	def printKernelDeclarations(self):
-		with open(self._targetFile, "a") as f:
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					f.write(
-						'	cl_kernel kernel{} = NULL;\n'.format(k.attrib["name"].title())
-					)
+	# Return True if fileName has exactly the contents of buffer
+	def _fileIsEqual(self, fileName, buffer):
+		try:
+			with open(fileName, "r") as f:
+				buffer.seek(0)
 
+				while True:
+					chunk = buffer.read(self._chunkSize)
+					if not chunk:
+						return not f.read(1)
+					if chunk != f.read(len(chunk)):
+						return False
+		except (OSError, UnicodeDecodeError):
+			return False
+		finally:
+			buffer.seek(0, os.SEEK_END)
 
-	# Print last declarations: some flags and other stuff
-	def printLastDeclarations(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'	bool loopFlag = false;\n'
-					'	bool invalidDataFound = false;\n'
-				)
-			)
 
-			# If profiling is on, add timer variables
-			if "profile" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["profile"]:
-				f.write(
-					(
-						'	long totalTime;\n'
-						'	struct timeval tThen, tNow, tDelta, tExecTime;\n'
-						'	timerclear(&tExecTime);\n'
-					)
-				)
+	# Write buffer to fileName at once. A temporary file is renamed over the old file, so that it is
+	# never left half-written. If the file already has the same contents it is not touched (its mtime
+	# is kept, so make does not rebuild it). Returns True if file was written
+	def _writeFile(self, fileName, buffer):
+		if self._fileIsEqual(fileName, buffer):
+			return False
 
-			# Iterate through every kernel
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						# Search for ndrange tag
-						if "ndrange" == v.tag:
-							# If no dim attribute is present, default it to 1
-							dim = v.attrib["dim"] if "dim" in v.attrib else "1"
-							f.write(
-								'	cl_uint workDim{} = {};\n'.format(k.attrib["name"].title(), dim)
-							)
-	
-							# Set global and local (if any) dimensions
-							for d in v:
-								if "global" == d.tag:
-									f.write(
-										(
-											'	size_t globalSize{}[{}] = {{\n'
-											'		{}\n'
-											'	}};\n'.format(
-												k.attrib["name"].title(),
-												dim,
-												d.text
-											)
-										)
-									)
-								elif "local" == d.tag:
-									f.write(
-										(
-											'	size_t localSize{}[{}] = {{\n'
-											'		{}\n'
-											'	}};\n'.format(
-												k.attrib["name"].title(),
-												dim,
-												d.text
-											)
-										)
-									)
+		targetDir = os.path.dirname(os.path.abspath(fileName))
+		fd, tmpName = tempfile.mkstemp(prefix=".{}.".format(os.path.basename(fileName)), dir=targetDir)
 
+		try:
+			with os.fdopen(fd, "w") as f:
+				buffer.seek(0)
+				shutil.copyfileobj(buffer, f, self._chunkSize)
 
-	# Print a simple newline
-	def printSeparator(self):
-		with open(self._targetFile, "a") as f:
-			f.write('\n')
+			# mkstemp creates the file as 0600: keep permissions of the old file, or use the default ones
+			if os.path.exists(fileName):
+				shutil.copymode(fileName, tmpName)
+			else:
+				umask = os.umask(0)
+				os.umask(umask)
+				os.chmod(tmpName, 0o666 & ~umask)
 
+			os.replace(tmpName, fileName)
+		except BaseException:
+			os.unlink(tmpName)
+			raise
 
-	# Print declaration of inputs and outputs of kernels
-	def printVariablesDeclaration(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				'	/* Input/output variables */\n'
-			)
-
-			# Iterate through every variable of every kernel
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
-
-						if "input" == v.tag:
-							# Part 1: host variable
-							# Function is being used instead of explicit variable initialisation
-							if v.text is None:
-								if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-									f.write(
-										'	{0} *{1} = malloc({2} * sizeof({0}));\n'.format(
-											v.attrib["type"], v.attrib["name"], v.attrib["nmemb"]
-										)
-									)
-								else:
-									f.write(
-										'	{} {};\n'.format(v.attrib["type"], v.attrib["name"])
-									)
-							# Explicit variable initialisation
-							# XXX: Note that big variables may lead to stack overflow!
-							else:
-								if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-									f.write(
-										(
-											'	{} {}[{}] = {{\n'
-											'		{}\n'
-											'	}};\n'.format(v.attrib["type"], v.attrib["name"], v.attrib["nmemb"], v.text)
-										)
-									)
-								else:
-									f.write(
-										'	{} {} = {};\n'.format(v.attrib["type"], v.attrib["name"], v.text)
-									)
-	
-							# Part 2: device variable
-							if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-								f.write(
-									'	cl_mem {}K = NULL;\n'.format(v.attrib["name"])
-								)
-						elif "output" == v.tag:
-							# Part 1: host variable
-							# For output, initialisation data must come from PREAMBLE.
-							if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-								f.write(
-									'	{0} *{1} = malloc({2} * sizeof({0}));\n'.format(
-										v.attrib["type"], v.attrib["name"], v.attrib["nmemb"]
-									)
-								)
-							else:
-								f.write(
-									'	{} {};\n'.format(v.attrib["type"], v.attrib["name"])
-								)
-	
-							# Part 2: validation variable
-							if ("novalidation" not in v.attrib) or (v.attrib["novalidation"] != "true"):
-								# Function is being used instead of explicit validation variable assignment
-								if v.text is None:
-									if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-										f.write(
-											'	{0} *{1}C = malloc({2} * sizeof({0}));\n'.format(
-												v.attrib["type"], v.attrib["name"], v.attrib["nmemb"]
-											)
-										)
-									else:
-										f.write(
-											'	{} {}C;\n'.format(v.attrib["type"], v.attrib["name"])
-										)
-								# Explicit variable assignment
-								# XXX: Note that big variables may lead to stack overflow!
-								else:
-									if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-										f.write(
-											(
-												'	{} {}C[{}] = {{\n'
-												'		{}\n'
-												'	}};\n'.format(v.attrib["type"], v.attrib["name"], v.attrib["nmemb"], v.text)
-											)
-										)
-									else:
-										f.write(
-											'	{} {}C = {};\n'.format(v.attrib["type"], v.attrib["name"], v.text)
-										)
-								# Epsilon variable (if supplied)
-								if "epsilon" in v.attrib:
-									f.write(
-										'	double {}Epsilon = {};\n'.format(v.attrib["name"], v.attrib["epsilon"])
-									)
-	
-							# Part 3: device variable
-							f.write(
-								'	cl_mem {}K = NULL;\n'.format(v.attrib["name"])
-							)
+		return True
 
-			# Call PREAMBLE function if "preamble" attribute is "yes"
-			if "preamble" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["preamble"]:
-				f.write(
-					'\n'
-					'	/* Calling preamble function */\n'
-					'	PRINT_STEP("Calling preamble function...");\n'
-					'	PREAMBLE('
-				)
 
-				# Print arguments
-				firstExec = True
-				for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
-					if not firstExec:
-						f.write(', ')
-					else:
-						firstExec = False
+	# Write printed source to target file (and data source, if used). Each file is only rewritten if its
+	# contents changed, so that changing only inline data rebuilds only the data source. Returns the list
+	# of files that were written (empty, thus false, if none was)
+	def writeTargetFile(self):
+		if self._targetFile is None:
+			raise ValueError("no target file was supplied")
 
-					f.write(v)
+		written = []
 
-					if int(n) > 1:
-						f.write(', {}'.format(n))
+		if self._writeFile(self._targetFile, self._out):
+			written.append(self._targetFile)
 
-				f.write(
-					(
-						');\n'
-						'	PRINT_SUCCESS();\n'
-					)
-				)
+		if self._dataOut is not None and self._writeFile(self.dataTargetFile(self._targetFile), self._dataOut):
+			written.append(self.dataTargetFile(self._targetFile))
 
+		return written
 
-	# Print clGetPlatformIDs section
-	def printGetPlatformIDs(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'	/* Get platforms IDs */\n'
-					'	PRINT_STEP("Getting platforms IDs...");\n'
-					'	fRet = clGetPlatformIDs(0, NULL, &platformsLen);\n'
-					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetPlatformIDs"));\n'
-					'	platforms = malloc(platformsLen * sizeof(cl_platform_id));\n'
-					'	fRet = clGetPlatformIDs(platformsLen, platforms, NULL);\n'
-					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetPlatformIDs"));\n'
-					'	PRINT_SUCCESS();\n'
-				)
+
+	# Print header: includes, macros and first declarations of main()
+	def printHeader(self):
+		f = self._out
+		d = self._descriptor
+
+		f.write(
+			(
+				'/* ********************************************************************************************* */\n'
+				'/* * C Template for Kernel Execution                                                           * */\n'
+				'/* * Author: André Bannwart Perina                                                             * */\n'
+				'/* ********************************************************************************************* */\n'
+				'/* * Copyright (c) 2017 André B. Perina                                                        * */\n'
+				'/* *                                                                                           * */\n'
+				'/* * Permission is hereby granted, free of charge, to any person obtaining a copy of this      * */\n'
+				'/* * software and associated documentation files (the "Software"), to deal in the Software     * */\n'
+				'/* * without restriction, including without limitation the rights to use, copy, modify,        * */\n'
+				'/* * merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        * */\n'
+				'/* * permit persons to whom the Software is furnished to do so, subject to the following       * */\n'
+				'/* * conditions:                                                                               * */\n'
+				'/* *                                                                                           * */\n'
+				'/* * The above copyright notice and this permission notice shall be included in all copies     * */\n'
+				'/* * or substantial portions of the Software.                                                  * */\n'
+				'/* *                                                                                           * */\n'
+				'/* * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       * */\n'
+				'/* * INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  * */\n'
+				'/* * PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE * */\n'
+				'/* * FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      * */\n'
+				'/* * OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    * */\n'
+				'/* * DEALINGS IN THE SOFTWARE.                                                                 * */\n'
+				'/* ********************************************************************************************* */\n'
+				'\n'
 			)
+		)
 
+		# Program file (and data files) are mapped with mmap()
+		includes = [
+			"CL/opencl.h", "errno.h", "fcntl.h", "stdbool.h", "stdio.h", "string.h", "sys/mman.h", "sys/stat.h",
+			"sys/time.h", "unistd.h"
+		]
 
-	# Print clGetDevicesIDs section
-	def printGetDevicesIDs(self):
-		with open(self._targetFile, "a") as f:
-			platformID = '0'
-			for k in self._xmlRoot:
-				if "devinfo" == k.tag:
-					platformID = k.attrib["platform"]
+		# Iteration times (and records of device profiling) are stored in growing arrays
+		if d.isProfiled():
+			includes += ["math.h", "stdlib.h"]
+
+		# Validation computes absolute and relative errors
+		if self._hasValidation():
+			includes += ["math.h"]
+
+		# Digests of outputs are 64-bit
+		if self._hasDigests():
+			includes += ["stdint.h"]
+
+		# Arrays used by their buffers are allocated with posix_memalign()
+		if d.hasMemoryMode("hostptr"):
+			includes += ["stdlib.h"]
 
+		# Program binary cache is keyed by a hash and written through a temporary file
+		if d.binaryCache() is not None:
+			includes += ["stdint.h", "stdlib.h", "sys/stat.h", "sys/types.h", "unistd.h"]
+
+		# Size parameters are parsed from environment and command line
+		if d.params:
+			includes += ["stdlib.h"]
+
+		for inc in sorted(set(includes)):
 			f.write(
-				(
-					'	/* Get devices IDs for first platform availble */\n'
-					'	PRINT_STEP("Getting devices IDs for first platform...");\n'
-					'	fRet = clGetDeviceIDs(platforms[{0}], CL_DEVICE_TYPE_ALL, 0, NULL, &devicesLen);\n'
-					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetDevicesIDs"));\n'
-					'	devices = malloc(devicesLen * sizeof(cl_device_id));\n'
-					'	fRet = clGetDeviceIDs(platforms[{0}], CL_DEVICE_TYPE_ALL, devicesLen, devices, NULL);\n'
-					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetDevicesIDs"));\n'
-					'	PRINT_SUCCESS();\n'.format(platformID)
-				)
+				'#include <{}>\n'.format(inc)
 			)
 
+		f.write(
+			(
+				'\n'
+				'#include "common.h"\n'
+				'\n'
+			)
+		)
 
-	# Print clCreateContext section
-	def printCreateContext(self):
-		with open(self._targetFile, "a") as f:
+		# If any PRE/POSTAMBLE function was enabled, include the respective header
+		if any(x in ["preamble", "postamble", "looppreamble", "looppostamble", "cleanup"] for x in d.attrib):
 			f.write(
 				(
-					'	/* Create context for first available device */\n'
-					'	PRINT_STEP("Creating context...");\n'
-					'	context = clCreateContext(NULL, 1, devices, NULL, NULL, &fRet);\n'
-					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateContext"));\n'
-					'	PRINT_SUCCESS();\n'
+					'/**\n'
+					' * @brief Header where pre/postamble macro functions should be located.\n'
+					' *        Function headers:\n'
 				)
 			)
 
+			functions = ("PREAMBLE", "POSTAMBLE", "LOOPPREAMBLE", "LOOPPOSTAMBLE", "CLEANUP")
+			usesLoopVar = (False, False, True, True, False)
+			for i in range(0, len(functions)):
+				f.write(
+					' *            {}('.format(functions[i])
+				)
+
+				firstExec = True
+				for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
+					if not firstExec:
+						f.write(', ')
+					else:
+						firstExec = False
 
-	# Print clCreateCommandQueues section
-	def printCreateCommandQueues(self):
-		with open(self._targetFile, "a") as f:
-			deviceID = '0'
-			for k in self._xmlRoot:
-				if "devinfo" == k.tag:
-					deviceID = k.attrib["device"]
-
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
 					f.write(
-						(
-							'	/* Create command queue for {0} kernel */\n'
-							'	PRINT_STEP("Creating command queue for \\"{0}\\"...");\n'
-							'	queue{1} = clCreateCommandQueue(context, devices[{2}], 0, &fRet);\n'
-							'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateCommandQueue"));\n'
-							'	PRINT_SUCCESS();\n'.format(k.attrib["name"], k.attrib["name"].title(), deviceID)
-						)
+						'{}'.format(v)
 					)
 
+					if descriptor.isArraySize(n):
+						f.write(
+							', {}Sz'.format(v)
+						)
 
-	# Print clCreateProgramWithBinary and clBuildProgram section
-	def printCreateAndBuildProgram(self):
-		with open(self._targetFile, "a") as f:
-			filename = self._xmlRoot.attrib["source"] if "source" in self._xmlRoot.attrib else self._xmlRoot.attrib["binary"]
+				if usesLoopVar[i]:
+					f.write(', loopFlag);\n')
+				else:
+					f.write(');\n')
 
 			f.write(
-				(
-					'	/* Open binary file */\n'
-					'	PRINT_STEP("Opening program binary...");\n'
-					'	programFile = fopen("{0}", "rb");\n'
-					'	ASSERT_CALL(programFile, POSIX_ERROR_STATEMENTS("{0}"));\n'
-					'	PRINT_SUCCESS();\n'
-					'\n'
-					'	/* Get size and read file */\n'
-					'	PRINT_STEP("Reading program binary...");\n'
-					'	fseek(programFile, 0, SEEK_END);\n'
-					'	programSz = ftell(programFile);\n'
-					'	fseek(programFile, 0, SEEK_SET);\n'
-					'	programContent = malloc(programSz);\n'
-					'	fread(programContent, programSz, 1, programFile);\n'
-					'	fclose(programFile);\n'
-					'	programFile = NULL;\n'
-					'	PRINT_SUCCESS();\n'
-					'\n'.format(filename)
-				)
+					' *        where:\n'
 			)
 
-			if "binary" in self._xmlRoot.attrib:
+			for i in range(0, len(self._varNameList), 2):
 				f.write(
-					(
-						'	/* Create program from binary file */\n'
-						'	PRINT_STEP("Creating program from binary...");\n'
-						'	program = clCreateProgramWithBinary(context, 1, devices, &programSz, (const unsigned char **) &programContent, &programRet, &fRet);\n'
-						'	ASSERT_CALL(CL_SUCCESS == programRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithBinary (when loading binary)"));\n'
-						'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithBinary"));\n'
-						'	PRINT_SUCCESS();\n'
-						'\n'
-					)
+					' *            {0}: variable ({1});\n'.format(self._varNameList[i], self._varTypeList[i])
 				)
-			else:
-				f.write(
-					(
-						'	/* Create program from source file */\n'
-						'	PRINT_STEP("Creating program from source...");\n'
-						'	program = clCreateProgramWithSource(context, 1, (const char **) &programContent, &programSz, &fRet);\n'
-						'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithSource"));\n'
-						'	PRINT_SUCCESS();\n'
-						'\n'
+
+				if descriptor.isArraySize(self._varNameList[i + 1]):
+					f.write(
+						' *            {}Sz: number of members in variable (unsigned int);\n'.format(self._varNameList[i])
 					)
-				)
 
 			f.write(
 				(
-					'	/* Build program */\n'
-					'	PRINT_STEP("Building program...");\n'
-					'	fRet = clBuildProgram(program, 1, devices, NULL, NULL, NULL);\n'
-					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clBuildProgram"));\n'
-					'	PRINT_SUCCESS();\n'
+					' *            loopFlag: loop condition variable (bool).\n'
+					' */\n'
+					'#include "prepostambles.h"\n'
+					'\n'
 				)
 			)
 
+		f.write(
+			(
+				'/**\n'
+				' * @brief Test if two operands are outside an epsilon range.\n'
+				' *\n'
+				' * @param a First operand.\n'
+				' * @param b Second operand.\n'
+				' * @param e Epsilon value.\n'
+				' */\n'
+				'#define TEST_EPSILON(a, b, e) (((a > b) && (a - b > e)) || ((b >= a) && (b - a > e)))\n'
+				'\n'
+				'/**\n'
+				' * @brief Standard statements for function error handling and printing.\n'
+				' *\n'
+				' * @param funcName Function name that failed.\n'
+				' */\n'
+				'#define FUNCTION_ERROR_STATEMENTS(funcName) {\\\n'
+				'	rv = EXIT_FAILURE;\\\n'
+				'	PRINT_FAIL();\\\n'
+				'	fprintf(stderr, "Error: %s failed with return code %d.\\n", funcName, fRet);\\\n'
+				'}\n'
+				'\n'
+				'/**\n'
+				' * @brief Standard statements for POSIX error handling and printing.\n'
+				' *\n'
+				' * @param arg Arbitrary string to the printed at the end of error string.\n'
+				' */\n'
+				'#define POSIX_ERROR_STATEMENTS(arg) {\\\n'
+				'	rv = EXIT_FAILURE;\\\n'
+				'	PRINT_FAIL();\\\n'
+				'	fprintf(stderr, "Error: %s: %s\\n", strerror(errno), arg);\\\n'
+				'}\n'
+				'\n'
+			)
+		)
 
-	# Print clCreateKernel for each kernel
-	def printCreateKernels(self):
-		with open(self._targetFile, "a") as f:
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					f.write(
-						(
-							'	/* Create {0} kernel */\n'
-							'	PRINT_STEP("Creating kernel \\"{0}\\" from program...");\n'
-							'	kernel{1} = clCreateKernel(program, "{0}", &fRet);\n'
-							'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateKernel"));\n'
-							'	PRINT_SUCCESS();\n'.format(k.attrib["name"], k.attrib["name"].title())
-						)
-					)
-
+		self._printDataDeclarations()
+		self._printHelpers()
 
-	# Print clCreateBuffer for all buffered variables
-	def printCreateBuffers(self):
-		with open(self._targetFile, "a") as f:
+		# With size parameters, kernels are run by a function called by main() once per size (see printFooter())
+		if d.params:
 			f.write(
 				(
-					'	/* Create input and output buffers */\n'
-					'	PRINT_STEP("Creating buffers...");\n'
+					'/**\n'
+					' * @brief Run kernels with the given size parameters.\n'
+					' *\n'
+					' * @param runStats Returned time of the loop, number of iterations and bytes of kernel arrays per\n'
+					' *        iteration, or NULL.\n'
+					' * @return EXIT_SUCCESS or EXIT_FAILURE.\n'
+					' */\n'
+					'static int runKernels({}runStats_t *runStats) {{\n'.format("".join("size_t {}, ".format(p) for p in d.params))
 				)
 			)
+		else:
+			f.write(
+				'int main(void) {\n'
+			)
 
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
+		f.write(
+			(
+				'	/* Return variable */\n'
+				'	int rv = EXIT_SUCCESS;\n'
+				'\n'
+				'	/* OpenCL and aux variables */\n'
+				'	int i = 0, j = 0;\n'
+				'	cl_int platformsLen, devicesLen, fRet;\n'
+				'	cl_platform_id *platforms = NULL;\n'
+				'	cl_device_id *devices = NULL;\n'
+				'	cl_context context = NULL;\n'
+			)
+		)
 
-						if "input" == v.tag and ((int(v.attrib["nmemb"]) > 1) or forcePointer):
-							f.write(
-								(
-									'	{0}K = clCreateBuffer(context, CL_MEM_READ_ONLY, {1} * sizeof({2}), NULL, &fRet);\n'
-									'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateBuffer ({0}K)"));\n'.format(
-										v.attrib["name"],
-										v.attrib["nmemb"],
-										v.attrib["type"]
-									)
-								)
-							)
-						elif "output" == v.tag:
-							f.write(
-								(
-									'	{0}K = clCreateBuffer(context, CL_MEM_READ_WRITE, {1} * sizeof({2}), NULL, &fRet);\n'
-									'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateBuffer ({0}K)"));\n'.format(
-										v.attrib["name"],
-										v.attrib["nmemb"],
-										v.attrib["type"]
-									)
-								)
-							)
 
-			f.write(
-				'	PRINT_SUCCESS();\n'
-			)
+	# Name of the array holding data of a variable in the data source (inputs are writable, as pre/postamble
+	# functions may change them; expected outputs are read-only)
+	def _dataArray(self, v):
+		if "input" == v.tag:
+			return "{}Data".format(v.name), v.type
+		else:
+			return "{}CData".format(v.name), "const {}".format(v.type)
 
 
-	# Print clSetKernelArgs for all kernels arguments
-	def printSetKernelsArgs(self):
-		with open(self._targetFile, "a") as f:
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					f.write(
-						(
-							'	/* Set kernel arguments for {0} */\n'
-							'	PRINT_STEP("Setting kernel arguments for \\"{0}\\"...");\n'.format(k.attrib["name"])
-						)
-					)
-	
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
+	# Print declarations of arrays defined in the data source
+	def _printDataDeclarations(self):
+		f = self._out
 
-						# If it is an input variable and its size is 1, send the variable explicitely
-						if "input" == v.tag and 1 == int(v.attrib["nmemb"]) and not forcePointer:
-							f.write(
-								(
-									'	fRet = clSetKernelArg(kernel{0}, {1}, sizeof({2}), &{3});\n'
-									'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({3})"));\n'.format(
-										k.attrib["name"].title(), v.attrib["arg"], v.attrib["type"], v.attrib["name"]
-									)
-								)
-							)
-						elif "input" == v.tag or "output" == v.tag:
-							f.write(
-								(
-									'	fRet = clSetKernelArg(kernel{0}, {1}, sizeof(cl_mem), &{2}K);\n'
-									'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({2}K)"));\n'.format(k.attrib["name"].title(), v.attrib["arg"], v.attrib["name"])
-								)
-							)
-						# Arguments with __local keyword
-						elif "local" == v.tag:
-							f.write(
-								(
-									'	fRet = clSetKernelArg(kernel{0}, {1}, {2} * sizeof({3}), NULL);\n'
-									'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg (__local {1})"));\n'.format(
-										k.attrib["name"].title(),
-										v.attrib["arg"],
-										v.attrib["nmemb"],
-										v.attrib["type"]
-									)
-								)
-							)
+		if not self._dataVariables:
+			return
 
-				f.write(
-					'	PRINT_SUCCESS();\n'
-				)
+		f.write(
+			'/* Inline data, defined in {} */\n'.format(os.path.basename(self.dataTargetFile(self._targetFile)))
+		)
 
+		for v in self._dataVariables:
+			name, type = self._dataArray(v)
+			f.write(
+				'extern {} {}[{}];\n'.format(type, name, v.nmemb)
+			)
 
-	# Print loop header and first calls
-	def printLoopHeader(self):
-		with open(self._targetFile, "a") as f:
-			f.write('	do {\n')
+		f.write(
+			'\n'
+		)
 
-			# Call LOOPPREAMBLE if set
-			if "looppreamble" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["looppreamble"]:
-				f.write(
-					'		/* Calling loop preamble function */\n'
-					'		PRINT_STEP("[%d] Calling loop preamble function...", i);\n'
-					'		LOOPPREAMBLE('
-				)
 
-				for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
-					f.write(
-						'{}, '.format(v)
-					)
+	# Print data source: inline data of variables, as global arrays (placed in .data/.rodata instead of
+	# the stack of main()). This is a separate translation unit, so that changes to data do not rebuild
+	# the host code
+	def printDataSource(self):
+		f = self._dataOut
 
-					if int(n) > 1:
-						f.write('{}, '.format(n))
+		f.write(
+			(
+				'/* Inline data of {}, generated by hostCodeGen */\n'
+				'\n'
+				'#include <CL/opencl.h>\n'.format(os.path.basename(self._targetFile))
+			)
+		)
 
-				f.write(
-					(
-						'loopFlag);\n'
-						'		PRINT_SUCCESS();\n'
-						'\n'.format(v)
-					)
+		for v in self._dataVariables:
+			name, type = self._dataArray(v)
+			f.write(
+				(
+					'\n'
+					'{} {}[{}] = {{\n'
+					'	'.format(type, name, v.nmemb)
 				)
-
+			)
+			self._writeData(v.text, f)
 			f.write(
 				(
-					'		/* Setting input and output buffers */\n'
-					'		PRINT_STEP("[%d] Setting buffers...", i);\n'
+					'\n'
+					'};\n'
 				)
 			)
 
-			# For each kernel, set the input/output data
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
 
-						# clEnqueueWriteBuffer for arrays, clSetKernelArg for single input
-						if "input" == v.tag:
-							if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-								f.write(
-									(
-										'		fRet = clEnqueueWriteBuffer(queue{0}, {1}K, CL_TRUE, 0, {2} * sizeof({3}), {1}, 0, NULL, NULL);\n'
-										'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
-											k.attrib["name"].title(),
-											v.attrib["name"],
-											v.attrib["nmemb"],
-											v.attrib["type"]
-										)
-									)
-								)
-							else:
-								f.write(
-									(
-										'		fRet = clSetKernelArg(kernel{0}, {1}, sizeof({2}), &{3});\n'
-										'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({3})"));\n'.format(
-											k.attrib["name"].title(), v.attrib["arg"], v.attrib["type"], v.attrib["name"]
-										)
-									)
-								)
-						elif "output" == v.tag:
-							if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-								f.write(
-									(
-										'		fRet = clEnqueueWriteBuffer(queue{0}, {1}K, CL_TRUE, 0, {2} * sizeof({3}), {1}, 0, NULL, NULL);\n'
-										'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
-											k.attrib["name"].title(),
-											v.attrib["name"],
-											v.attrib["nmemb"],
-											v.attrib["type"]
-										)
-									)
-								)
-							else:
-								f.write(
+	# Return (NumPy kind, size of members) of a variable mapped from a .npy file, as C expressions for mapDataFile().
+	# Members of vector types are their components (3-component vectors keep their padding); kind is 0 (not
+	# checked) for raw files and types other than C/OpenCL integer and floating-point types
+	def _npyItem(self, v):
+		if not v.isNpy():
+			return "0", "0"
+
+		if v.type in self._vectorTypes:
+			baseType = self._vectorTypes[v.type][1]
+			itemSz = "sizeof((({} *) NULL)->s[0])".format(v.type)
+		else:
+			baseType = v.type[3:] if v.type.startswith("cl_") else v.type
+			itemSz = "sizeof({})".format(v.type)
+
+		words = baseType.split()
+		if baseType in ("half", "float", "double"):
+			kind = "'f'"
+		elif baseType in ("uchar", "ushort", "uint", "ulong") or (words and "unsigned" == words[0] and set(words) <= {"unsigned", "char", "short", "int", "long"}):
+			kind = "'u'"
+		elif words and set(words) <= {"signed", "char", "short", "int", "long"}:
+			kind = "'i'"
+		else:
+			kind = "0"
+
+		return kind, itemSz
+
+
+	# Print auxiliary functions used by main(), depending on the features in use
+	def _printHelpers(self):
+		f = self._out
+
+		f.write(
+			(
+				'/**\n'
+				' * @brief Map a program file (binary or source) read-only into memory.\n'
+				' *\n'
+				' * @param path Path of program file.\n'
+				' * @param sz Returned size of file.\n'
+				' * @return Pointer to mapping (to be released with munmap()), or NULL on error (errno is set).\n'
+				' */\n'
+				'static void *mapProgramFile(const char *path, size_t *sz) {\n'
+				'	int fd;\n'
+				'	struct stat st;\n'
+				'	void *mapping;\n'
+				'\n'
+				'	fd = open(path, O_RDONLY);\n'
+				'	if(-1 == fd)\n'
+				'		return NULL;\n'
+				'	if(-1 == fstat(fd, &st)) {\n'
+				'		close(fd);\n'
+				'		return NULL;\n'
+				'	}\n'
+				'	if(!st.st_size) {\n'
+				'		close(fd);\n'
+				'		errno = EINVAL;\n'
+				'		return NULL;\n'
+				'	}\n'
+				'\n'
+				'	mapping = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);\n'
+				'	close(fd);\n'
+				'	if(MAP_FAILED == mapping)\n'
+				'		return NULL;\n'
+				'\n'
+				'	*sz = st.st_size;\n'
+				'	return mapping;\n'
+				'}\n'
+				'\n'
+			)
+		)
+
+		if self._descriptor.hasDataFiles():
+			f.write(
+				(
+					'/**\n'
+					' * @brief Find the value of a key in the header of a .npy file.\n'
+					' *\n'
+					' * @param header Header (a Python dict literal).\n'
+					' * @param end End of header.\n'
+					' * @param key Key, quoted and followed by a colon (e.g. "\'descr\':").\n'
+					' * @return Pointer to value (leading spaces skipped), or NULL if key is not found.\n'
+					' */\n'
+					'static const char *findNpyValue(const char *header, const char *end, const char *key) {\n'
+					'	size_t keySz = strlen(key);\n'
+					'\n'
+					'	for(; header + keySz <= end; header++) {\n'
+					'		if(!memcmp(header, key, keySz)) {\n'
+					'			for(header += keySz; header < end && \' \' == *header; header++);\n'
+					'			return header;\n'
+					'		}\n'
+					'	}\n'
+					'\n'
+					'	return NULL;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Check the header of a .npy file against the variable it is mapped into.\n'
+					' *\n'
+					' * @param header Header (a Python dict literal).\n'
+					' * @param end End of header.\n'
+					' * @param kind NumPy kind of members (of vectors): \'f\', \'i\' or \'u\', or 0 if type is not checked.\n'
+					' * @param itemSz Size of members (of vectors), in bytes.\n'
+					' * @param dataSz Size of variable, in bytes.\n'
+					' * @param isExact If true, array must have exactly the size of variable, otherwise at least.\n'
+					' * @return true if array is C-ordered and matches type and size of variable.\n'
+					' */\n'
+					'static bool checkNpyHeader(const char *header, const char *end, char kind, size_t itemSz, size_t dataSz, bool isExact) {\n'
+					'	const char *value;\n'
+					'	size_t n, nmemb = 1;\n'
+					'\n'
+					'	value = findNpyValue(header, end, "\'fortran_order\':");\n'
+					'	if(!value || end - value < 5 || memcmp(value, "False", 5))\n'
+					'		return false;\n'
+					'	if(!kind)\n'
+					'		return true;\n'
+					'\n'
+					'	/* Type: little-endian (or single byte) members of the expected kind and size */\n'
+					'	value = findNpyValue(header, end, "\'descr\':");\n'
+					'	if(!value || end - value < 4 || \'\\\'\' != value[0] || (\'<\' != value[1] && \'|\' != value[1]) || kind != value[2])\n'
+					'		return false;\n'
+					'	for(n = 0, value += 3; value < end && *value >= \'0\' && *value <= \'9\'; value++)\n'
+					'		n = 10 * n + (*value - \'0\');\n'
+					'	if(n != itemSz || value >= end || \'\\\'\' != *value)\n'
+					'		return false;\n'
+					'\n'
+					'	/* Shape: number of members is the product of all dimensions */\n'
+					'	value = findNpyValue(header, end, "\'shape\':");\n'
+					'	if(!value || value >= end || \'(\' != *value)\n'
+					'		return false;\n'
+					'	for(value++; value < end && \')\' != *value;) {\n'
+					'		if(\',\' == *value || \' \' == *value) {\n'
+					'			value++;\n'
+					'			continue;\n'
+					'		}\n'
+					'		if(*value < \'0\' || *value > \'9\')\n'
+					'			return false;\n'
+					'		for(n = 0; value < end && *value >= \'0\' && *value <= \'9\'; value++)\n'
+					'			n = 10 * n + (*value - \'0\');\n'
+					'		if(n && nmemb > SIZE_MAX / itemSz / n)\n'
+					'			return false;\n'
+					'		nmemb *= n;\n'
+					'	}\n'
+					'	if(value >= end)\n'
+					'		return false;\n'
+					'\n'
+					'	return isExact ? (nmemb * itemSz == dataSz) : (nmemb * itemSz >= dataSz);\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Map a raw binary or .npy data file into memory. Mapping is private (copy-on-write):\n'
+					' *        data may be changed in memory without changing the file.\n'
+					' *\n'
+					' * @param path Path of data file.\n'
+					' * @param isNpy If true, file is in .npy format and data starts after its header.\n'
+					' * @param kind With .npy, NumPy kind of members (see checkNpyHeader()).\n'
+					' * @param itemSz With .npy, size of members (see checkNpyHeader()).\n'
+					' * @param dataSz Size of expected data, in bytes.\n'
+					' * @param isExact With .npy, if true, array must have exactly the size of expected data.\n'
+					' * @param mapping Returned address of mapping (to be released with munmap()).\n'
+					' * @param mappingSz Returned size of mapping.\n'
+					' * @return Pointer to data, or NULL on error (errno is set).\n'
+					' */\n'
+					'static void *mapDataFile(const char *path, bool isNpy, char kind, size_t itemSz, size_t dataSz, bool isExact, void **mapping, size_t *mappingSz) {\n'
+					'	int fd;\n'
+					'	struct stat st;\n'
+					'	size_t offset = 0, headerOffset;\n'
+					'	unsigned char *base;\n'
+					'\n'
+					'	fd = open(path, O_RDONLY);\n'
+					'	if(-1 == fd)\n'
+					'		return NULL;\n'
+					'	if(-1 == fstat(fd, &st)) {\n'
+					'		close(fd);\n'
+					'		return NULL;\n'
+					'	}\n'
+					'	if(!st.st_size) {\n'
+					'		close(fd);\n'
+					'		errno = EINVAL;\n'
+					'		return NULL;\n'
+					'	}\n'
+					'\n'
+					'	base = mmap(NULL, st.st_size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, 0);\n'
+					'	close(fd);\n'
+					'	if(MAP_FAILED == base)\n'
+					'		return NULL;\n'
+					'\n'
+					'	/* .npy: magic string, version, header length (little-endian) and header */\n'
+					'	if(isNpy) {\n'
+					'		if(st.st_size < 12 || memcmp(base, "\\x93NUMPY", 6)) {\n'
+					'			offset = st.st_size + 1;\n'
+					'		}\n'
+					'		else {\n'
+					'			headerOffset = (1 == base[6]) ? 10 : 12;\n'
+					'			offset = headerOffset + ((1 == base[6]) ? (base[8] | (base[9] << 8)) : (base[8] | (base[9] << 8) | (base[10] << 16) | ((size_t) base[11] << 24)));\n'
+					'			if(offset <= st.st_size && !checkNpyHeader((char *) base + headerOffset, (char *) base + offset, kind, itemSz, dataSz, isExact))\n'
+					'				offset = st.st_size + 1;\n'
+					'		}\n'
+					'	}\n'
+					'\n'
+					'	/* Malformed file, array not matching the variable or not enough data */\n'
+					'	if(offset > st.st_size || st.st_size - offset < dataSz) {\n'
+					'		munmap(base, st.st_size);\n'
+					'		errno = EINVAL;\n'
+					'		return NULL;\n'
+					'	}\n'
+					'\n'
+					'	*mapping = base;\n'
+					'	*mappingSz = st.st_size;\n'
+					'	return base + offset;\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._descriptor.binaryCache() is not None:
+			f.write(
+				(
+					'/**\n'
+					' * @brief Hash data with 64-bit FNV-1a.\n'
+					' *\n'
+					' * @param hash Hash of previous data (FNV offset basis for the first call).\n'
+					' * @param data Data.\n'
+					' * @param sz Size of data, in bytes.\n'
+					' * @return Updated hash.\n'
+					' */\n'
+					'static uint64_t hashBytes(uint64_t hash, const void *data, size_t sz) {\n'
+					'	const unsigned char *bytes = data;\n'
+					'	size_t i;\n'
+					'\n'
+					'	for(i = 0; i < sz; i++) {\n'
+					'		hash ^= bytes[i];\n'
+					'		hash *= 0x100000001b3ULL;\n'
+					'	}\n'
+					'\n'
+					'	return hash;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Compute key of a program in the binary cache: hash of its source, build options and device\n'
+					' *        (name, vendor, driver version and OpenCL version).\n'
+					' *\n'
+					' * @param device Device the program is built for.\n'
+					' * @param source Program source.\n'
+					' * @param sourceSz Size of program source.\n'
+					' * @param options Build options.\n'
+					' * @param key Returned key.\n'
+					' * @return CL_SUCCESS or error of clGetDeviceInfo().\n'
+					' */\n'
+					'static cl_int programCacheKey(cl_device_id device, const char *source, size_t sourceSz, const char *options, uint64_t *key) {\n'
+					'	cl_device_info infos[4] = {CL_DEVICE_NAME, CL_DEVICE_VENDOR, CL_DRIVER_VERSION, CL_DEVICE_VERSION};\n'
+					'	char info[1024];\n'
+					'	size_t infoSz;\n'
+					'	cl_int fRet;\n'
+					'	int i;\n'
+					'\n'
+					'	*key = hashBytes(0xcbf29ce484222325ULL, source, sourceSz);\n'
+					'	*key = hashBytes(*key, options, strlen(options) + 1);\n'
+					'\n'
+					'	for(i = 0; i < 4; i++) {\n'
+					'		fRet = clGetDeviceInfo(device, infos[i], sizeof(info), info, &infoSz);\n'
+					'		if(CL_SUCCESS != fRet)\n'
+					'			return fRet;\n'
+					'\n'
+					'		*key = hashBytes(*key, info, infoSz);\n'
+					'	}\n'
+					'\n'
+					'	return CL_SUCCESS;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Save binary of a built program to the cache. Binary is written to a temporary file which is then\n'
+					' *        renamed, so that concurrent runs never load a partial binary.\n'
+					' *\n'
+					' * @param dir Cache directory (created if needed).\n'
+					' * @param path Path of cached binary.\n'
+					' * @param program Program built for one device.\n'
+					' * @return true if binary was saved.\n'
+					' */\n'
+					'static bool saveCachedBinary(const char *dir, const char *path, cl_program program) {\n'
+					'	size_t binarySz;\n'
+					'	unsigned char *binary;\n'
+					'	char tmpPath[4096 + 32];\n'
+					'	FILE *cacheFile;\n'
+					'	bool saved = false;\n'
+					'\n'
+					'	if(CL_SUCCESS != clGetProgramInfo(program, CL_PROGRAM_BINARY_SIZES, sizeof(size_t), &binarySz, NULL) || !binarySz)\n'
+					'		return false;\n'
+					'\n'
+					'	binary = malloc(binarySz);\n'
+					'	if(!binary)\n'
+					'		return false;\n'
+					'\n'
+					'	if(CL_SUCCESS == clGetProgramInfo(program, CL_PROGRAM_BINARIES, sizeof(unsigned char *), &binary, NULL)) {\n'
+					'		mkdir(dir, 0777);\n'
+					'		snprintf(tmpPath, sizeof(tmpPath), "%s.%ld.tmp", path, (long) getpid());\n'
+					'\n'
+					'		cacheFile = fopen(tmpPath, "wb");\n'
+					'		if(cacheFile) {\n'
+					'			saved = (1 == fwrite(binary, binarySz, 1, cacheFile));\n'
+					'			saved = !fclose(cacheFile) && saved;\n'
+					'			saved = saved && !rename(tmpPath, path);\n'
+					'			if(!saved)\n'
+					'				remove(tmpPath);\n'
+					'		}\n'
+					'	}\n'
+					'\n'
+					'	free(binary);\n'
+					'	return saved;\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		# Handles of each device are kept in arrays of MAX_DEVICES elements. When all devices of the platform are
+		# used, devices beyond MAX_DEVICES are ignored
+		if self._descriptor.isMultiDevice():
+			indexes = self._descriptor.deviceIndexes()
+			if indexes is None:
+				f.write(
+					(
+						'/* Maximum number of devices kernels are split across */\n'
+						'#ifndef MAX_DEVICES\n'
+						'#define MAX_DEVICES 16\n'
+						'#endif\n'
+						'\n'
+					)
+				)
+			else:
+				f.write(
+					(
+						'/* Number of devices kernels are split across */\n'
+						'#define MAX_DEVICES {}\n'
+						'\n'.format(len(indexes))
+					)
+				)
+
+		if self._descriptor.hasMemoryMode("hostptr"):
+			f.write(
+				(
+					'#ifndef HOSTPTR_ALIGNMENT\n'
+					'#define HOSTPTR_ALIGNMENT 64\n'
+					'#endif\n'
+					'\n'
+					'/**\n'
+					' * @brief Allocate memory aligned to HOSTPTR_ALIGNMENT, with size rounded up to a multiple of it, as\n'
+					' *        expected by devices for zero-copy buffers (CL_MEM_USE_HOST_PTR).\n'
+					' *\n'
+					' * @param sz Size to allocate, in bytes.\n'
+					' * @return Pointer to memory (to be released with free()), or NULL on error.\n'
+					' */\n'
+					'static void *alignedMalloc(size_t sz) {\n'
+					'	void *ptr;\n'
+					'\n'
+					'	if(posix_memalign(&ptr, HOSTPTR_ALIGNMENT, ((sz + HOSTPTR_ALIGNMENT - 1) / HOSTPTR_ALIGNMENT) * HOSTPTR_ALIGNMENT))\n'
+					'		return NULL;\n'
+					'\n'
+					'	return ptr;\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._hasValidation():
+			f.write(
+				(
+					'/* Maximum number of mismatching elements printed per output */\n'
+					'#ifndef VALIDATION_PRINT_LIMIT\n'
+					'#define VALIDATION_PRINT_LIMIT 10\n'
+					'#endif\n'
+					'\n'
+				)
+			)
+
+		if self._hasDigests():
+			f.write(
+				(
+					'#define XXH_PRIME64_1 0x9E3779B185EBCA87ULL\n'
+					'#define XXH_PRIME64_2 0xC2B2AE3D27D4EB4FULL\n'
+					'#define XXH_PRIME64_3 0x165667B19E3779F9ULL\n'
+					'#define XXH_PRIME64_4 0x85EBCA77C2B2AE63ULL\n'
+					'#define XXH_PRIME64_5 0x27D4EB2F165667C5ULL\n'
+					'\n'
+					'/**\n'
+					' * @brief State of a streaming XXH64 hash (seed 0). Data is read in host byte order, which matches digests\n'
+					' *        computed on little-endian hosts.\n'
+					' */\n'
+					'typedef struct {\n'
+					'	uint64_t v[4];\n'
+					'	uint64_t len;\n'
+					'	unsigned char buf[32];\n'
+					'	size_t bufLen;\n'
+					'} xxh64State_t;\n'
+					'\n'
+					'static uint64_t xxh64Rotl(uint64_t x, int r) {\n'
+					'	return (x << r) | (x >> (64 - r));\n'
+					'}\n'
+					'\n'
+					'static uint64_t xxh64Read(const unsigned char *p, size_t sz) {\n'
+					'	uint64_t x = 0;\n'
+					'	uint32_t y = 0;\n'
+					'\n'
+					'	if(4 == sz) {\n'
+					'		memcpy(&y, p, 4);\n'
+					'		return y;\n'
+					'	}\n'
+					'\n'
+					'	memcpy(&x, p, 8);\n'
+					'	return x;\n'
+					'}\n'
+					'\n'
+					'static uint64_t xxh64Round(uint64_t acc, uint64_t input) {\n'
+					'	return xxh64Rotl(acc + input * XXH_PRIME64_2, 31) * XXH_PRIME64_1;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Start an XXH64 hash.\n'
+					' */\n'
+					'static void xxh64Init(xxh64State_t *s) {\n'
+					'	s->v[0] = XXH_PRIME64_1 + XXH_PRIME64_2;\n'
+					'	s->v[1] = XXH_PRIME64_2;\n'
+					'	s->v[2] = 0;\n'
+					'	s->v[3] = 0 - XXH_PRIME64_1;\n'
+					'	s->len = 0;\n'
+					'	s->bufLen = 0;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Hash data, following data already hashed. Stripes of 32 bytes are consumed as data arrives, only\n'
+					' *        an incomplete stripe is kept in the state.\n'
+					' *\n'
+					' * @param data Data.\n'
+					' * @param sz Size of data, in bytes.\n'
+					' */\n'
+					'static void xxh64Update(xxh64State_t *s, const void *data, size_t sz) {\n'
+					'	const unsigned char *p = data;\n'
+					'	size_t n, l;\n'
+					'\n'
+					'	s->len += sz;\n'
+					'	if(s->bufLen) {\n'
+					'		n = (32 - s->bufLen < sz) ? 32 - s->bufLen : sz;\n'
+					'		memcpy(s->buf + s->bufLen, p, n);\n'
+					'		s->bufLen += n;\n'
+					'		p += n;\n'
+					'		sz -= n;\n'
+					'		if(s->bufLen < 32)\n'
+					'			return;\n'
+					'\n'
+					'		for(l = 0; l < 4; l++)\n'
+					'			s->v[l] = xxh64Round(s->v[l], xxh64Read(s->buf + 8 * l, 8));\n'
+					'		s->bufLen = 0;\n'
+					'	}\n'
+					'\n'
+					'	for(; sz >= 32; p += 32, sz -= 32) {\n'
+					'		for(l = 0; l < 4; l++)\n'
+					'			s->v[l] = xxh64Round(s->v[l], xxh64Read(p + 8 * l, 8));\n'
+					'	}\n'
+					'\n'
+					'	memcpy(s->buf, p, sz);\n'
+					'	s->bufLen = sz;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Finish an XXH64 hash.\n'
+					' *\n'
+					' * @return Digest of all data hashed.\n'
+					' */\n'
+					'static uint64_t xxh64Digest(const xxh64State_t *s) {\n'
+					'	const unsigned char *p = s->buf, *end = s->buf + s->bufLen;\n'
+					'	uint64_t h;\n'
+					'	size_t l;\n'
+					'\n'
+					'	if(s->len >= 32) {\n'
+					'		h = xxh64Rotl(s->v[0], 1) + xxh64Rotl(s->v[1], 7) + xxh64Rotl(s->v[2], 12) + xxh64Rotl(s->v[3], 18);\n'
+					'		for(l = 0; l < 4; l++)\n'
+					'			h = (h ^ xxh64Round(0, s->v[l])) * XXH_PRIME64_1 + XXH_PRIME64_4;\n'
+					'	}\n'
+					'	else {\n'
+					'		h = XXH_PRIME64_5;\n'
+					'	}\n'
+					'\n'
+					'	h += s->len;\n'
+					'	for(; p + 8 <= end; p += 8)\n'
+					'		h = xxh64Rotl(h ^ xxh64Round(0, xxh64Read(p, 8)), 27) * XXH_PRIME64_1 + XXH_PRIME64_4;\n'
+					'	if(p + 4 <= end) {\n'
+					'		h = xxh64Rotl(h ^ (xxh64Read(p, 4) * XXH_PRIME64_1), 23) * XXH_PRIME64_2 + XXH_PRIME64_3;\n'
+					'		p += 4;\n'
+					'	}\n'
+					'	for(; p < end; p++)\n'
+					'		h = xxh64Rotl(h ^ (*p * XXH_PRIME64_5), 11) * XXH_PRIME64_1;\n'
+					'\n'
+					'	h ^= h >> 33;\n'
+					'	h *= XXH_PRIME64_2;\n'
+					'	h ^= h >> 29;\n'
+					'	h *= XXH_PRIME64_3;\n'
+					'	h ^= h >> 32;\n'
+					'	return h;\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._descriptor.params:
+			f.write(
+				(
+					'/**\n'
+					' * @brief Size parameter: a size, or a geometric series of sizes to sweep ("first:last[:factor]").\n'
+					' */\n'
+					'typedef struct {\n'
+					'	const char *name;\n'
+					'	const char *value;\n'
+					'	size_t first;\n'
+					'	size_t last;\n'
+					'	size_t factor;\n'
+					'} sizeParam_t;\n'
+					'\n'
+					'/**\n'
+					' * @brief Measures of a run of kernels.\n'
+					' */\n'
+					'typedef struct {\n'
+					'	double us;\n'
+					'	int iterations;\n'
+					'	double bytes;\n'
+					'} runStats_t;\n'
+					'\n'
+					'/**\n'
+					' * @brief Parse the value of a size parameter.\n'
+					' *\n'
+					' * @param p Size parameter, whose first, last and factor fields are set from its value.\n'
+					' * @return false if value is invalid.\n'
+					' */\n'
+					'static bool parseSizeParam(sizeParam_t *p) {\n'
+					'	char *end;\n'
+					'\n'
+					'	p->first = p->last = strtoull(p->value, &end, 10);\n'
+					'	p->factor = 2;\n'
+					'	if(\':\' == *end)\n'
+					'		p->last = strtoull(end + 1, &end, 10);\n'
+					'	if(\':\' == *end)\n'
+					'		p->factor = strtoull(end + 1, &end, 10);\n'
+					'\n'
+					'	return end != p->value && !*end && p->first && p->last >= p->first && p->factor > 1;\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._descriptor.isEnabled("autotune"):
+			f.write(
+				(
+					'#ifndef AUTOTUNE_REPETITIONS\n'
+					'#define AUTOTUNE_REPETITIONS 10\n'
+					'#endif\n'
+					'\n'
+					'/**\n'
+					' * @brief Time a kernel with a local size: after a warm-up run, kernel is run AUTOTUNE_REPETITIONS times.\n'
+					' *\n'
+					' * @param localSize Local size, or NULL to let the runtime choose it.\n'
+					' * @param us Returned average time of a run, in us.\n'
+					' * @return CL_SUCCESS or error of clEnqueueNDRangeKernel()/clFinish().\n'
+					' */\n'
+					'static cl_int timeKernel(cl_command_queue queue, cl_kernel kernel, cl_uint workDim, const size_t *globalSize, const size_t *localSize, double *us) {\n'
+					'	struct timeval tThen, tNow, tDelta;\n'
+					'	cl_int fRet;\n'
+					'	int r;\n'
+					'\n'
+					'	fRet = clEnqueueNDRangeKernel(queue, kernel, workDim, NULL, globalSize, localSize, 0, NULL, NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clFinish(queue);\n'
+					'	if(CL_SUCCESS != fRet)\n'
+					'		return fRet;\n'
+					'\n'
+					'	gettimeofday(&tThen, NULL);\n'
+					'	for(r = 0; CL_SUCCESS == fRet && r < AUTOTUNE_REPETITIONS; r++)\n'
+					'		fRet = clEnqueueNDRangeKernel(queue, kernel, workDim, NULL, globalSize, localSize, 0, NULL, NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clFinish(queue);\n'
+					'	gettimeofday(&tNow, NULL);\n'
+					'\n'
+					'	timersub(&tNow, &tThen, &tDelta);\n'
+					'	*us = ((1000000.0 * tDelta.tv_sec) + tDelta.tv_usec) / AUTOTUNE_REPETITIONS;\n'
+					'	return fRet;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Find the fastest local size of a kernel. Candidates divide the global size in every dimension,\n'
+					' *        fit in the maximum work-item sizes of the device, and have a number of work-items that is at most\n'
+					' *        CL_KERNEL_WORK_GROUP_SIZE and a multiple of CL_KERNEL_PREFERRED_WORK_GROUP_SIZE_MULTIPLE. They\n'
+					' *        are timed against the choice of the runtime (NULL local size). Candidates failing to run (e.g. out\n'
+					' *        of resources) are skipped.\n'
+					' *\n'
+					' * @param best Returned fastest local size (all zeros if choice of the runtime is the fastest).\n'
+					' * @param bestUs Returned average time of a run with fastest local size, in us.\n'
+					' * @return CL_SUCCESS, or error of an OpenCL call (other than runs of candidates).\n'
+					' */\n'
+					'static cl_int autotuneKernel(cl_command_queue queue, cl_kernel kernel, cl_device_id device, cl_uint workDim, const size_t *globalSize, size_t *best, double *bestUs) {\n'
+					'	size_t maxItems[32], limit[3], local[3] = {1, 1, 1}, wgSize, multiple, items;\n'
+					'	double us;\n'
+					'	cl_int fRet;\n'
+					'	cl_uint d;\n'
+					'\n'
+					'	fRet = clGetDeviceInfo(device, CL_DEVICE_MAX_WORK_ITEM_SIZES, sizeof(maxItems), maxItems, NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clGetKernelWorkGroupInfo(kernel, device, CL_KERNEL_WORK_GROUP_SIZE, sizeof(size_t), &wgSize, NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clGetKernelWorkGroupInfo(kernel, device, CL_KERNEL_PREFERRED_WORK_GROUP_SIZE_MULTIPLE, sizeof(size_t), &multiple, NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = timeKernel(queue, kernel, workDim, globalSize, NULL, bestUs);\n'
+					'	if(CL_SUCCESS != fRet)\n'
+					'		return fRet;\n'
+					'\n'
+					'	memset(best, 0, workDim * sizeof(size_t));\n'
+					'	if(!multiple)\n'
+					'		multiple = 1;\n'
+					'	for(d = 0; d < workDim; d++) {\n'
+					'		limit[d] = globalSize[d] < maxItems[d] ? globalSize[d] : maxItems[d];\n'
+					'		limit[d] = limit[d] < wgSize ? limit[d] : wgSize;\n'
+					'	}\n'
+					'\n'
+					'	/* Go through every combination of divisors of global size, first dimension first */\n'
+					'	for(;;) {\n'
+					'		items = 1;\n'
+					'		for(d = 0; d < workDim; d++)\n'
+					'			items *= local[d];\n'
+					'\n'
+					'		if(items <= wgSize && !(items % multiple)\n'
+					'			&& CL_SUCCESS == timeKernel(queue, kernel, workDim, globalSize, local, &us) && us < *bestUs) {\n'
+					'			*bestUs = us;\n'
+					'			memcpy(best, local, workDim * sizeof(size_t));\n'
+					'		}\n'
+					'\n'
+					'		for(d = 0; d < workDim; d++) {\n'
+					'			do\n'
+					'				local[d]++;\n'
+					'			while(local[d] <= limit[d] && globalSize[d] % local[d]);\n'
+					'\n'
+					'			if(local[d] <= limit[d])\n'
+					'				break;\n'
+					'			local[d] = 1;\n'
+					'		}\n'
+					'		if(d == workDim)\n'
+					'			break;\n'
+					'	}\n'
+					'\n'
+					'	return CL_SUCCESS;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Print fastest local size of a kernel, as an <ndrange> node of the kernel description.\n'
+					' *\n'
+					' * @param name Name of kernel.\n'
+					' * @param best Fastest local size (all zeros if choice of the runtime is the fastest).\n'
+					' * @param us Average time of a run with fastest local size, in us.\n'
+					' */\n'
+					'static void printAutotuneResult(const char *name, cl_uint workDim, const size_t *globalSize, const size_t *best, double us) {\n'
+					'	cl_uint d;\n'
+					'\n'
+					'	printf("\\t<!-- %s: %.3lf us -->\\n", name, us);\n'
+					'	printf("\\t<ndrange dim=\\"%u\\">\\n\\t\\t<global>", workDim);\n'
+					'	for(d = 0; d < workDim; d++)\n'
+					'		printf("%s%zu", d ? ", " : "", globalSize[d]);\n'
+					'	printf("</global>\\n");\n'
+					'\n'
+					'	if(best[0]) {\n'
+					'		printf("\\t\\t<local>");\n'
+					'		for(d = 0; d < workDim; d++)\n'
+					'			printf("%s%zu", d ? ", " : "", best[d]);\n'
+					'		printf("</local>\\n");\n'
+					'	}\n'
+					'	printf("\\t</ndrange>\\n");\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._descriptor.isProfiled():
+			f.write(
+				(
+					'static double *iterationTimes = NULL;\n'
+					'static size_t iterationTimesLen = 0;\n'
+					'static size_t iterationTimesCap = 0;\n'
+					'\n'
+					'/**\n'
+					' * @brief Record elapsed time of an iteration.\n'
+					' *\n'
+					' * @param t Elapsed time.\n'
+					' * @return false if time could not be stored (errno is set).\n'
+					' */\n'
+					'static bool recordIteration(const struct timeval *t) {\n'
+					'	if(iterationTimesLen == iterationTimesCap) {\n'
+					'		size_t cap = iterationTimesCap ? 2 * iterationTimesCap : 256;\n'
+					'		double *times = realloc(iterationTimes, cap * sizeof(double));\n'
+					'\n'
+					'		if(!times)\n'
+					'			return false;\n'
+					'\n'
+					'		iterationTimes = times;\n'
+					'		iterationTimesCap = cap;\n'
+					'	}\n'
+					'\n'
+					'	iterationTimes[iterationTimesLen++] = (1000000.0 * t->tv_sec) + t->tv_usec;\n'
+					'	return true;\n'
+					'}\n'
+					'\n'
+					'static int compareTimes(const void *a, const void *b) {\n'
+					'	double x = *((const double *) a);\n'
+					'	double y = *((const double *) b);\n'
+					'\n'
+					'	return (x > y) - (x < y);\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Print distribution of iteration times (min, max, mean, median, p95, p99 and standard deviation)\n'
+					' *        and optionally export it. Recorded times are sorted. Percentiles use the nearest-rank method.\n'
+					' *\n'
+					' * @param path Path of exported file, or NULL.\n'
+					' * @param json If true, file is written in JSON, otherwise in CSV (header and one row).\n'
+					' * @return false if file could not be written (errno is set).\n'
+					' */\n'
+					'static bool printIterationStats(const char *path, bool json) {\n'
+					'	size_t n = iterationTimesLen, j;\n'
+					'	double sum = 0, sqSum = 0, stats[7];\n'
+					'	const char *names[7] = {"min_us", "max_us", "mean_us", "median_us", "p95_us", "p99_us", "stddev_us"};\n'
+					'	FILE *statsFile;\n'
+					'\n'
+					'	if(!n)\n'
+					'		return true;\n'
+					'\n'
+					'	qsort(iterationTimes, n, sizeof(double), compareTimes);\n'
+					'	for(j = 0; j < n; j++)\n'
+					'		sum += iterationTimes[j];\n'
+					'	for(j = 0; j < n; j++)\n'
+					'		sqSum += (iterationTimes[j] - sum / n) * (iterationTimes[j] - sum / n);\n'
+					'\n'
+					'	stats[0] = iterationTimes[0];\n'
+					'	stats[1] = iterationTimes[n - 1];\n'
+					'	stats[2] = sum / n;\n'
+					'	stats[3] = (n % 2) ? iterationTimes[n / 2] : (iterationTimes[n / 2 - 1] + iterationTimes[n / 2]) / 2;\n'
+					'	stats[4] = iterationTimes[(95 * n + 99) / 100 - 1];\n'
+					'	stats[5] = iterationTimes[(99 * n + 99) / 100 - 1];\n'
+					'	stats[6] = sqrt(sqSum / n);\n'
+					'\n'
+					'	printf("Iteration time (us) over %zu iterations: min %.3lf; max %.3lf; mean %.3lf; median %.3lf; p95 %.3lf; p99 %.3lf; stddev %.3lf.\\n",\n'
+					'		n, stats[0], stats[1], stats[2], stats[3], stats[4], stats[5], stats[6]);\n'
+					'\n'
+					'	if(!path)\n'
+					'		return true;\n'
+					'\n'
+					'	statsFile = fopen(path, "w");\n'
+					'	if(!statsFile)\n'
+					'		return false;\n'
+					'\n'
+					'	if(json) {\n'
+					'		fprintf(statsFile, "{\\"iterations\\": %zu", n);\n'
+					'		for(j = 0; j < 7; j++)\n'
+					'			fprintf(statsFile, ", \\"%s\\": %.3lf", names[j], stats[j]);\n'
+					'		fprintf(statsFile, "}\\n");\n'
+					'	}\n'
+					'	else {\n'
+					'		fprintf(statsFile, "iterations");\n'
+					'		for(j = 0; j < 7; j++)\n'
+					'			fprintf(statsFile, ",%s", names[j]);\n'
+					'		fprintf(statsFile, "\\n%zu", n);\n'
+					'		for(j = 0; j < 7; j++)\n'
+					'			fprintf(statsFile, ",%.3lf", stats[j]);\n'
+					'		fprintf(statsFile, "\\n");\n'
+					'	}\n'
+					'\n'
+					'	return !fclose(statsFile);\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._descriptor.hasEventProfiling():
+			f.write(
+				(
+					'/**\n'
+					' * @brief Device profiling of a command (timestamps in ns).\n'
+					' */\n'
+					'typedef struct {\n'
+					'	const char *kind;\n'
+					'	const char *name;\n'
+					'	int iteration;\n'
+					'	cl_ulong queued;\n'
+					'	cl_ulong submit;\n'
+					'	cl_ulong start;\n'
+					'	cl_ulong end;\n'
+					'} profileRecord_t;\n'
+					'\n'
+					'static profileRecord_t *profileRecords = NULL;\n'
+					'static size_t profileRecordsLen = 0;\n'
+					'static size_t profileRecordsCap = 0;\n'
+					'\n'
+					'/**\n'
+					' * @brief Record device profiling of a completed command and release its event.\n'
+					' *\n'
+					' * @param event Event of command (released in any case).\n'
+					' * @param kind Kind of command ("write", "kernel" or "read").\n'
+					' * @param name Name of variable or kernel.\n'
+					' * @param iteration Iteration of loop.\n'
+					' * @return CL_SUCCESS, CL_OUT_OF_HOST_MEMORY or error of clGetEventProfilingInfo().\n'
+					' */\n'
+					'static cl_int recordEvent(cl_event event, const char *kind, const char *name, int iteration) {\n'
+					'	profileRecord_t *r;\n'
+					'	cl_int fRet;\n'
+					'\n'
+					'	if(profileRecordsLen == profileRecordsCap) {\n'
+					'		size_t cap = profileRecordsCap ? 2 * profileRecordsCap : 256;\n'
+					'\n'
+					'		r = realloc(profileRecords, cap * sizeof(profileRecord_t));\n'
+					'		if(!r) {\n'
+					'			clReleaseEvent(event);\n'
+					'			return CL_OUT_OF_HOST_MEMORY;\n'
+					'		}\n'
+					'\n'
+					'		profileRecords = r;\n'
+					'		profileRecordsCap = cap;\n'
+					'	}\n'
+					'\n'
+					'	r = &profileRecords[profileRecordsLen];\n'
+					'	r->kind = kind;\n'
+					'	r->name = name;\n'
+					'	r->iteration = iteration;\n'
+					'\n'
+					'	fRet = clGetEventProfilingInfo(event, CL_PROFILING_COMMAND_QUEUED, sizeof(cl_ulong), &(r->queued), NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clGetEventProfilingInfo(event, CL_PROFILING_COMMAND_SUBMIT, sizeof(cl_ulong), &(r->submit), NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clGetEventProfilingInfo(event, CL_PROFILING_COMMAND_START, sizeof(cl_ulong), &(r->start), NULL);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		fRet = clGetEventProfilingInfo(event, CL_PROFILING_COMMAND_END, sizeof(cl_ulong), &(r->end), NULL);\n'
+					'\n'
+					'	clReleaseEvent(event);\n'
+					'	if(CL_SUCCESS == fRet)\n'
+					'		profileRecordsLen++;\n'
+					'\n'
+					'	return fRet;\n'
+					'}\n'
+					'\n'
+					'/**\n'
+					' * @brief Print average device times per iteration of each command (time waiting in queue, time from\n'
+					' *        submission to start, and execution time), and total execution time of kernels and transfers.\n'
+					' *        Every iteration records the same commands in the same order.\n'
+					' */\n'
+					'static void printEventProfile(void) {\n'
+					'	size_t nCommands = 0, c, r, n;\n'
+					'	double queued, submitted, running, kernelsTime = 0, transfersTime = 0;\n'
+					'\n'
+					'	while(nCommands < profileRecordsLen && profileRecords[nCommands].iteration == profileRecords[0].iteration)\n'
+					'		nCommands++;\n'
+					'\n'
+					'	printf("Device profiling (average per iteration, us):\\n");\n'
+					'	printf("%-6s %-24s %12s %12s %12s\\n", "kind", "name", "queued", "submitted", "running");\n'
+					'	for(c = 0; c < nCommands; c++) {\n'
+					'		queued = submitted = running = 0;\n'
+					'		n = 0;\n'
+					'\n'
+					'		for(r = c; r < profileRecordsLen; r += nCommands) {\n'
+					'			queued += (double) profileRecords[r].submit - (double) profileRecords[r].queued;\n'
+					'			submitted += (double) profileRecords[r].start - (double) profileRecords[r].submit;\n'
+					'			running += (double) profileRecords[r].end - (double) profileRecords[r].start;\n'
+					'			n++;\n'
+					'		}\n'
+					'\n'
+					'		printf("%-6s %-24s %12.3lf %12.3lf %12.3lf\\n", profileRecords[c].kind, profileRecords[c].name,\n'
+					'			queued / n / 1000, submitted / n / 1000, running / n / 1000);\n'
+					'\n'
+					'		if(!strcmp("kernel", profileRecords[c].kind))\n'
+					'			kernelsTime += running / n / 1000;\n'
+					'		else\n'
+					'			transfersTime += running / n / 1000;\n'
+					'	}\n'
+					'\n'
+					'	printf("Device time per iteration: kernels %.3lf us; transfers %.3lf us.\\n", kernelsTime, transfersTime);\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+		if self._descriptor.attrib.get("eventsfile") is not None:
+			f.write(
+				(
+					'/**\n'
+					' * @brief Write device profiling of every command of every iteration: queued, submission, start and end\n'
+					' *        timestamps, in ns since the first command was queued.\n'
+					' *\n'
+					' * @param path Path of file.\n'
+					' * @param json If true, file is written in JSON (an array of records), otherwise in CSV (one row per record).\n'
+					' * @return false if file could not be written (errno is set).\n'
+					' */\n'
+					'static bool writeEventRecords(const char *path, bool json) {\n'
+					'	size_t r;\n'
+					'	cl_ulong origin = profileRecordsLen ? profileRecords[0].queued : 0;\n'
+					'	profileRecord_t *p;\n'
+					'	FILE *eventsFile;\n'
+					'\n'
+					'	for(r = 1; r < profileRecordsLen; r++) {\n'
+					'		if(profileRecords[r].queued < origin)\n'
+					'			origin = profileRecords[r].queued;\n'
+					'	}\n'
+					'\n'
+					'	eventsFile = fopen(path, "w");\n'
+					'	if(!eventsFile)\n'
+					'		return false;\n'
+					'\n'
+					'	if(json)\n'
+					'		fprintf(eventsFile, "[");\n'
+					'	else\n'
+					'		fprintf(eventsFile, "iteration,kind,name,queued_ns,submit_ns,start_ns,end_ns\\n");\n'
+					'\n'
+					'	for(r = 0; r < profileRecordsLen; r++) {\n'
+					'		p = &profileRecords[r];\n'
+					'		fprintf(eventsFile,\n'
+					'			json ? "%s\\n{\\"iteration\\": %d, \\"kind\\": \\"%s\\", \\"name\\": \\"%s\\", \\"queued_ns\\": %llu, \\"submit_ns\\": %llu, \\"start_ns\\": %llu, \\"end_ns\\": %llu}" : "%s%d,%s,%s,%llu,%llu,%llu,%llu\\n",\n'
+					'			(json && r) ? "," : "", p->iteration, p->kind, p->name, (unsigned long long) (p->queued - origin),\n'
+					'			(unsigned long long) (p->submit - origin), (unsigned long long) (p->start - origin), (unsigned long long) (p->end - origin));\n'
+					'	}\n'
+					'\n'
+					'	if(json)\n'
+					'		fprintf(eventsFile, "\\n]\\n");\n'
+					'\n'
+					'	return !fclose(eventsFile);\n'
+					'}\n'
+					'\n'
+				)
+			)
+
+
+	# Print queue declarations for each kernel
+	def printQueueDeclarations(self):
+		f = self._out
+
+		for k in self._descriptor.kernels:
+			if self._descriptor.isMultiDevice():
+				f.write(
+					'	cl_command_queue queue{}[MAX_DEVICES] = {{NULL}};\n'.format(k.title)
+				)
+			else:
+				f.write(
+					'	cl_command_queue queue{} = NULL;\n'.format(k.title)
+				)
+
+			if self._hasTransferQueues():
+				f.write(
+					(
+						'	cl_command_queue writeQueue{0} = NULL;\n'
+						'	cl_command_queue readQueue{0} = NULL;\n'.format(k.title)
+					)
+				)
+
+
+	# Print variable declarations related to the program
+	def printProgramDeclarations(self):
+		f = self._out
+
+		f.write(
+			(
+				'	size_t programSz = 0;\n'
+				'	char *programContent = NULL;\n'
+				'	cl_int programRet;\n'
+				'	cl_program program = NULL;\n'
+			)
+		)
+
+		# Multi-device mode: the same binary is loaded on every device
+		if self._descriptor.isMultiDevice() and "binary" in self._descriptor.attrib:
+			f.write(
+				(
+					'	size_t programSzs[MAX_DEVICES];\n'
+					'	const unsigned char *programContents[MAX_DEVICES];\n'
+					'	cl_int programRets[MAX_DEVICES];\n'
+				)
+			)
+
+		if self._descriptor.binaryCache() is not None:
+			f.write(
+				(
+					'	uint64_t programKey;\n'
+					'	char programCachePath[4096];\n'
+					'	unsigned char *programBinary = NULL;\n'
+					'	size_t programBinarySz = 0;\n'
+				)
+			)
+
+
+	# Print kernel declarations
+	def printKernelDeclarations(self):
+		f = self._out
+
+		for k in self._descriptor.kernels:
+			if self._descriptor.isMultiDevice():
+				f.write(
+					'	cl_kernel kernel{}[MAX_DEVICES] = {{NULL}};\n'.format(k.title)
+				)
+			else:
+				f.write(
+					'	cl_kernel kernel{} = NULL;\n'.format(k.title)
+				)
+
+
+	# Print last declarations: some flags and other stuff
+	def printLastDeclarations(self):
+		f = self._out
+
+		f.write(
+			(
+				'	bool loopFlag = false;\n'
+				'	bool invalidDataFound = false;\n'
+			)
+		)
+
+		# Validation counts mismatches and finds the worst element of each output, or hashes it
+		if self._hasValidation():
+			f.write(
+				(
+					'	size_t idx, mismatches, worstIndex, printed;\n'
+					'	double maxAbsError, maxRelError;\n'
+				)
+			)
+		elif self._hasDigests():
+			f.write(
+				'	size_t idx;\n'
+			)
+		if self._hasDigests():
+			f.write(
+				(
+					'	xxh64State_t digestState;\n'
+					'	uint64_t digest;\n'
+				)
+			)
+
+		# Pipelined loop: iteration counters and one set of buffers per iteration in flight
+		depth = self._descriptor.pipelineDepth()
+		if depth > 1:
+			f.write(
+				(
+					'	int issued = 0, retired = 0, slot = 0;\n'
+					'	bool issuing = true;\n'
+				)
+			)
+
+			for k, v in self._pipelinedVariables():
+				f.write(
+					(
+						'	cl_mem {0}KSlots[{2}] = {{NULL}};\n'
+						'	{1} *{0}Stage[{2}] = {{NULL}};\n'.format(v.name, v.type, depth)
+					)
+				)
+
+			for v in self._stagedScalars():
+				f.write(
+					'	{1} {0}Stage[{2}];\n'.format(v.name, v.type, depth)
+				)
+
+			# Iterations are timed from the issue of their kernels to their retire
+			if self._descriptor.isProfiled():
+				f.write(
+					'	struct timeval tIssued[{}];\n'.format(depth)
+				)
+
+		# Loop is timed for sweeps of size parameters
+		if self._descriptor.params:
+			f.write(
+				'	struct timeval tLoopStart, tLoopEnd;\n'
+			)
+
+		# If profiling is on, add timer variables
+		if self._descriptor.isProfiled():
+			f.write(
+				(
+					'	long totalTime;\n'
+					'	struct timeval tThen, tNow, tDelta, tExecTime;\n'
+					'	timerclear(&tExecTime);\n'
+				)
+			)
+
+		# Multi-device mode: selected devices and the part of the global range of each kernel run by each of them
+		if self._descriptor.isMultiDevice():
+			indexes = self._descriptor.deviceIndexes()
+			if indexes is not None:
+				f.write(
+					'	cl_uint deviceIndexes[MAX_DEVICES] = {{{}}};\n'.format(", ".join(str(i) for i in indexes))
+				)
+
+			f.write(
+				(
+					'	cl_device_id selectedDevices[MAX_DEVICES];\n'
+					'	cl_uint nDevices = 0, devIdx;\n'
+					'	size_t chunk;\n'
+				)
+			)
+
+			for k in self._descriptor.kernels:
+				f.write(
+					(
+						'	size_t offset{0}[MAX_DEVICES][{1}] = {{{{0}}}};\n'
+						'	size_t range{0}[MAX_DEVICES][{1}];\n'.format(k.title, k.dim)
+					)
+				)
+
+		# Iterate through every kernel
+		for k in self._descriptor.kernels:
+			# Kernels without ndrange tag have no work size declarations
+			if not k.hasNDRange:
+				continue
+
+			f.write(
+				'	cl_uint workDim{} = {};\n'.format(k.title, k.dim)
+			)
+
+			# Set global and local (if any) dimensions
+			if k.globalSize is not None:
+				f.write(
+					(
+						'	size_t globalSize{}[{}] = {{\n'
+						'		{}\n'
+						'	}};\n'.format(k.title, k.dim, k.globalSize)
+					)
+				)
+			if k.localSize is not None:
+				f.write(
+					(
+						'	size_t localSize{}[{}] = {{\n'
+						'		{}\n'
+						'	}};\n'.format(k.title, k.dim, k.localSize)
+					)
+				)
+
+			# Autotuning: fastest local size found, used in place of localSize (NULL if choice of runtime is faster)
+			if self._isAutotuned(k):
+				f.write(
+					(
+						'	size_t tunedLocal{0}[{1}] = {{0}};\n'
+						'	size_t *localSizeArg{0} = {2};\n'
+						'	double tunedUs{0} = 0;\n'.format(k.title, k.dim, "localSize{}".format(k.title) if k.localSize is not None else "NULL")
+					)
+				)
+
+
+	# Return True if any output is validated
+	def _hasValidation(self):
+		return any(v.isValidated for k in self._descriptor.kernels for v in k.ioVariables())
+
+
+	# Return True if any output is validated against a digest
+	def _hasDigests(self):
+		return any(v.digest is not None for k in self._descriptor.kernels for v in k.ioVariables())
+
+
+	# Return True if local size of kernel is autotuned (autotune="yes", kernel has a global size)
+	def _isAutotuned(self, k):
+		return self._descriptor.isEnabled("autotune") and k.hasNDRange and k.globalSize is not None
+
+
+	# Return local size argument of clEnqueueNDRangeKernel() for a kernel
+	def _localSizeArg(self, k):
+		if self._isAutotuned(k):
+			return "localSizeArg{}".format(k.title)
+
+		return "localSize{}".format(k.title) if k.localSize is not None else "NULL"
+
+
+	# Print a simple newline
+	def printSeparator(self):
+		self._out.write('\n')
+
+
+	# Return allocation function of an array allocated by the host code
+	def _allocFunction(self, v):
+		return "alignedMalloc" if "hostptr" == self._descriptor.memoryMode(v) else "malloc"
+
+
+	# Print declaration of the mapped pointer of a buffer transferred through map/unmap
+	def _printMappedDeclaration(self, v):
+		if "default" != self._descriptor.memoryMode(v):
+			self._out.write(
+				'	{} *{}Mapped = NULL;\n'.format(v.type, v.name)
+			)
+
+
+	# Print write of an array to its buffer through map/unmap. Region is mapped (blocking) without reading
+	# the buffer, pinned arrays are copied into it and unmap (which sets event, unless NULL) completes the
+	# transfer. With hostptr, the mapped region is the array itself and no copy is needed
+	def _printMappedWrite(self, k, v, indent, event):
+		f = self._out
+
+		f.write(
+			(
+				'{0}{2}Mapped = clEnqueueMapBuffer(queue{1}, {2}K, CL_TRUE, CL_MAP_WRITE_INVALIDATE_REGION, 0, {3} * sizeof({4}), 0, NULL, NULL, &fRet);\n'
+				'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueMapBuffer ({2}K)"));\n'.format(
+					indent, k.title, v.name, v.nmemb, v.type
+				)
+			)
+		)
+
+		if "pinned" == self._descriptor.memoryMode(v):
+			f.write(
+				'{0}memcpy({1}Mapped, {1}, {2} * sizeof({3}));\n'.format(indent, v.name, v.nmemb, v.type)
+			)
+
+		f.write(
+			(
+				'{0}fRet = clEnqueueUnmapMemObject(queue{1}, {2}K, {2}Mapped, 0, NULL, {3});\n'
+				'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueUnmapMemObject ({2}K)"));\n'.format(
+					indent, k.title, v.name, event
+				)
+			)
+		)
+
+
+	# Print read of an array from its buffer through map, waiting on waitList ("<number>, <events>") and
+	# setting event (unless NULL). See _printMappedReadEnd()
+	def _printMappedRead(self, k, v, blocking, waitList, event, indent='		'):
+		self._out.write(
+			(
+				'{7}{1}Mapped = clEnqueueMapBuffer(queue{0}, {1}K, {4}, CL_MAP_READ, 0, {2} * sizeof({3}), {5}, {6}, &fRet);\n'
+				'{7}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueMapBuffer ({1}K)"));\n'.format(
+					k.title, v.name, v.nmemb, v.type, blocking, waitList, event, indent
+				)
+			)
+		)
+
+
+	# Print end of read of an array through map, once the map is complete: pinned arrays are copied from the
+	# mapped region (with hostptr, it is the array itself) and the buffer is unmapped
+	def _printMappedReadEnd(self, k, v, indent):
+		f = self._out
+
+		if "pinned" == self._descriptor.memoryMode(v):
+			f.write(
+				'{0}memcpy({1}, {1}Mapped, {2} * sizeof({3}));\n'.format(indent, v.name, v.nmemb, v.type)
+			)
+
+		f.write(
+			(
+				'{0}fRet = clEnqueueUnmapMemObject(queue{1}, {2}K, {2}Mapped, 0, NULL, NULL);\n'
+				'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueUnmapMemObject ({2}K)"));\n'.format(
+					indent, k.title, v.name
+				)
+			)
+		)
+
+
+	# Print declaration of the buffer of a variable (one per device in multi-device mode, along with the slice
+	# of split arrays transferred to/from each device) and of its mapped pointer, if any
+	def _printDeviceVariableDeclaration(self, v):
+		f = self._out
+
+		if not self._descriptor.isMultiDevice():
+			f.write(
+				'	cl_mem {}K = NULL;\n'.format(v.name)
+			)
+			self._printMappedDeclaration(v)
+			return
+
+		f.write(
+			'	cl_mem {}K[MAX_DEVICES] = {{NULL}};\n'.format(v.name)
+		)
+
+		if v.isSplit:
+			f.write(
+				'	size_t {}Slice[MAX_DEVICES][2];\n'.format(v.name)
+			)
+
+
+	# Print transfers of variables of a kernel between host and every device running part of it (multi-device
+	# mode). Split arrays only transfer the slice of the device, other arrays are transferred whole and single
+	# inputs are set as arguments
+	def _printDeviceTransfers(self, k, variables, write, indent):
+		f = self._out
+		function = "clEnqueueWriteBuffer" if write else "clEnqueueReadBuffer"
+
+		f.write(
+			(
+				'{0}for(devIdx = 0; devIdx < nDevices; devIdx++) {{\n'
+				'{0}	/* Device runs no work-item of this kernel */\n'
+				'{0}	if(!range{1}[devIdx][0])\n'
+				'{0}		continue;\n'
+				'\n'.format(indent, k.title)
+			)
+		)
+
+		for v in variables:
+			if "input" == v.tag and not v.isPointer:
+				f.write(
+					(
+						'{0}	fRet = clSetKernelArg(kernel{1}[devIdx], {2}, sizeof({3}), &{4});\n'
+						'{0}	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({4})"));\n'.format(
+							indent, k.title, v.arg, v.type, v.name
+						)
+					)
+				)
+			elif v.isSplit:
+				f.write(
+					(
+						'{0}	fRet = {1}(queue{2}[devIdx], {3}K[devIdx], CL_TRUE, {3}Slice[devIdx][0] * sizeof({4}), {3}Slice[devIdx][1] * sizeof({4}), {3} + {3}Slice[devIdx][0], 0, NULL, NULL);\n'
+						'{0}	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("{1} ({3}K)"));\n'.format(
+							indent, function, k.title, v.name, v.type
+						)
+					)
+				)
+			else:
+				f.write(
+					(
+						'{0}	fRet = {1}(queue{2}[devIdx], {3}K[devIdx], CL_TRUE, 0, {5} * sizeof({4}), {3}, 0, NULL, NULL);\n'
+						'{0}	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("{1} ({3}K)"));\n'.format(
+							indent, function, k.title, v.name, v.type, v.nmemb
+						)
+					)
+				)
+
+		f.write(
+			'{}}}\n'.format(indent)
+		)
+
+
+	# Print declaration of inputs and outputs of kernels
+	def printVariablesDeclaration(self):
+		f = self._out
+
+		f.write(
+			'	/* Input/output variables */\n'
+		)
+
+		# Iterate through every variable of every kernel. Host variable and buffer of a shared buffer are declared
+		# by its owner only
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if "input" == v.tag and not v.isBufferOwner:
+					continue
+
+				if "input" == v.tag:
+					# Part 1: host variable
+					# Data is mapped from file, after all declarations
+					if v.file is not None:
+						if v.isPointer:
+							f.write(
+								'	{} *{} = NULL;\n'.format(v.type, v.name)
+							)
+						else:
+							f.write(
+								'	{} {};\n'.format(v.type, v.name)
+							)
+						f.write(
+							(
+								'	void *{0}Mapping = NULL;\n'
+								'	size_t {0}MappingSz = 0;\n'.format(v.name)
+							)
+						)
+					# Function is being used instead of explicit variable initialisation
+					elif v.text is None:
+						if v.isPointer:
+							f.write(
+								'	{0} *{1} = {3}({2} * sizeof({0}));\n'.format(v.type, v.name, v.nmemb, self._allocFunction(v))
+							)
+						else:
+							f.write(
+								'	{} {};\n'.format(v.type, v.name)
+							)
+					# Initialisation from data source
+					elif v in self._dataVariables:
+						f.write(
+							'	{0} *{1} = {2};\n'.format(v.type, v.name, self._dataArray(v)[0])
+						)
+					# Explicit variable initialisation
+					# XXX: Note that big variables may lead to stack overflow!
+					else:
+						if v.isPointer:
+							f.write(
+								(
+									'	{} {}[{}] = {{\n'
+									'		'.format(v.type, v.name, v.nmemb)
+								)
+							)
+							self._writeData(v.text)
+							f.write(
+								(
+									'\n'
+									'	};\n'
+								)
+							)
+						else:
+							f.write(
+								'	{} {} = '.format(v.type, v.name)
+							)
+							self._writeData(v.text)
+							f.write(
+								';\n'
+							)
+
+					# Part 2: device variable
+					if v.isPointer:
+						self._printDeviceVariableDeclaration(v)
+				else:
+					# Part 1: host variable
+					# For output, initialisation data must come from PREAMBLE.
+					if v.isBufferOwner and v.isPointer:
+						f.write(
+							'	{0} *{1} = {3}({2} * sizeof({0}));\n'.format(v.type, v.name, v.nmemb, self._allocFunction(v))
+						)
+					elif v.isBufferOwner:
+						f.write(
+							'	{} {};\n'.format(v.type, v.name)
+						)
+
+					# Part 2: validation variable
+					if v.isValidated:
+						# Expected data is mapped from file, after all declarations
+						if v.file is not None:
+							if v.isPointer:
+								f.write(
+									'	{} *{}C = NULL;\n'.format(v.type, v.name)
+								)
+							else:
+								f.write(
+									'	{} {}C;\n'.format(v.type, v.name)
+								)
+							f.write(
+								(
+									'	void *{0}CMapping = NULL;\n'
+									'	size_t {0}CMappingSz = 0;\n'.format(v.name)
+								)
+							)
+						# Function is being used instead of explicit validation variable assignment
+						elif v.text is None:
+							if v.isPointer:
+								f.write(
+									'	{0} *{1}C = malloc({2} * sizeof({0}));\n'.format(v.type, v.name, v.nmemb)
+								)
+							else:
+								f.write(
+									'	{} {}C;\n'.format(v.type, v.name)
+								)
+						# Assignment from data source
+						elif v in self._dataVariables:
+							f.write(
+								'	const {0} *{1}C = {2};\n'.format(v.type, v.name, self._dataArray(v)[0])
+							)
+						# Explicit variable assignment
+						# XXX: Note that big variables may lead to stack overflow!
+						else:
+							if v.isPointer:
+								f.write(
 									(
-										'		fRet = clEnqueueWriteBuffer(queue{0}, {1}K, CL_TRUE, 0, sizeof({2}), &{1}, 0, NULL, NULL);\n'
-										'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
-											k.attrib["name"].title(),
-											v.attrib["name"],
-											v.attrib["type"]
-										)
+										'	{} {}C[{}] = {{\n'
+										'		'.format(v.type, v.name, v.nmemb)
 									)
 								)
+								self._writeData(v.text)
+								f.write(
+									(
+										'\n'
+										'	};\n'
+									)
+								)
+							else:
+								f.write(
+									'	{} {}C = '.format(v.type, v.name)
+								)
+								self._writeData(v.text)
+								f.write(
+									';\n'
+								)
+						# Epsilon variable (if supplied)
+						if v.epsilon is not None:
+							f.write(
+								'	double {}Epsilon = {};\n'.format(v.name, v.epsilon)
+							)
+
+					# Part 3: device variable
+					if v.isBufferOwner:
+						self._printDeviceVariableDeclaration(v)
+
+		# Map data files
+		if self._descriptor.hasDataFiles():
+			f.write(
+				(
+					'	void *mappedData = NULL;\n'
+					'\n'
+					'	/* Map data files */\n'
+					'	PRINT_STEP("Mapping data files...");\n'
+				)
+			)
+
+			for k in self._descriptor.kernels:
+				for v in k.ioVariables():
+					if v.file is None:
+						continue
+
+					# Inputs are mapped into the variable itself, outputs into their validation variable
+					cName = v.name if "input" == v.tag else "{}C".format(v.name)
+					f.write(
+						(
+							'	mappedData = mapDataFile("{0}", {1}, {5}, {6}, {2} * sizeof({3}), {7}, &{4}Mapping, &{4}MappingSz);\n'
+							'	ASSERT_CALL(mappedData, POSIX_ERROR_STATEMENTS("{0}"));\n'.format(
+								v.file, "true" if v.isNpy() else "false", v.nmemb, v.type, cName, *self._npyItem(v),
+								"true" if v.isNpy() and v.nmemb.isdigit() else "false"
+							)
+						)
+					)
+
+					if v.isPointer:
+						f.write(
+							'	{} = mappedData;\n'.format(cName)
+						)
+					else:
+						f.write(
+							'	memcpy(&{0}, mappedData, sizeof({1}));\n'.format(cName, v.type)
+						)
+
+			f.write(
+				'	PRINT_SUCCESS();\n'
+			)
+
+		# Call PREAMBLE function if "preamble" attribute is "yes"
+		if self._descriptor.isEnabled("preamble"):
+			f.write(
+				'\n'
+				'	/* Calling preamble function */\n'
+				'	PRINT_STEP("Calling preamble function...");\n'
+				'	PREAMBLE('
+			)
+
+			# Print arguments
+			firstExec = True
+			for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
+				if not firstExec:
+					f.write(', ')
+				else:
+					firstExec = False
+
+				f.write(v)
+
+				if descriptor.isArraySize(n):
+					f.write(', {}'.format(n))
+
+			f.write(
+				(
+					');\n'
+					'	PRINT_SUCCESS();\n'
+				)
+			)
+
+
+	# Print clGetPlatformIDs section
+	def printGetPlatformIDs(self):
+		f = self._out
+
+		f.write(
+			(
+				'	/* Get platforms IDs */\n'
+				'	PRINT_STEP("Getting platforms IDs...");\n'
+				'	fRet = clGetPlatformIDs(0, NULL, &platformsLen);\n'
+				'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetPlatformIDs"));\n'
+				'	platforms = malloc(platformsLen * sizeof(cl_platform_id));\n'
+				'	fRet = clGetPlatformIDs(platformsLen, platforms, NULL);\n'
+				'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetPlatformIDs"));\n'
+				'	PRINT_SUCCESS();\n'
+			)
+		)
+
+
+	# Print clGetDevicesIDs section
+	def printGetDevicesIDs(self):
+		f = self._out
+
+		f.write(
+			(
+				'	/* Get devices IDs for first platform availble */\n'
+				'	PRINT_STEP("Getting devices IDs for first platform...");\n'
+				'	fRet = clGetDeviceIDs(platforms[{0}], CL_DEVICE_TYPE_ALL, 0, NULL, &devicesLen);\n'
+				'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetDevicesIDs"));\n'
+				'	devices = malloc(devicesLen * sizeof(cl_device_id));\n'
+				'	fRet = clGetDeviceIDs(platforms[{0}], CL_DEVICE_TYPE_ALL, devicesLen, devices, NULL);\n'
+				'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetDevicesIDs"));\n'
+				'	PRINT_SUCCESS();\n'.format(self._descriptor.platform)
+			)
+		)
+
+		if self._descriptor.isMultiDevice():
+			self._printSplitDevices()
+
+
+	# Print selection of devices and split of the global range of each kernel (and of its split arrays) across
+	# them, in multi-device mode. First dimension of global range is split in contiguous parts of (almost) equal
+	# size, multiple of local size (if any); split arrays are sliced in the same proportion
+	def _printSplitDevices(self):
+		f = self._out
+		indexes = self._descriptor.deviceIndexes()
+
+		f.write(
+			(
+				'\n'
+				'	/* Select devices kernels are split across */\n'
+				'	PRINT_STEP("Selecting devices...");\n'
+			)
+		)
+
+		if indexes is None:
+			f.write(
+				(
+					'	nDevices = ((cl_uint) devicesLen < MAX_DEVICES) ? (cl_uint) devicesLen : MAX_DEVICES;\n'
+					'	for(devIdx = 0; devIdx < nDevices; devIdx++)\n'
+					'		selectedDevices[devIdx] = devices[devIdx];\n'
+				)
+			)
+		else:
+			f.write(
+				(
+					'	nDevices = MAX_DEVICES;\n'
+					'	for(devIdx = 0; devIdx < nDevices; devIdx++) {\n'
+					'		ASSERT_CALL(deviceIndexes[devIdx] < (cl_uint) devicesLen, {\n'
+					'			rv = EXIT_FAILURE;\n'
+					'			PRINT_FAIL();\n'
+					'			fprintf(stderr, "Error: device %u not found.\\n", deviceIndexes[devIdx]);\n'
+					'		});\n'
+					'		selectedDevices[devIdx] = devices[deviceIndexes[devIdx]];\n'
+					'	}\n'
+				)
+			)
+
+		f.write(
+			(
+				'	PRINT_SUCCESS();\n'
+				'\n'
+				'	/* Split kernels across devices */\n'
+				'	PRINT_STEP("Splitting kernels across %u devices...", nDevices);\n'
+			)
+		)
+
+		for k in self._descriptor.kernels:
+			f.write(
+				'	chunk = (globalSize{0}[0] + nDevices - 1) / nDevices;\n'.format(k.title)
+			)
+
+			if k.localSize is not None:
+				f.write(
+					'	chunk = ((chunk + localSize{0}[0] - 1) / localSize{0}[0]) * localSize{0}[0];\n'.format(k.title)
+				)
+
+			f.write(
+				(
+					'	for(devIdx = 0; devIdx < nDevices; devIdx++) {{\n'
+					'		memcpy(range{0}[devIdx], globalSize{0}, sizeof(globalSize{0}));\n'
+					'		offset{0}[devIdx][0] = (devIdx * chunk < globalSize{0}[0]) ? devIdx * chunk : globalSize{0}[0];\n'
+					'		range{0}[devIdx][0] = (globalSize{0}[0] - offset{0}[devIdx][0] < chunk) ? globalSize{0}[0] - offset{0}[devIdx][0] : chunk;\n'.format(k.title)
+				)
+			)
+
+			for v in k.ioVariables():
+				if v.isSplit:
+					f.write(
+						(
+							'		{0}Slice[devIdx][0] = ((size_t) {1}) * offset{2}[devIdx][0] / globalSize{2}[0];\n'
+							'		{0}Slice[devIdx][1] = ((size_t) {1}) * (offset{2}[devIdx][0] + range{2}[devIdx][0]) / globalSize{2}[0] - {0}Slice[devIdx][0];\n'.format(
+								v.name, v.nmemb, k.title
+							)
+						)
+					)
+
+			f.write(
+				'	}\n'
+			)
+
+		f.write(
+			'	PRINT_SUCCESS();\n'
+		)
+
+
+	# Print clCreateContext section
+	def printCreateContext(self):
+		f = self._out
+
+		if self._descriptor.isMultiDevice():
+			f.write(
+				(
+					'	/* Create context for selected devices */\n'
+					'	PRINT_STEP("Creating context...");\n'
+					'	context = clCreateContext(NULL, nDevices, selectedDevices, NULL, NULL, &fRet);\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateContext"));\n'
+					'	PRINT_SUCCESS();\n'
+				)
+			)
+			return
+
+		f.write(
+			(
+				'	/* Create context for first available device */\n'
+				'	PRINT_STEP("Creating context...");\n'
+				'	context = clCreateContext(NULL, 1, devices, NULL, NULL, &fRet);\n'
+				'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateContext"));\n'
+				'	PRINT_SUCCESS();\n'
+			)
+		)
+
+
+	# Print clCreateCommandQueues section
+	def printCreateCommandQueues(self):
+		f = self._out
+
+		for k in self._descriptor.kernels:
+			if self._descriptor.isMultiDevice():
+				f.write(
+					(
+						'	/* Create command queues for {0} kernel, one per device */\n'
+						'	PRINT_STEP("Creating command queues for \\"{0}\\"...");\n'
+						'	for(devIdx = 0; devIdx < nDevices; devIdx++) {{\n'
+						'		queue{1}[devIdx] = clCreateCommandQueue(context, selectedDevices[devIdx], 0, &fRet);\n'
+						'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateCommandQueue"));\n'
+						'	}}\n'
+						'	PRINT_SUCCESS();\n'.format(k.name, k.title)
+					)
+				)
+				continue
+
+			f.write(
+				(
+					'	/* Create command queue for {0} kernel */\n'
+					'	PRINT_STEP("Creating command queue for \\"{0}\\"...");\n'
+					'	queue{1} = clCreateCommandQueue(context, devices[{2}], {3}, &fRet);\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateCommandQueue"));\n'
+					'	PRINT_SUCCESS();\n'.format(
+						k.name, k.title, self._descriptor.device,
+						"CL_QUEUE_PROFILING_ENABLE" if self._descriptor.hasEventProfiling() else "0"
+					)
+				)
+			)
+
+			if self._hasTransferQueues():
+				f.write(
+					(
+						'	/* Create transfer queues for {0} kernel */\n'
+						'	PRINT_STEP("Creating transfer queues for \\"{0}\\"...");\n'
+						'	writeQueue{1} = clCreateCommandQueue(context, devices[{2}], {3}, &fRet);\n'
+						'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateCommandQueue"));\n'
+						'	readQueue{1} = clCreateCommandQueue(context, devices[{2}], {3}, &fRet);\n'
+						'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateCommandQueue"));\n'
+						'	PRINT_SUCCESS();\n'.format(
+							k.name, k.title, self._descriptor.device,
+							"CL_QUEUE_PROFILING_ENABLE" if self._descriptor.hasEventProfiling() else "0"
+						)
+					)
+				)
+
+
+	# Print clCreateProgramWithBinary and clBuildProgram section
+	def printCreateAndBuildProgram(self):
+		f = self._out
+		attrib = self._descriptor.attrib
+		filename = attrib["source"] if "source" in attrib else attrib["binary"]
+
+		f.write(
+			(
+				'	/* Map program file (unmapped once program is built) */\n'
+				'	PRINT_STEP("Mapping program file...");\n'
+				'	programContent = mapProgramFile("{0}", &programSz);\n'
+				'	ASSERT_CALL(programContent, POSIX_ERROR_STATEMENTS("{0}"));\n'
+				'	PRINT_SUCCESS();\n'
+				'\n'.format(filename)
+			)
+		)
+
+		options = '"{}"'.format(attrib["buildoptions"]) if "buildoptions" in attrib else "NULL"
+		cacheDir = self._descriptor.binaryCache()
+		indent = '	'
+
+		# Binary cache: program is created from a cached binary if there is one for this source, build options and
+		# device. Otherwise (or if binary is rejected, e.g. after a runtime update) it is built from source and cached
+		if cacheDir is not None:
+			f.write(
+				(
+					'	/* Look up program binary cache */\n'
+					'	PRINT_STEP("Looking up program binary cache...");\n'
+					'	fRet = programCacheKey(devices[0], programContent, programSz, {1}, &programKey);\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetDeviceInfo"));\n'
+					'	snprintf(programCachePath, sizeof(programCachePath), "%s/%016llx.bin", "{0}", (unsigned long long) programKey);\n'
+					'	programBinary = mapProgramFile(programCachePath, &programBinarySz);\n'
+					'	PRINT_SUCCESS();\n'
+					'\n'
+					'	if(programBinary) {{\n'
+					'		/* Create and build program from cached binary */\n'
+					'		PRINT_STEP("Creating program from cached binary...");\n'
+					'		program = clCreateProgramWithBinary(context, 1, devices, &programBinarySz, (const unsigned char **) &programBinary, &programRet, &fRet);\n'
+					'		if(CL_SUCCESS == fRet && CL_SUCCESS == programRet)\n'
+					'			fRet = clBuildProgram(program, 1, devices, {2}, NULL, NULL);\n'
+					'		munmap(programBinary, programBinarySz);\n'
+					'		programBinary = NULL;\n'
+					'\n'
+					'		if(CL_SUCCESS == fRet && CL_SUCCESS == programRet) {{\n'
+					'			PRINT_SUCCESS();\n'
+					'		}}\n'
+					'		else {{\n'
+					'			PRINT_FAIL();\n'
+					'			if(program)\n'
+					'				clReleaseProgram(program);\n'
+					'			program = NULL;\n'
+					'		}}\n'
+					'	}}\n'
+					'\n'
+					'	if(!program) {{\n'.format(cacheDir, options if "NULL" != options else '""', options)
+				)
+			)
+			indent = '		'
+
+		if "binary" in attrib and self._descriptor.isMultiDevice():
+			f.write(
+				(
+					'	/* Create program from binary file, loaded on every device */\n'
+					'	PRINT_STEP("Creating program from binary...");\n'
+					'	for(devIdx = 0; devIdx < nDevices; devIdx++) {\n'
+					'		programSzs[devIdx] = programSz;\n'
+					'		programContents[devIdx] = (const unsigned char *) programContent;\n'
+					'	}\n'
+					'	program = clCreateProgramWithBinary(context, nDevices, selectedDevices, programSzs, programContents, programRets, &fRet);\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithBinary"));\n'
+					'	for(devIdx = 0; devIdx < nDevices; devIdx++) {\n'
+					'		programRet = programRets[devIdx];\n'
+					'		ASSERT_CALL(CL_SUCCESS == programRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithBinary (when loading binary)"));\n'
+					'	}\n'
+					'	PRINT_SUCCESS();\n'
+					'\n'
+				)
+			)
+		elif "binary" in attrib:
+			f.write(
+				(
+					'	/* Create program from binary file */\n'
+					'	PRINT_STEP("Creating program from binary...");\n'
+					'	program = clCreateProgramWithBinary(context, 1, devices, &programSz, (const unsigned char **) &programContent, &programRet, &fRet);\n'
+					'	ASSERT_CALL(CL_SUCCESS == programRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithBinary (when loading binary)"));\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithBinary"));\n'
+					'	PRINT_SUCCESS();\n'
+					'\n'
+				)
+			)
+		else:
+			f.write(
+				(
+					'{0}/* Create program from source file */\n'
+					'{0}PRINT_STEP("Creating program from source...");\n'
+					'{0}program = clCreateProgramWithSource(context, 1, (const char **) &programContent, &programSz, &fRet);\n'
+					'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateProgramWithSource"));\n'
+					'{0}PRINT_SUCCESS();\n'
+					'\n'.format(indent)
+				)
+			)
+
+		f.write(
+			(
+				'{0}/* Build program */\n'
+				'{0}PRINT_STEP("Building program...");\n'
+				'{0}fRet = clBuildProgram(program, {2}, {1}, NULL, NULL);\n'
+				'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clBuildProgram"));\n'
+				'{0}PRINT_SUCCESS();\n'.format(
+					indent, options, "nDevices, selectedDevices" if self._descriptor.isMultiDevice() else "1, devices"
+				)
+			)
+		)
+
+		# Failing to save binary is not fatal: program is just built again next time
+		if cacheDir is not None:
+			f.write(
+				(
+					'\n'
+					'		/* Save program binary to cache */\n'
+					'		PRINT_STEP("Saving program binary to cache...");\n'
+					'		if(saveCachedBinary("{0}", programCachePath, program)) {{\n'
+					'			PRINT_SUCCESS();\n'
+					'		}}\n'
+					'		else {{\n'
+					'			PRINT_FAIL();\n'
+					'		}}\n'
+					'	}}\n'.format(cacheDir)
+				)
+			)
+
+		f.write(
+			(
+				'\n'
+				'	/* Program is built, its file is no longer needed */\n'
+				'	munmap(programContent, programSz);\n'
+				'	programContent = NULL;\n'
+			)
+		)
+
+
+	# Print clCreateKernel for each kernel
+	def printCreateKernels(self):
+		f = self._out
+
+		for k in self._descriptor.kernels:
+			# Multi-device mode: one kernel per device, as each one has its own buffers as arguments
+			if self._descriptor.isMultiDevice():
+				f.write(
+					(
+						'	/* Create {0} kernel, one per device */\n'
+						'	PRINT_STEP("Creating kernel \\"{0}\\" from program...");\n'
+						'	for(devIdx = 0; devIdx < nDevices; devIdx++) {{\n'
+						'		kernel{1}[devIdx] = clCreateKernel(program, "{0}", &fRet);\n'
+						'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateKernel"));\n'
+						'	}}\n'
+						'	PRINT_SUCCESS();\n'.format(k.name, k.title)
+					)
+				)
+				continue
+
+			f.write(
+				(
+					'	/* Create {0} kernel */\n'
+					'	PRINT_STEP("Creating kernel \\"{0}\\" from program...");\n'
+					'	kernel{1} = clCreateKernel(program, "{0}", &fRet);\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateKernel"));\n'
+					'	PRINT_SUCCESS();\n'.format(k.name, k.title)
+				)
+			)
+
+
+	# Print clCreateBuffer for all buffered variables
+	def printCreateBuffers(self):
+		f = self._out
+
+		f.write(
+			(
+				'	/* Create input and output buffers */\n'
+				'	PRINT_STEP("Creating buffers...");\n'
+			)
+		)
+
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if v.isBufferOwner and (v.isPointer or "output" == v.tag):
+					mode = self._descriptor.memoryMode(v)
+					flags = "CL_MEM_READ_ONLY" if v.isReadOnly else "CL_MEM_READ_WRITE"
+					if "pinned" == mode:
+						flags += " | CL_MEM_ALLOC_HOST_PTR"
+					elif "hostptr" == mode:
+						flags += " | CL_MEM_USE_HOST_PTR"
+
+					# Multi-device mode: buffers have the whole array on every device, only slices of split arrays
+					# are transferred
+					if self._descriptor.isMultiDevice():
+						f.write(
+							(
+								'	for(devIdx = 0; devIdx < nDevices; devIdx++) {{\n'
+								'		{0}K[devIdx] = clCreateBuffer(context, {3}, {1} * sizeof({2}), NULL, &fRet);\n'
+								'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateBuffer ({0}K)"));\n'
+								'	}}\n'.format(v.name, v.nmemb, v.type, flags)
+							)
+						)
+						continue
+
+					f.write(
+						(
+							'	{0}K = clCreateBuffer(context, {3}, {1} * sizeof({2}), {4}, &fRet);\n'
+							'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateBuffer ({0}K)"));\n'.format(
+								v.name, v.nmemb, v.type, flags, v.name if "hostptr" == mode else "NULL"
+							)
+						)
+					)
+
+		# Pipelined loop: first set is the buffer created above, the others are alike. Each set has a host
+		# staging area, so that loop pre/postamble functions may change variables while transfers are in flight
+		depth = self._descriptor.pipelineDepth()
+		if depth > 1:
+			for k, v in self._pipelinedVariables():
+				f.write(
+					(
+						'	{0}KSlots[0] = {0}K;\n'
+						'	for(j = 1; j < {1}; j++) {{\n'
+						'		{0}KSlots[j] = clCreateBuffer(context, {2}, {3} * sizeof({4}), NULL, &fRet);\n'
+						'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clCreateBuffer ({0}KSlots)"));\n'
+						'	}}\n'
+						'	for(j = 0; j < {1}; j++) {{\n'
+						'		{0}Stage[j] = malloc({3} * sizeof({4}));\n'
+						'		ASSERT_CALL({0}Stage[j], POSIX_ERROR_STATEMENTS("{0}Stage"));\n'
+						'	}}\n'.format(
+							v.name, depth, "CL_MEM_READ_ONLY" if "input" == v.tag else "CL_MEM_READ_WRITE", v.nmemb, v.type
+						)
+					)
+				)
+
+		f.write(
+			'	PRINT_SUCCESS();\n'
+		)
+
+
+	# Print clSetKernelArgs for all kernels arguments
+	def printSetKernelsArgs(self):
+		f = self._out
+
+		if self._descriptor.isMultiDevice():
+			self._printSetDevicesKernelsArgs()
+			return
+
+		for k in self._descriptor.kernels:
+			f.write(
+				(
+					'	/* Set kernel arguments for {0} */\n'
+					'	PRINT_STEP("Setting kernel arguments for \\"{0}\\"...");\n'.format(k.name)
+				)
+			)
+
+			for v in k.variables:
+				# If it is an input variable and its size is 1, send the variable explicitely
+				if "input" == v.tag and not v.isPointer:
+					f.write(
+						(
+							'	fRet = clSetKernelArg(kernel{0}, {1}, sizeof({2}), &{3});\n'
+							'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({3})"));\n'.format(
+								k.title, v.arg, v.type, v.name
+							)
+						)
+					)
+				elif "input" == v.tag or "output" == v.tag:
+					f.write(
+						(
+							'	fRet = clSetKernelArg(kernel{0}, {1}, sizeof(cl_mem), &{2}K);\n'
+							'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({2}K)"));\n'.format(k.title, v.arg, v.name)
+						)
+					)
+				# Arguments with __local keyword
+				else:
+					f.write(
+						(
+							'	fRet = clSetKernelArg(kernel{0}, {1}, {2} * sizeof({3}), NULL);\n'
+							'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg (__local {1})"));\n'.format(
+								k.title, v.arg, v.nmemb, v.type
+							)
+						)
+					)
+
+			f.write(
+				'	PRINT_SUCCESS();\n'
+			)
+
+		if self._descriptor.isEnabled("autotune"):
+			self._printAutotune()
+
+		# Buffers not written at each iteration are written once here (single constant inputs were set above)
+		constants = [
+			(k, v) for k in self._descriptor.kernels for v in k.ioVariables()
+			if (v.isPointer or "output" == v.tag) and v.isWrittenOnce()
+		]
+		if constants:
+			f.write(
+				(
+					'	/* Write buffers constant across iterations */\n'
+					'	PRINT_STEP("Writing constant buffers...");\n'
+				)
+			)
+
+			for k, v in constants:
+				self._printBlockingWrite(k, v)
+
+			f.write(
+				'	PRINT_SUCCESS();\n'
+			)
+
+
+	# Print blocking write of a buffer from its host variable, outside of the loop
+	def _printBlockingWrite(self, k, v):
+		if "default" != self._descriptor.memoryMode(v):
+			self._printMappedWrite(k, v, '	', "NULL")
+		else:
+			self._out.write(
+				(
+					'	fRet = clEnqueueWriteBuffer(queue{0}, {1}K, CL_TRUE, 0, {2} * sizeof({3}), {4}{1}, 0, NULL, NULL);\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
+						k.title, v.name, v.nmemb, v.type, "" if v.isPointer else "&"
+					)
+				)
+			)
+
+
+	# Print autotuning of local sizes: buffers are written with initial data, then every candidate local size of each
+	# kernel is timed and the fastest one is used by the loop. Buffers written once are written again afterwards
+	# (see printSetKernelsArgs()), since kernel runs may have changed them
+	def _printAutotune(self):
+		f = self._out
+		kernels = [k for k in self._descriptor.kernels if self._isAutotuned(k)]
+		if not kernels:
+			return
+
+		f.write(
+			(
+				'	/* Autotune local sizes */\n'
+				'	PRINT_STEP("Writing buffers for autotuning...");\n'
+			)
+		)
+
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if (v.isPointer or "output" == v.tag) and v.isHostWritten:
+					self._printBlockingWrite(k, v)
+
+		f.write(
+			'	PRINT_SUCCESS();\n'
+		)
+
+		for k in kernels:
+			f.write(
+				(
+					'	PRINT_STEP("Autotuning local size of \\"{0}\\"...");\n'
+					'	fRet = autotuneKernel(queue{1}, kernel{1}, devices[{2}], workDim{1}, globalSize{1}, tunedLocal{1}, &tunedUs{1});\n'
+					'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("autotuneKernel ({0})"));\n'
+					'	localSizeArg{1} = tunedLocal{1}[0] ? tunedLocal{1} : NULL;\n'
+					'	PRINT_SUCCESS();\n'.format(k.name, k.title, self._descriptor.device)
+				)
+			)
+
+		f.write(
+			'	printf("Fastest local sizes (%d runs per candidate):\\n", AUTOTUNE_REPETITIONS);\n'
+		)
+
+		for k in kernels:
+			f.write(
+				'	printAutotuneResult("{0}", workDim{1}, globalSize{1}, tunedLocal{1}, tunedUs{1});\n'.format(k.name, k.title)
+			)
+
+
+	# Print clSetKernelArgs of the kernels of every device and write of constant buffers, in multi-device mode
+	def _printSetDevicesKernelsArgs(self):
+		f = self._out
+
+		for k in self._descriptor.kernels:
+			f.write(
+				(
+					'	/* Set kernel arguments for {0} */\n'
+					'	PRINT_STEP("Setting kernel arguments for \\"{0}\\"...");\n'
+					'	for(devIdx = 0; devIdx < nDevices; devIdx++) {{\n'.format(k.name)
+				)
+			)
+
+			for v in k.variables:
+				if "input" == v.tag and not v.isPointer:
+					f.write(
+						(
+							'		fRet = clSetKernelArg(kernel{0}[devIdx], {1}, sizeof({2}), &{3});\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({3})"));\n'.format(
+								k.title, v.arg, v.type, v.name
+							)
+						)
+					)
+				elif "input" == v.tag or "output" == v.tag:
+					f.write(
+						(
+							'		fRet = clSetKernelArg(kernel{0}[devIdx], {1}, sizeof(cl_mem), &{2}K[devIdx]);\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({2}K)"));\n'.format(k.title, v.arg, v.name)
+						)
+					)
+				else:
+					f.write(
+						(
+							'		fRet = clSetKernelArg(kernel{0}[devIdx], {1}, {2} * sizeof({3}), NULL);\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg (__local {1})"));\n'.format(
+								k.title, v.arg, v.nmemb, v.type
+							)
+						)
+					)
+
+			f.write(
+				(
+					'	}\n'
+					'	PRINT_SUCCESS();\n'
+				)
+			)
+
+		# Buffers not written at each iteration are written once here
+		constants = {}
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if v.isPointer and v.isWrittenOnce():
+					constants.setdefault(k, []).append(v)
+
+		if constants:
+			f.write(
+				(
+					'	/* Write buffers constant across iterations */\n'
+					'	PRINT_STEP("Writing constant buffers...");\n'
+				)
+			)
+
+			for k, variables in constants.items():
+				self._printDeviceTransfers(k, variables, True, '	')
+
+			f.write(
+				'	PRINT_SUCCESS();\n'
+			)
+
+
+	# Kernels grouped by level in the dependency graph, in order: kernels of a group only depend on kernels of
+	# previous groups (a single group if kernels have no dependencies)
+	def _kernelGroups(self):
+		d = self._descriptor
+		deps = d.dependencies()
+		levels = {}
+
+		# Kernels only depend on kernels of lower order, or of same order and declared before them
+		for k in sorted(d.kernels, key=lambda k: k.order or 0):
+			levels[k] = max((levels[o] + 1 for o in deps[k]), default=0)
+
+		groups = {}
+		for k in d.kernels:
+			groups.setdefault(levels[k], []).append(k)
+
+		return [groups[l] for l in sorted(groups)]
+
+
+	# Return True if any kernel has to wait for other kernels
+	def _hasDependencies(self):
+		return any(self._descriptor.dependencies().values())
+
+
+	# Return True if each kernel has a write and a read queue besides its own, so that transfers overlap kernels
+	# (in the pipelined loop, also the kernels of the same queue in other iterations). Transfers are then ordered
+	# only by events: kernels wait on their writes, reads wait on their kernel
+	def _hasTransferQueues(self):
+		return self._descriptor.isEnabled("nonblocking") or self._descriptor.pipelineDepth() > 1
+
+
+	# Return queue of kernel k on which variable v is transferred at each iteration ("write" or "read" queue).
+	# Mapped arrays stay on the queue of the kernel, so that they are unmapped before the kernel uses them
+	def _transferQueue(self, k, v, direction):
+		if self._hasTransferQueues() and "default" == self._descriptor.memoryMode(v):
+			return "{}Queue{}".format(direction, k.title)
+
+		return "queue{}".format(k.title)
+
+
+	# Print wait for kernels without reads, which are not covered by the wait on the reads of an iteration,
+	# so that transfer queues do not overwrite their buffers while they run
+	def _printWaitUnreadKernels(self, indent, slot):
+		f = self._out
+		reads = self._readIndexes()
+
+		if not reads:
+			return
+
+		for k, index, nWrites, previous in self._eventChains():
+			if not any(v.isReadEachIteration() for v in k.ioVariables()):
+				f.write(
+					(
+						'{0}fRet = clWaitForEvents(1, &kernelEvents{1}[{2}]);\n'
+						'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clWaitForEvents"));\n'.format(indent, slot, index)
+					)
+				)
+
+
+	# Variables of a kernel written to the device at each iteration (single inputs are set as arguments)
+	def _writtenVariables(self, k):
+		return [v for v in k.ioVariables() if (v.isPointer or "input" != v.tag) and v.isWrittenEachIteration()]
+
+
+	# Return list of (kernel, index of kernel in kernelEvents, number of written variables, indexes of kernels
+	# it depends on), following _kernelGroups() order. Kernels wait on the events of their writes (non-blocking
+	# transfers) and on the events of the kernels they depend on
+	def _eventChains(self):
+		deps = self._descriptor.dependencies()
+		indexes = {}
+		chains = []
+
+		for group in self._kernelGroups():
+			for k in group:
+				indexes[k] = len(indexes)
+				chains.append((k, indexes[k], len(self._writtenVariables(k)), [indexes[o] for o in deps[k]]))
+
+		return chains
+
+
+	# Print call to LOOPPREAMBLE or LOOPPOSTAMBLE, indented by indent
+	def _printLoopAmble(self, macro, description, indent):
+		f = self._out
+
+		f.write(
+			(
+				'{0}/* Calling loop {1} function */\n'
+				'{0}PRINT_STEP("[%d] Calling loop {1} function...", i);\n'
+				'{0}{2}('.format(indent, description, macro)
+			)
+		)
+
+		for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
+			f.write(
+				'{}, '.format(v)
+			)
+
+			if descriptor.isArraySize(n):
+				f.write('{}, '.format(n))
+
+		f.write(
+			(
+				'loopFlag);\n'
+				'{}PRINT_SUCCESS();\n'.format(indent)
+			)
+		)
+
+
+	# Variables transferred through sets of buffers in the pipelined loop, as (kernel, variable)
+	def _pipelinedVariables(self):
+		return [(k, v) for k in self._descriptor.kernels for v in self._writtenVariables(k)]
+
+
+	# Return scalar inputs passed by value at each iteration of pipelined loop, which are staged per buffer set so
+	# that loop postamble sees the ones of the retired iteration
+	def _stagedScalars(self):
+		if not self._descriptor.isEnabled("looppostamble"):
+			return []
+
+		return [v for k in self._descriptor.kernels for v in k.ioVariables() if "input" == v.tag and not v.isPointer and v.isWrittenEachIteration()]
+
+
+	# Return dict of output variable -> index in readEvents, following _eventChains() order
+	def _readIndexes(self):
+		indexes = {}
+
+		for k, index, nWrites, previous in self._eventChains():
+			for v in k.ioVariables():
+				if v.isReadEachIteration():
+					indexes[v] = len(indexes)
+
+		return indexes
+
+
+	# Print release of the events of an iteration (slot is the index of the iteration in pipelined loop, or
+	# empty). If commands are profiled on the device, events are recorded (and released) by recordEvent()
+	def _printReleaseEvents(self, indent, slot):
+		f = self._out
+		d = self._descriptor
+		chains = self._eventChains()
+		reads = self._readIndexes()
+
+		if not d.hasEventProfiling():
+			for k, index, nWrites, previous in chains:
+				if nWrites > 0:
+					f.write(
+						(
+							'{0}for(j = 0; j < {2}; j++)\n'
+							'{0}	clReleaseEvent(waitEvents{1}{3}[j]);\n'.format(indent, k.title, nWrites, slot)
+						)
+					)
+
+			f.write(
+				(
+					'{0}for(j = 0; j < {1}; j++)\n'
+					'{0}	clReleaseEvent(kernelEvents{2}[j]);\n'.format(indent, len(d.kernels), slot)
+				)
+			)
+
+			if reads:
+				f.write(
+					(
+						'{0}for(j = 0; j < {1}; j++)\n'
+						'{0}	clReleaseEvent(readEvents{2}[j]);\n'.format(indent, len(reads), slot)
+					)
+				)
+
+			return
+
+		records = []
+		for k, index, nWrites, previous in chains:
+			for j, v in enumerate(self._writtenVariables(k)):
+				records.append(("waitEvents{}{}[{}]".format(k.title, slot, j), "write", v.name))
+		for k, index, nWrites, previous in chains:
+			records.append(("kernelEvents{}[{}]".format(slot, index), "kernel", k.name))
+		for v, index in reads.items():
+			records.append(("readEvents{}[{}]".format(slot, index), "read", v.name))
+
+		for event, kind, name in records:
+			f.write(
+				(
+					'{0}fRet = recordEvent({1}, "{2}", "{3}", i);\n'
+					'{0}ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clGetEventProfilingInfo ({3})"));\n'.format(
+						indent, event, kind, name
+					)
+				)
+			)
+
+
+	# Print loop header and first calls
+	def printLoopHeader(self):
+		f = self._out
+		d = self._descriptor
+
+		if d.params:
+			f.write(
+				'	gettimeofday(&tLoopStart, NULL);\n'
+			)
+
+		if d.pipelineDepth() > 1:
+			self._printPipelineIssue()
+			return
+
+		f.write('	do {\n')
+
+		# Events of non-blocking transfers and kernels (or of all commands, if profiled on the device),
+		# released at the end of each iteration. Blocking transfers only need kernel events for dependencies
+		# (multi-device mode waits for each group of kernels instead)
+		nonBlocking = d.isEnabled("nonblocking")
+		withEvents = nonBlocking or d.hasEventProfiling()
+		if withEvents or (self._hasDependencies() and not d.isMultiDevice()):
+			nOutputs = sum(1 for k in d.kernels for v in k.ioVariables() if v.isReadEachIteration())
+
+			for k, index, nWrites, previous in self._eventChains():
+				nWait = (nWrites if withEvents else 0) + len(previous)
+				if nWait > 0:
+					f.write(
+						'		cl_event waitEvents{}[{}];\n'.format(k.title, nWait)
+					)
+
+			f.write(
+				'		cl_event kernelEvents[{}];\n'.format(len(d.kernels))
+			)
+
+			if withEvents and nOutputs > 0:
+				f.write(
+					'		cl_event readEvents[{}];\n'.format(nOutputs)
+				)
+
+			f.write('\n')
+
+		# Call LOOPPREAMBLE if set
+		if self._descriptor.isEnabled("looppreamble"):
+			self._printLoopAmble("LOOPPREAMBLE", "preamble", '		')
+			f.write('\n')
+
+		f.write(
+			(
+				'		/* Setting input and output buffers */\n'
+				'		PRINT_STEP("[%d] Setting buffers...", i);\n'
+			)
+		)
+
+		# Multi-device mode: each device gets the data of its part of the kernel
+		if d.isMultiDevice():
+			for k in d.kernels:
+				variables = [v for v in k.ioVariables() if v.isWrittenEachIteration()]
+				if variables:
+					self._printDeviceTransfers(k, variables, True, '		')
+
+			f.write(
+				'		PRINT_SUCCESS();\n'
+			)
+
+			return
+
+		# For each kernel, set the input/output data. Writes record their events in the wait list of the
+		# kernel
+		for k in self._descriptor.kernels:
+			nWrites = 0
+			for v in k.ioVariables():
+				# Constant and accumulated data is sent once, before the loop (see printSetKernelsArgs())
+				if not v.isWrittenEachIteration():
+					continue
+
+				# clEnqueueWriteBuffer for arrays, clSetKernelArg for single input
+				if "input" == v.tag and not v.isPointer:
+					f.write(
+						(
+							'		fRet = clSetKernelArg(kernel{0}, {1}, sizeof({2}), &{3});\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({3})"));\n'.format(
+								k.title, v.arg, v.type, v.name
+							)
+						)
+					)
+				elif v.isPointer and "default" != d.memoryMode(v):
+					self._printMappedWrite(k, v, '		', "&waitEvents{}[{}]".format(k.title, nWrites) if withEvents else "NULL")
+					nWrites += 1
+				elif v.isPointer:
+					f.write(
+						(
+							'		fRet = clEnqueueWriteBuffer({6}, {1}K, {4}, 0, {2} * sizeof({3}), {1}, 0, NULL, {5});\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
+								k.title, v.name, v.nmemb, v.type,
+								"CL_FALSE" if nonBlocking else "CL_TRUE",
+								"&waitEvents{}[{}]".format(k.title, nWrites) if withEvents else "NULL",
+								self._transferQueue(k, v, "write")
+							)
+						)
+					)
+					nWrites += 1
+				else:
+					f.write(
+						(
+							'		fRet = clEnqueueWriteBuffer({5}, {1}K, {3}, 0, sizeof({2}), &{1}, 0, NULL, {4});\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
+								k.title, v.name, v.type,
+								"CL_FALSE" if nonBlocking else "CL_TRUE",
+								"&waitEvents{}[{}]".format(k.title, nWrites) if withEvents else "NULL",
+								self._transferQueue(k, v, "write")
+							)
+						)
+					)
+					nWrites += 1
+
+		# Submit writes, so that uploads start while kernels are enqueued
+		if self._hasTransferQueues():
+			for k in self._descriptor.kernels:
+				f.write(
+					'		clFlush(writeQueue{});\n'.format(k.title)
+				)
+
+		f.write(
+			'		PRINT_SUCCESS();\n'
+		)
+
+
+	# Print clEnqueueNDRangeKernel for all kernels
+	def printEnqueueKernel(self):
+		f = self._out
+		d = self._descriptor
+		profile = d.isProfiled()
+		eventProfiling = d.hasEventProfiling()
+
+		if d.pipelineDepth() > 1:
+			self._printPipelineKernels()
+			return
+
+		if d.isMultiDevice():
+			self._printDevicesKernels()
+			return
+
+		# Non-blocking transfers: kernels wait on their writes and on the kernels they depend on, no
+		# synchronisation here (see printEnqueueReadBuffer())
+		if d.isEnabled("nonblocking"):
+			f.write(
+				'		PRINT_STEP("[%d] Running kernels...", i);\n'
+			)
+
+			if profile:
+				f.write(
+					'		gettimeofday(&tThen, NULL);\n'
+				)
+
+			for k, index, nWrites, previous in self._eventChains():
+				for j, p in enumerate(previous):
+					f.write(
+						'		waitEvents{}[{}] = kernelEvents[{}];\n'.format(k.title, nWrites + j, p)
+					)
+
+				nWait = nWrites + len(previous)
+				f.write(
+					(
+						'		fRet = clEnqueueNDRangeKernel(queue{0}, kernel{0}, workDim{0}, NULL, globalSize{0}, {1}, {2}, {3}, &kernelEvents[{4}]);\n'
+						'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueNDRangeKernel"));\n'.format(
+							k.title,
+							self._localSizeArg(k),
+							nWait,
+							"waitEvents{}".format(k.title) if nWait > 0 else "NULL",
+							index
+						)
+					)
+				)
+
+			# Submit everything enqueued so far, so that devices work while reads are being enqueued
+			for k in d.kernels:
+				f.write(
+					'		clFlush(queue{});\n'.format(k.title)
+				)
+
+			f.write(
+				'		PRINT_SUCCESS();\n'
+			)
+
+			return
+
+		# Blocking transfers: each kernel waits on the kernels it depends on, then the host waits for all of them
+		withEvents = eventProfiling or self._hasDependencies()
+		f.write(
+			'		PRINT_STEP("[%d] Running kernels...", i);\n'
+		)
+
+		# If profiling is on, get "then"
+		if profile:
+			f.write(
+				'		gettimeofday(&tThen, NULL);\n'
+			)
+
+		for k, index, nWrites, previous in self._eventChains():
+			# Writes only have events (first ones of the wait list) if profiled
+			nWrites = nWrites if eventProfiling else 0
+			for j, p in enumerate(previous):
+				f.write(
+					'		waitEvents{}[{}] = kernelEvents[{}];\n'.format(k.title, nWrites + j, p)
+				)
+
+			f.write(
+				(
+					'		fRet = clEnqueueNDRangeKernel(queue{0}, kernel{0}, workDim{0}, NULL, globalSize{0}, {1}, {2}, {3}, {4});\n'
+					'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueNDRangeKernel"));\n'.format(
+						k.title,
+						self._localSizeArg(k),
+						len(previous),
+						"&waitEvents{}[{}]".format(k.title, nWrites) if previous else "NULL",
+						"&kernelEvents[{}]".format(index) if withEvents else "NULL"
+					)
+				)
+			)
+
+		# Independent kernels run concurrently on their own queues: all queues are submitted before waiting on
+		# any of them (kernels may wait on events of other queues)
+		if len(d.kernels) > 1:
+			for k in d.kernels:
+				f.write(
+					'		clFlush(queue{});\n'.format(k.title)
+				)
+
+		for k in d.kernels:
+			f.write(
+				'		clFinish(queue{});\n'.format(k.title)
+			)
+
+		# If profiling is on, get "now"
+		if profile:
+			f.write(
+				'		gettimeofday(&tNow, NULL);\n'
+			)
+
+		# Profiled events are released once recorded (see printEnqueueReadBuffer())
+		if withEvents and not eventProfiling:
+			f.write(
+				(
+					'		for(j = 0; j < {0}; j++)\n'
+					'			clReleaseEvent(kernelEvents[j]);\n'.format(len(d.kernels))
+				)
+			)
+
+		f.write(
+			'		PRINT_SUCCESS();\n'
+		)
+
+
+	# Print clEnqueueNDRangeKernel of every part of all kernels, in multi-device mode. Parts of a group of kernels
+	# (see _kernelGroups()) are flushed as soon as enqueued so that devices run them concurrently, and the group
+	# is over once all queues are finished
+	def _printDevicesKernels(self):
+		f = self._out
+
+		f.write(
+			'		PRINT_STEP("[%d] Running kernels...", i);\n'
+		)
+
+		if self._descriptor.isProfiled():
+			f.write(
+				'		gettimeofday(&tThen, NULL);\n'
+			)
+
+		for group in self._kernelGroups():
+			f.write(
+				'		for(devIdx = 0; devIdx < nDevices; devIdx++) {\n'
+			)
+
+			for k in group:
+				f.write(
+					(
+						'			if(range{0}[devIdx][0]) {{\n'
+						'				fRet = clEnqueueNDRangeKernel(queue{0}[devIdx], kernel{0}[devIdx], workDim{0}, offset{0}[devIdx], range{0}[devIdx], {1}, 0, NULL, NULL);\n'
+						'				ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueNDRangeKernel"));\n'
+						'				clFlush(queue{0}[devIdx]);\n'
+						'			}}\n'.format(k.title, self._localSizeArg(k))
+					)
+				)
+
+			f.write(
+				(
+					'		}\n'
+					'		for(devIdx = 0; devIdx < nDevices; devIdx++) {\n'
+				)
+			)
+
+			for k in group:
+				f.write(
+					'			clFinish(queue{}[devIdx]);\n'.format(k.title)
+				)
+
+			f.write(
+				'		}\n'
+			)
+
+		if self._descriptor.isProfiled():
+			f.write(
+				'		gettimeofday(&tNow, NULL);\n'
+			)
+
+		f.write(
+			'		PRINT_SUCCESS();\n'
+		)
+
+
+	# Print clEnqueueReadBuffer section
+	def printEnqueueReadBuffer(self):
+		f = self._out
+		# Pipelined loop reads inside the issue block
+		indent = '			' if self._descriptor.pipelineDepth() > 1 else '		'
+
+		f.write(
+			(
+				'{0}/* Get output buffers */\n'
+				'{0}PRINT_STEP("[%d] Getting kernels arguments...", i);\n'.format(indent)
+			)
+		)
+
+		if self._descriptor.pipelineDepth() > 1:
+			self._printPipelineReads()
+			return
+
+		if self._descriptor.isEnabled("nonblocking"):
+			self._printNonBlockingReads()
+			return
+
+		# Multi-device mode: slices of every device are merged into the host arrays
+		if self._descriptor.isMultiDevice():
+			for k in self._descriptor.kernels:
+				variables = [v for v in k.ioVariables() if v.isReadEachIteration()]
+				if variables:
+					self._printDeviceTransfers(k, variables, False, '		')
+
+			f.write(
+				'		PRINT_SUCCESS();\n'
+			)
+
+			return
+
+		eventProfiling = self._descriptor.hasEventProfiling()
+		reads = self._readIndexes()
+
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if v.isReadEachIteration() and "default" != self._descriptor.memoryMode(v):
+					self._printMappedRead(k, v, "CL_TRUE", "0, NULL", "&readEvents[{}]".format(reads[v]) if eventProfiling else "NULL")
+					self._printMappedReadEnd(k, v, '		')
+				elif v.isReadEachIteration():
+					f.write(
+						'		fRet = clEnqueueReadBuffer(queue{0}, {1}K, CL_TRUE, 0, {2} * sizeof({3}), {4}{1}, 0, NULL, {5});\n'.format(
+							k.title, v.name, v.nmemb, v.type, "" if v.isPointer else "&",
+							"&readEvents[{}]".format(reads[v]) if eventProfiling else "NULL"
+						)
+					)
+
+		f.write(
+			'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueReadBuffer"));\n'
+		)
+
+		if eventProfiling:
+			self._printReleaseEvents('		', '')
+
+		f.write(
+			'		PRINT_SUCCESS();\n'
+		)
+
+
+	# Print non-blocking reads, each waiting on its kernel, followed by the single synchronisation point of
+	# the iteration and the release of all its events
+	def _printNonBlockingReads(self):
+		f = self._out
+		d = self._descriptor
+		nReads = 0
+
+		for k, index, nWrites, previous in self._eventChains():
+			for v in k.ioVariables():
+				if v.isReadEachIteration() and "default" != d.memoryMode(v):
+					self._printMappedRead(k, v, "CL_FALSE", "1, &kernelEvents[{}]".format(index), "&readEvents[{}]".format(nReads))
+					nReads += 1
+				elif v.isReadEachIteration():
+					f.write(
+						(
+							'		fRet = clEnqueueReadBuffer(readQueue{0}, {1}K, CL_FALSE, 0, {2} * sizeof({3}), {4}{1}, 1, &kernelEvents[{5}], &readEvents[{6}]);\n'
+							'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueReadBuffer ({1}K)"));\n'.format(
+								k.title, v.name, v.nmemb, v.type, "" if v.isPointer else "&", index, nReads
+							)
+						)
+					)
+					nReads += 1
+
+		# Reads complete after all writes and kernels they depend on. With no reads, wait for the kernels
+		f.write(
+			(
+				'		fRet = clWaitForEvents({0}, {1});\n'
+				'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clWaitForEvents"));\n'.format(
+					nReads if nReads > 0 else len(d.kernels), "readEvents" if nReads > 0 else "kernelEvents"
+				)
+			)
+		)
+		self._printWaitUnreadKernels('		', '')
+
+		if d.isProfiled():
+			f.write(
+				'		gettimeofday(&tNow, NULL);\n'
+			)
+
+		# Mapped outputs are complete: copy (pinned) and unmap them
+		for k in d.kernels:
+			for v in k.ioVariables():
+				if v.isReadEachIteration() and "default" != d.memoryMode(v):
+					self._printMappedReadEnd(k, v, '		')
+
+		self._printReleaseEvents('		', '')
+
+		f.write(
+			'		PRINT_SUCCESS();\n'
+		)
+
+
+	# Print beginning of pipelined loop and issue of an iteration: loop preamble, staging of variables and
+	# non-blocking writes into the buffer set of the iteration. Iterations are issued while loop preamble
+	# keeps loopFlag set and there is a free buffer set; otherwise the oldest iteration is retired (see
+	# _printPipelineReads()). loopFlag is cleared before loop preamble, so that an iteration is only issued
+	# ahead if loop preamble asks for it
+	def _printPipelineIssue(self):
+		f = self._out
+		d = self._descriptor
+		depth = d.pipelineDepth()
+		nOutputs = sum(1 for k in d.kernels for v in k.ioVariables() if v.isReadEachIteration())
+
+		f.write(
+			'	/* Pipelined loop: up to {} iterations in flight, each one using its own set of buffers */\n'.format(depth)
+		)
+
+		for k, index, nWrites, previous in self._eventChains():
+			if nWrites + len(previous) > 0:
+				f.write(
+					'	cl_event waitEvents{}[{}][{}];\n'.format(k.title, depth, nWrites + len(previous))
+				)
+
+		f.write(
+			'	cl_event kernelEvents[{}][{}];\n'.format(depth, len(d.kernels))
+		)
+
+		if nOutputs > 0:
+			f.write(
+				'	cl_event readEvents[{}][{}];\n'.format(depth, nOutputs)
+			)
+
+		# Profiling measures the whole loop, as iterations overlap
+		if d.isProfiled():
+			f.write(
+				'	gettimeofday(&tThen, NULL);\n'
+			)
+
+		f.write(
+			(
+				'	do {{\n'
+				'		if(issuing) {{\n'
+				'			slot = issued % {};\n'
+				'			i = issued;\n'
+				'			loopFlag = false;\n'.format(depth)
+			)
+		)
+
+		if d.isEnabled("looppreamble"):
+			self._printLoopAmble("LOOPPREAMBLE", "preamble", '			')
+
+		f.write(
+			(
+				'\n'
+				'			/* Setting input and output buffers */\n'
+				'			PRINT_STEP("[%d] Setting buffers...", i);\n'
+			)
+		)
+
+		for k in d.kernels:
+			nWrites = 0
+			for v in k.ioVariables():
+				if not v.isWrittenEachIteration():
+					continue
+
+				if "input" == v.tag and not v.isPointer:
+					f.write(
+						(
+							'			fRet = clSetKernelArg(kernel{0}, {1}, sizeof({2}), &{3});\n'
+							'			ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({3})"));\n'.format(
+								k.title, v.arg, v.type, v.name
+							)
+						)
+					)
+					if v in self._stagedScalars():
+						f.write(
+							'			{0}Stage[slot] = {0};\n'.format(v.name)
+						)
+				else:
+					f.write(
+						(
+							'			memcpy({1}Stage[slot], {5}{1}, {2} * sizeof({3}));\n'
+							'			fRet = clEnqueueWriteBuffer(writeQueue{0}, {1}KSlots[slot], CL_FALSE, 0, {2} * sizeof({3}), {1}Stage[slot], 0, NULL, &waitEvents{0}[slot][{4}]);\n'
+							'			ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueWriteBuffer ({1}K)"));\n'.format(
+								k.title, v.name, v.nmemb, v.type, nWrites, "" if v.isPointer else "&"
+							)
+						)
+					)
+					nWrites += 1
+
+		for k in d.kernels:
+			f.write(
+				'			clFlush(writeQueue{});\n'.format(k.title)
+			)
+
+		f.write(
+			'			PRINT_SUCCESS();\n'
+		)
+
+
+	# Print kernels of an issued iteration, using the buffer set of the iteration
+	def _printPipelineKernels(self):
+		f = self._out
+		d = self._descriptor
+
+		f.write(
+			'			PRINT_STEP("[%d] Running kernels...", i);\n'
+		)
+
+		if d.isProfiled():
+			f.write(
+				'			gettimeofday(&tIssued[slot], NULL);\n'
+			)
+
+		for k, index, nWrites, previous in self._eventChains():
+			for v in k.ioVariables():
+				if (v.isPointer or "output" == v.tag) and v.isWrittenEachIteration():
+					f.write(
+						(
+							'			fRet = clSetKernelArg(kernel{0}, {1}, sizeof(cl_mem), &{2}KSlots[slot]);\n'
+							'			ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clSetKernelArg ({2}K)"));\n'.format(
+								k.title, v.arg, v.name
+							)
+						)
+					)
+
+			for j, p in enumerate(previous):
+				f.write(
+					'			waitEvents{}[slot][{}] = kernelEvents[slot][{}];\n'.format(k.title, nWrites + j, p)
+				)
+
+			nWait = nWrites + len(previous)
+			f.write(
+				(
+					'			fRet = clEnqueueNDRangeKernel(queue{0}, kernel{0}, workDim{0}, NULL, globalSize{0}, {1}, {2}, {3}, &kernelEvents[slot][{4}]);\n'
+					'			ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueNDRangeKernel"));\n'.format(
+						k.title,
+						self._localSizeArg(k),
+						nWait,
+						"waitEvents{}[slot]".format(k.title) if nWait > 0 else "NULL",
+						index
+					)
+				)
+			)
 
+		for k in d.kernels:
 			f.write(
-				'		PRINT_SUCCESS();\n'
+				'			clFlush(queue{});\n'.format(k.title)
 			)
 
+		f.write(
+			'			PRINT_SUCCESS();\n'
+		)
 
-	# Print clEnqueueNDRangeKernel for all kernels
-	def printEnqueueKernel(self):
-		with open(self._targetFile, "a") as f:
-			hasOrder = False
-			profile = "profile" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["profile"]
-			kernels = {}
-			orderedIndexes = []
-
-			# If order attribute is found in at least one kernel, we assume that all kernels has order attributes
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					if "order" in k.attrib:
-						hasOrder = True
-
-			# Kernels has ordering
-			if hasOrder:
-				# For every kernel
-				for k in self._xmlRoot:
-					if "kernel" == k.tag:
-						order = int(k.attrib["order"])
-	
-						# First time this order number is being used
-						if order not in orderedIndexes:
-							# Append order number to order list
-							orderedIndexes.append(order)
-							# Create an array in the dictionary
-							kernels[order] = []
-	
-						# Append kernel number to the order in the dictionary
-						kernels[order].append(k)
-
-				# Sort order list
-				orderedIndexes = sorted(orderedIndexes)
-
-				# Declare event blockers
-				f.write(
-					(
-						'		cl_event blockers[{}];\n'
-						'		PRINT_STEP("[%d] Running kernels...", i);\n'.format(len(orderedIndexes) - 1)
-					)
-				)
 
-				# If profiling is on, get "then"
-				if profile:
+	# Print non-blocking reads of an issued iteration (end of issue), followed by the retire of the oldest
+	# iteration: wait for its reads, release its events and copy its outputs to the variables
+	def _printPipelineReads(self):
+		f = self._out
+		d = self._descriptor
+		depth = d.pipelineDepth()
+		nReads = 0
+
+		for k, index, nWrites, previous in self._eventChains():
+			for v in k.ioVariables():
+				if v.isReadEachIteration():
 					f.write(
-						'		gettimeofday(&tThen, NULL);\n'
+						(
+							'			fRet = clEnqueueReadBuffer(readQueue{0}, {1}KSlots[slot], CL_FALSE, 0, {2} * sizeof({3}), {1}Stage[slot], 1, &kernelEvents[slot][{4}], &readEvents[slot][{5}]);\n'
+							'			ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueReadBuffer ({1}K)"));\n'.format(
+								k.title, v.name, v.nmemb, v.type, index, nReads
+							)
+						)
 					)
+					nReads += 1
 
-				# Iterate through all orders
-				for i in range(0, len(orderedIndexes)):
-					# Get kernel based on order and enqueue it
-					for k in kernels[orderedIndexes[i]]:
-						dim = "1"
-						localSize = "NULL"
-						for v in k:
-							if "ndrange" == v.tag:
-								for d in v:
-									if "local" == d.tag:
-										localSize = "localSize{}".format(k.attrib["name"].title())
+		for k in d.kernels:
+			f.write(
+				'			clFlush(readQueue{});\n'.format(k.title)
+			)
 
-						f.write(
-							(
-								'		fRet = clEnqueueNDRangeKernel(queue{0}, kernel{0}, workDim{0}, NULL, globalSize{0}, {1}, {2}, {3}, {4});\n'
-								'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueNDRangeKernel"));\n'.format(
-									k.attrib["name"].title(),
-									localSize,
-									"0" if 0 == i else "1",
-									"NULL" if 0 == i else "&blockers[{}]".format(i - 1),
-									"&blockers[{}]".format(i) if i < (len(orderedIndexes) - 1) else "NULL"
-								)
-							)
-						)
+		f.write(
+			(
+				'			PRINT_SUCCESS();\n'
+				'\n'
+				'			issued++;\n'
+				'			issuing = loopFlag;\n'
+				'		}}\n'
+				'\n'
+				'		/* Retire oldest iteration once all buffer sets are in use, or no more iterations are issued */\n'
+				'		if(!issuing || {0} == issued - retired) {{\n'
+				'			slot = retired % {0};\n'
+				'			i = retired;\n'
+				'			PRINT_STEP("[%d] Waiting for iteration...", i);\n'
+				'			fRet = clWaitForEvents({1}, {2}[slot]);\n'
+				'			ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clWaitForEvents"));\n'.format(
+					depth, nReads if nReads > 0 else len(d.kernels), "readEvents" if nReads > 0 else "kernelEvents"
+				)
+			)
+		)
+		self._printWaitUnreadKernels('			', '[slot]')
 
-				# Finish kernels
-				f.write(
-					'		clFinish(queue{});\n'.format(k.attrib["name"].title())
+		if d.isProfiled():
+			f.write(
+				(
+					'			gettimeofday(&tNow, NULL);\n'
+					'			timersub(&tNow, &tIssued[slot], &tDelta);\n'
+					'			ASSERT_CALL(recordIteration(&tDelta), POSIX_ERROR_STATEMENTS("recordIteration"));\n'
 				)
+			)
 
-				# If profiling is on, get "now"
-				if profile:
-					f.write(
-						'		gettimeofday(&tNow, NULL);\n'
-					)
+		self._printReleaseEvents('			', '[slot]')
 
+		# Outputs are received; with loop postamble, inputs are also given back as they were when the
+		# iteration was issued, as loop preamble has already prepared the ones of the iterations in flight
+		for k, v in self._pipelinedVariables():
+			if v.isReadEachIteration() or ("input" == v.tag and d.isEnabled("looppostamble")):
 				f.write(
-					'		PRINT_SUCCESS();\n'
+					'			memcpy({2}{0}, {0}Stage[slot], {1} * sizeof({3}));\n'.format(
+						v.name, v.nmemb, "" if v.isPointer else "&", v.type
+					)
 				)
-			# Kernels has no ordering
-			else:
+
+		if d.isEnabled("looppostamble"):
+			for v in self._stagedScalars():
 				f.write(
-					'		PRINT_STEP("[%d] Running kernels...", i);\n'
+					'			{0} = {0}Stage[slot];\n'.format(v.name)
 				)
 
-				# If profiling is on, get "tThen"
-				if profile:
-					f.write(
-						'		gettimeofday(&tThen, NULL);\n'
-					)
-
-				for k in self._xmlRoot:
-					if "kernel" == k.tag:
-						dim = "1"
-						localSize = "NULL"
-						for v in k:
-							if "ndrange" == v.tag:
-								for d in v:
-									if "local" == d.tag:
-										localSize = "localSize{}".format(k.attrib["name"].title())
-	
-						f.write(
-							(
-								'		fRet = clEnqueueNDRangeKernel(queue{0}, kernel{0}, workDim{0}, NULL, globalSize{0}, {1}, 0, NULL, NULL);\n'
-								'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueNDRangeKernel"));\n'.format(
-									k.attrib["name"].title(),
-									localSize
-								)
-							)
-						)
+		f.write(
+			'			PRINT_SUCCESS();\n'
+		)
 
-				# Finish kernels
-				f.write(
-					'		clFinish(queue{});\n'.format(k.attrib["name"].title())
-				)
 
-				# If profiling is on, get "now"
-				if profile:
-					f.write(
-						'		gettimeofday(&tNow, NULL);\n'
-					)
+	# Print restore of the inputs of the latest issued iteration after loop postamble, if iterations are still in
+	# flight, so that loop preamble goes on from them
+	def _printPipelineInputsRestore(self):
+		f = self._out
+		inputs = [v for k, v in self._pipelinedVariables() if "input" == v.tag]
+		scalars = self._stagedScalars()
 
-				f.write(
-					'		PRINT_SUCCESS();\n'
-				)
+		if not inputs and not scalars:
+			return
 
+		f.write(
+			(
+				'			if(retired + 1 < issued) {{\n'
+				'				slot = (issued - 1) % {};\n'.format(self._descriptor.pipelineDepth())
+			)
+		)
 
-	# Print clEnqueueReadBuffer section
-	def printEnqueueReadBuffer(self):
-		with open(self._targetFile, "a") as f:
+		for v in inputs:
 			f.write(
-				(
-					'		/* Get output buffers */\n'
-					'		PRINT_STEP("[%d] Getting kernels arguments...", i);\n'
+				'				memcpy({2}{0}, {0}Stage[slot], {1} * sizeof({3}));\n'.format(
+					v.name, v.nmemb, "" if v.isPointer else "&", v.type
 				)
 			)
 
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
+		for v in scalars:
+			f.write(
+				'				{0} = {0}Stage[slot];\n'.format(v.name)
+			)
 
-						if "output" == v.tag:
-							f.write(
-								'		fRet = clEnqueueReadBuffer(queue{0}, {1}K, CL_TRUE, 0, {2} * sizeof({3}), {4}{1}, 0, NULL, NULL);\n'.format(
-									k.attrib["name"].title(),
-									v.attrib["name"],
-									v.attrib["nmemb"],
-									v.attrib["type"],
-									"" if (int(v.attrib["nmemb"]) > 1) or forcePointer else "&"
-								)
-							)
+		f.write(
+			'			}\n'
+		)
+
+
+	# Print end of retire and of pipelined loop. Loop postamble may clear loopFlag to stop issuing (iterations
+	# already issued are still completed); if it sets loopFlag once all iterations are retired, issuing
+	# resumes (loops controlled only by the postamble are not pipelined: they run one iteration at a time)
+	def _printPipelineFooter(self):
+		f = self._out
+
+		if self._descriptor.isEnabled("looppostamble"):
+			self._printLoopAmble("LOOPPOSTAMBLE", "postamble", '			')
+			self._printPipelineInputsRestore()
+
+		f.write(
+			(
+				'			retired++;\n'
+				'\n'
+				'			if(!loopFlag)\n'
+				'				issuing = false;\n'
+				'			else if(retired == issued)\n'
+				'				issuing = true;\n'
+				'		}\n'
+				'	} while(issuing || retired < issued);\n'
+			)
+		)
 
+		if self._descriptor.isProfiled():
 			f.write(
 				(
-					'		ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueReadBuffer"));\n'
-					'		PRINT_SUCCESS();\n'
+					'	gettimeofday(&tNow, NULL);\n'
+					'	timersub(&tNow, &tThen, &tExecTime);\n'
 				)
 			)
 
-	# Print footer of loop
-	def printLoopFooter(self):
-		with open(self._targetFile, "a") as f:
-			# Call LOOPPOSTAMBLE
-			if "looppostamble" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["looppostamble"]:
-				f.write(
-					'		/* Calling loop postamble function */\n'
-					'		PRINT_STEP("[%d] Calling loop postamble function...", i);\n'
-					'		LOOPPOSTAMBLE('
-				)
+		f.write(
+			'	i = retired;\n'
+		)
 
-				for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
-					f.write(
-						'{}, '.format(v)
-					)
 
-					if int(n) > 1:
-						f.write('{}, '.format(n))
+	# Print reads of accumulated outputs, once the loop is over
+	def _printAccumulatedReads(self):
+		f = self._out
+		accumulated = [(k, v) for k in self._descriptor.kernels for v in k.ioVariables() if v.isReadOnce()]
 
+		if not accumulated:
+			return
+
+		f.write(
+			(
+				'\n'
+				'	/* Get accumulated output buffers */\n'
+				'	PRINT_STEP("Getting accumulated kernels arguments...");\n'
+			)
+		)
+
+		for k, v in accumulated:
+			if self._descriptor.isMultiDevice():
+				self._printDeviceTransfers(k, [v], False, '	')
+			elif "default" != self._descriptor.memoryMode(v):
+				self._printMappedRead(k, v, "CL_TRUE", "0, NULL", "NULL", '	')
+				self._printMappedReadEnd(k, v, '	')
+			else:
 				f.write(
 					(
-						'loopFlag);\n'
-						'		PRINT_SUCCESS();\n'
+						'	fRet = clEnqueueReadBuffer(queue{0}, {1}K, CL_TRUE, 0, {2} * sizeof({3}), {4}{1}, 0, NULL, NULL);\n'
+						'	ASSERT_CALL(CL_SUCCESS == fRet, FUNCTION_ERROR_STATEMENTS("clEnqueueReadBuffer ({1}K)"));\n'.format(
+							k.title, v.name, v.nmemb, v.type, "" if v.isPointer else "&"
+						)
 					)
 				)
 
-			if "profile" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["profile"]:
-				f.write(
-					'		timersub(&tNow, &tThen, &tDelta);\n'
-					'		timeradd(&tExecTime, &tDelta, &tExecTime);\n'
-				)
+		f.write(
+			'	PRINT_SUCCESS();\n'
+		)
+
+
+	# Print footer of loop
+	def printLoopFooter(self):
+		f = self._out
+
+		if self._descriptor.pipelineDepth() > 1:
+			self._printPipelineFooter()
+			self._printAccumulatedReads()
+			self._printRunStats()
+			return
+
+		# Call LOOPPOSTAMBLE
+		if self._descriptor.isEnabled("looppostamble"):
+			self._printLoopAmble("LOOPPOSTAMBLE", "postamble", '		')
 
+		if self._descriptor.isProfiled():
 			f.write(
-				(
-					'		i++;\n'
-					'	} while(loopFlag);\n'
-				)
+				'		timersub(&tNow, &tThen, &tDelta);\n'
+				'		timeradd(&tExecTime, &tDelta, &tExecTime);\n'
+				'		ASSERT_CALL(recordIteration(&tDelta), POSIX_ERROR_STATEMENTS("recordIteration"));\n'
+			)
+
+		f.write(
+			(
+				'		i++;\n'
+				'	} while(loopFlag);\n'
 			)
+		)
+
+		self._printAccumulatedReads()
+		self._printRunStats()
+
+
+	# Print measures of the run returned to main() with size parameters: time of the loop (including transfers and
+	# loop pre/postamble), iterations and bytes of the arrays of kernel arguments per iteration
+	def _printRunStats(self):
+		f = self._out
+
+		if not self._descriptor.params:
+			return
+
+		sizes = [
+			"(double) ({}) * sizeof({})".format(v.nmemb, v.type)
+			for k in self._descriptor.kernels for v in k.ioVariables() if v.isPointer
+		]
+		f.write(
+			(
+				'	gettimeofday(&tLoopEnd, NULL);\n'
+				'	if(runStats) {{\n'
+				'		timersub(&tLoopEnd, &tLoopStart, &tLoopEnd);\n'
+				'		runStats->us = (1000000.0 * tLoopEnd.tv_sec) + tLoopEnd.tv_usec;\n'
+				'		runStats->iterations = i;\n'
+				'		runStats->bytes = {};\n'
+				'	}}\n'.format(" + ".join(sizes) if sizes else "0")
+			)
+		)
 
 
 	# Print postamble
 	def printPostamble(self):
-		with open(self._targetFile, "a") as f:
-			if "postamble" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["postamble"]:
-				f.write(
-					'	/* Calling postamble function */\n'
-					'	PRINT_STEP("Calling postamble function...");\n'
-					'	POSTAMBLE('
-				)
+		f = self._out
 
-				firstExec = True
-				for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
-					if not firstExec:
-						f.write(', ')
-					else:
-						firstExec = False
+		if self._descriptor.isEnabled("postamble"):
+			f.write(
+				'	/* Calling postamble function */\n'
+				'	PRINT_STEP("Calling postamble function...");\n'
+				'	POSTAMBLE('
+			)
 
-					f.write(v)
+			firstExec = True
+			for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
+				if not firstExec:
+					f.write(', ')
+				else:
+					firstExec = False
 
-					if int(n) > 1:
-						f.write(', {}'.format(n))
+				f.write(v)
 
-				f.write(
-					(
-						');\n'
-						'	PRINT_SUCCESS();\n'
-					)
+				if descriptor.isArraySize(n):
+					f.write(', {}'.format(n))
+
+			f.write(
+				(
+					');\n'
+					'	PRINT_SUCCESS();\n'
 				)
+			)
 
 
 	# Print code for output validation
 	def printProfileResults(self):
-		with open(self._targetFile, "a") as f:
-			if "profile" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["profile"]:
+		f = self._out
+
+		if self._descriptor.isProfiled():
+			f.write(
+				(
+					'	/* Print profiling results */\n'
+					'	totalTime = (1000000 * tExecTime.tv_sec) + tExecTime.tv_usec;\n'
+					'	printf("Elapsed time spent on kernels: %ld us; Average time per iteration: %lf us.\\n", totalTime, totalTime / (double) i);\n'
+				)
+			)
+
+			# Distribution of iteration times, exported to a file (JSON or CSV, by its extension) if requested
+			statsFile = self._descriptor.attrib.get("profilefile")
+			if statsFile is None:
 				f.write(
-					(
-						'	/* Print profiling results */\n'
-						'	totalTime = (1000000 * tExecTime.tv_sec) + tExecTime.tv_usec;\n'
-						'	printf("Elapsed time spent on kernels: %ld us; Average time per iteration: %lf us.\\n", totalTime, totalTime / (double) i);\n'
+					'	printIterationStats(NULL, false);\n'
+				)
+			else:
+				f.write(
+					'	ASSERT_CALL(printIterationStats("{0}", {1}), POSIX_ERROR_STATEMENTS("{0}"));\n'.format(
+						statsFile, "true" if statsFile.lower().endswith(".json") else "false"
 					)
 				)
 
+		if self._descriptor.hasEventProfiling():
+			f.write(
+				'	printEventProfile();\n'
+			)
+
+		# Timestamps of every command of every iteration, exported to a file (JSON or CSV, by its extension)
+		eventsFile = self._descriptor.attrib.get("eventsfile")
+		if eventsFile is not None:
+			f.write(
+				'	ASSERT_CALL(writeEventRecords("{0}", {1}), POSIX_ERROR_STATEMENTS("{0}"));\n'.format(
+					eventsFile, "true" if eventsFile.lower().endswith(".json") else "false"
+				)
+			)
+
 
-	# Print code for output validation
+	# Print code for output validation. Outputs with a digest are hashed and compared with it (see
+	# _printDigestValidation()), others are compared element-wise (see _printElementValidation())
 	def printValidation(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'	/* Validate received data */\n'
-					'	PRINT_STEP("Validating received data...");\n'
-				)
-			)
-
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
-
-						if ("output" == v.tag) and (("novalidation" not in v.attrib) or (v.attrib["novalidation"] != "true")):
-							# Variable is of vector type (e.g. cl_double2)
-							if v.attrib["type"] in self._vectorTypes:
-								vectorType = self._vectorTypes[v.attrib["type"]]
-								if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-									if "epsilon" in v.attrib:
-										validationStr = 'TEST_EPSILON({0}C[i].s[j], {0}[i].s[j], {0}Epsilon)'.format(v.attrib["name"])
-										validationStr2 = ' (with epsilon)'
-									else: 
-										validationStr = '{0}C[i].s[j] != {0}[i].s[j]'.format(v.attrib["name"])
-										validationStr2 = ''
-	
-									f.write(
-										(
-											'	for(i = 0; i < {0}; i++) {{\n'
-											'		for(j = 0; j < {1}; j++) {{\n'
-											'			if({2}) {{\n'
-											'				if(!invalidDataFound) {{\n'
-											'					PRINT_FAIL();\n'
-											'					invalidDataFound = true;\n'
-											'				}}\n'
-											'				printf("Variable {3}[%d].s[%d]: expected %{4} got %{4}{5}.\\n", i, j, {3}C[i].s[j], {3}[i].s[j]);\n'
-											'			}}\n'
-											'		}}\n'
-											'	}}\n'.format(
-												v.attrib["nmemb"],
-												vectorType[0],
-												validationStr,
-												v.attrib["name"],
-												self._printfMapper[vectorType[1]] if vectorType[1] in self._printfMapper else "x",
-												validationStr2
-											)
-										)
-									)
-								else:
-									if "epsilon" in v.attrib:
-										validationStr = 'TEST_EPSILON({0}C.s[i], {0}.s[i], {0}Epsilon)'.format(v.attrib["name"])
-										validationStr2 = ' (with epsilon)'
-									else: 
-										validationStr = '{0}C.s[i] != {0}.s[i]'.format(v.attrib["name"])
-										validationStr2 = ''
-	
-									f.write(
-										(
-											'	for(i = 0; i < {0}; i++) {{\n'
-											'		if({1}) {{\n'
-											'			if(!invalidDataFound) {{\n'
-											'				PRINT_FAIL();\n'
-											'				invalidDataFound = true;\n'
-											'			}}\n'
-											'			printf("Variable {2}.s[%d]: expected %{3} got %{3}{4}.\\n", i, {2}C.s[i], {2}.s[i]);\n'
-											'		}}\n'
-											'	}}\n'.format(
-												vectorType[0],
-												validationStr,
-												v.attrib["name"],
-												self._printfMapper[vectorType[1]] if vectorType[1] in self._printfMapper else "x",
-												validationStr2
-											)
-										)
-									)
-							# Not vector type variable
-							else:
-								if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-									if "epsilon" in v.attrib:
-										validationStr = 'TEST_EPSILON({0}C[i],  {0}[i], {0}Epsilon)'.format(v.attrib["name"])
-										validationStr2 = ' (with epsilon)'
-									else: 
-										validationStr = '{0}C[i] != {0}[i]'.format(v.attrib["name"])
-										validationStr2 = ''
-	
-									f.write(
-										(
-											'	for(i = 0; i < {0}; i++) {{\n'
-											'		if({1}) {{\n'
-											'			if(!invalidDataFound) {{\n'
-											'				PRINT_FAIL();\n'
-											'				invalidDataFound = true;\n'
-											'			}}\n'
-											'			printf("Variable {2}[%d]: expected %{3} got %{3}{4}.\\n", i, {2}C[i], {2}[i]);\n'
-											'		}}\n'
-											'	}}\n'.format(
-												v.attrib["nmemb"],
-												validationStr,
-												v.attrib["name"],
-												self._printfMapper[v.attrib["type"]] if v.attrib["type"] in self._printfMapper else "x",
-												validationStr2
-											)
-										)
-									)
-								else:
-									if "epsilon" in v.attrib:
-										validationStr = 'TEST_EPSILON({0}C, {0}, {0}Epsilon)'.format(v.attrib["name"])
-										validationStr2 = ' (with epsilon)'
-									else: 
-										validationStr = '{0}C != {0}'.format(v.attrib["name"])
-										validationStr2 = ''
-	
-									f.write(
-										(
-											'	if({0}) {{\n'
-											'		if(!invalidDataFound) {{\n'
-											'			PRINT_FAIL();\n'
-											'			invalidDataFound = true;\n'
-											'		}}\n'
-											'		printf("Variable {1}: expected %{2} got %{2}{3}.\\n", {1}C, {1});\n'
-											'	}}\n'.format(
-												validationStr,
-												v.attrib["name"],
-												self._printfMapper[v.attrib["type"]] if v.attrib["type"] in self._printfMapper else "x",
-												validationStr2
-											)
-										)
-									)
+		f = self._out
+
+		f.write(
+			(
+				'	/* Validate received data */\n'
+				'	PRINT_STEP("Validating received data...");\n'
+			)
+		)
+
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if v.digest is not None:
+					self._printDigestValidation(v)
+				elif v.isValidated:
+					self._printElementValidation(v, '	')
+
+		f.write(
+			(
+				'	if(!invalidDataFound)\n'
+				'		PRINT_SUCCESS();\n'
+			)
+		)
+
+
+	# Print validation of an output against its digest: received data is hashed as it is laid out in memory, except
+	# for 3-component vectors, hashed member by member (without padding). If digests differ and expected data is in a
+	# data file, output is also compared element-wise
+	def _printDigestValidation(self, v):
+		f = self._out
+
+		f.write(
+			(
+				'	/* Validate {0} against its digest */\n'
+				'	xxh64Init(&digestState);\n'.format(v.name)
+			)
+		)
 
+		width = self._vectorTypes[v.type][0] if v.type in self._vectorTypes else 1
+		if 3 == width and v.isPointer:
 			f.write(
 				(
-					'	if(!invalidDataFound)\n'
-					'		PRINT_SUCCESS();\n'
+					'	for(idx = 0; idx < {1}; idx++)\n'
+					'		xxh64Update(&digestState, {0}[idx].s, 3 * sizeof({0}[0].s[0]));\n'.format(v.name, v.nmemb)
+				)
+			)
+		elif 3 == width:
+			f.write(
+				'	xxh64Update(&digestState, {0}.s, 3 * sizeof({0}.s[0]));\n'.format(v.name)
+			)
+		elif v.isPointer:
+			f.write(
+				'	xxh64Update(&digestState, {0}, {1} * sizeof({2}));\n'.format(v.name, v.nmemb, v.type)
+			)
+		else:
+			f.write(
+				'	xxh64Update(&digestState, &{0}, sizeof({1}));\n'.format(v.name, v.type)
+			)
+
+		f.write(
+			(
+				'	digest = xxh64Digest(&digestState);\n'
+				'	if(0x{1:016x}ULL != digest) {{\n'
+				'		if(!invalidDataFound) {{\n'
+				'			PRINT_FAIL();\n'
+				'			invalidDataFound = true;\n'
+				'		}}\n'
+				'		printf("Variable {0}: digest 0x%016llx differs from expected 0x{1:016x}.\\n", (unsigned long long) digest);\n'.format(
+					v.name, v.digest
+				)
+			)
+		)
+
+		if v.isValidated:
+			self._printElementValidation(v, '		')
+
+		f.write(
+			'	}\n'
+		)
+
+
+	# Print element-wise validation of an output. It is checked in parallel (OpenMP, if enabled), counting mismatches
+	# and their largest absolute and relative errors. On mismatch, the worst element (first one with the largest
+	# absolute error) is searched, the first VALIDATION_PRINT_LIMIT mismatches are printed in order and a summary
+	# follows. Elements of vector types are validated member by member
+	def _printElementValidation(self, v, indent):
+		f = self._out
+
+		# Elements, access to expected and received value of element idx, and name of element idx
+		if v.type in self._vectorTypes:
+			width, baseType = self._vectorTypes[v.type]
+			if v.isPointer:
+				count = "{} * {}".format(v.nmemb, width)
+				element = "{}{{}}[idx / {}].s[idx % {}]".format(v.name, width, width)
+				label = ("[%zu].s[%zu]", "{0} / " + str(width) + ", {0} % " + str(width))
+			else:
+				count = str(width)
+				element = "{}{{}}.s[idx]".format(v.name)
+				label = (".s[%zu]", "{0}")
+		else:
+			baseType = v.type
+			if v.isPointer:
+				count = v.nmemb
+				element = "{}{{}}[idx]".format(v.name)
+				label = ("[%zu]", "{0}")
+			else:
+				count = "1"
+				element = "{}{{}}".format(v.name)
+				label = ("", None)
+
+		expected = element.format("C")
+		received = element.format("")
+		if v.epsilon is not None:
+			test = "TEST_EPSILON({}, {}, {}Epsilon)".format(expected, received, v.name)
+			testStr = " (with epsilon)"
+		else:
+			test = "{} != {}".format(expected, received)
+			testStr = ""
+
+		f.write(
+			(
+				'{10}/* Validate {0} */\n'
+				'{10}mismatches = 0;\n'
+				'{10}maxAbsError = maxRelError = 0;\n'
+				'#pragma omp parallel for reduction(+:mismatches) reduction(max:maxAbsError, maxRelError)\n'
+				'{10}for(idx = 0; idx < {1}; idx++) {{\n'
+				'{10}	if({2}) {{\n'
+				'{10}		double absError = fabs((double) {4} - (double) {3});\n'
+				'{10}		double relError = (0 != {3}) ? absError / fabs((double) {3}) : 0;\n'
+				'\n'
+				'{10}		mismatches++;\n'
+				'{10}		if(absError > maxAbsError)\n'
+				'{10}			maxAbsError = absError;\n'
+				'{10}		if(relError > maxRelError)\n'
+				'{10}			maxRelError = relError;\n'
+				'{10}	}}\n'
+				'{10}}}\n'
+				'{10}if(mismatches) {{\n'
+				'{10}	if(!invalidDataFound) {{\n'
+				'{10}		PRINT_FAIL();\n'
+				'{10}		invalidDataFound = true;\n'
+				'{10}	}}\n'
+				'\n'
+				'{10}	worstIndex = {1};\n'
+				'#pragma omp parallel for reduction(min:worstIndex)\n'
+				'{10}	for(idx = 0; idx < {1}; idx++) {{\n'
+				'{10}		if(({2}) && !(fabs((double) {4} - (double) {3}) < maxAbsError) && idx < worstIndex)\n'
+				'{10}			worstIndex = idx;\n'
+				'{10}	}}\n'
+				'\n'
+				'{10}	for(idx = 0, printed = 0; idx < {1} && printed < VALIDATION_PRINT_LIMIT; idx++) {{\n'
+				'{10}		if({2}) {{\n'
+				'{10}			printf("Variable {0}{5}: expected %{6} got %{6}{7}.\\n", {8}{3}, {4});\n'
+				'{10}			printed++;\n'
+				'{10}		}}\n'
+				'{10}	}}\n'
+				'{10}	printf("Variable {0}: %zu mismatches out of %zu elements; max absolute error %lg; max relative error %lg; worst element {0}{5}.\\n",\n'
+				'{10}		mismatches, (size_t) {1}, maxAbsError, maxRelError{9});\n'
+				'{10}}}\n'.format(
+					v.name, count, test, expected, received, label[0],
+					self._printfMapper[baseType] if baseType in self._printfMapper else "x",
+					testStr,
+					label[1].format("idx") + ", " if label[1] is not None else "",
+					", " + label[1].format("worstIndex") if label[1] is not None else "",
+					indent
 				)
 			)
+		)
 
 
 	# Print error label
 	def printErrorLabel(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				'_err:\n'
-			)
+		self._out.write(
+			'_err:\n'
+		)
 
 
 	# Print clReleaseMemObject section
 	def printFreeBuffers(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				'	/* Dealloc buffers */\n'
-			)
+		f = self._out
 
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
+		f.write(
+			'	/* Dealloc buffers */\n'
+		)
 
-						if ("input" == v.tag or "output" == v.tag) and ((int(v.attrib["nmemb"]) > 1) or forcePointer):
-							f.write(
-								(
-									'	if({0}K)\n'
-									'		clReleaseMemObject({0}K);\n'.format(v.attrib["name"])
-								)
-							)
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if not v.isBufferOwner:
+					continue
+
+				if self._descriptor.isMultiDevice() and v.isPointer:
+					f.write(
+						(
+							'	for(devIdx = 0; devIdx < MAX_DEVICES; devIdx++) {{\n'
+							'		if({0}K[devIdx])\n'
+							'			clReleaseMemObject({0}K[devIdx]);\n'
+							'	}}\n'.format(v.name)
+						)
+					)
+				elif v.isPointer:
+					f.write(
+						(
+							'	if({0}K)\n'
+							'		clReleaseMemObject({0}K);\n'.format(v.name)
+						)
+					)
+
+		# Other buffer sets of pipelined loop (first one is released above) and their staging areas
+		depth = self._descriptor.pipelineDepth()
+		if depth > 1:
+			for k, v in self._pipelinedVariables():
+				f.write(
+					(
+						'	for(j = 0; j < {1}; j++) {{\n'
+						'		if(j && {0}KSlots[j])\n'
+						'			clReleaseMemObject({0}KSlots[j]);\n'
+						'		free({0}Stage[j]);\n'
+						'	}}\n'.format(v.name, depth)
+					)
+				)
 
 
 	# Print variable deallocs section
 	def printFreeVariables(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				'	/* Dealloc variables */\n'
-			)
+		f = self._out
 
-			# Iterate through every variable of every kernel
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					for v in k:
-						forcePointer = ("forcepointer" in v.attrib) and (v.attrib["forcepointer"] == "true")
+		f.write(
+			'	/* Dealloc variables */\n'
+		)
 
-						if "input" == v.tag:
-							if v.text is None:
-								if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-									f.write(
-										'	free({});\n'.format(v.attrib["name"])
-									)
-						elif "output" == v.tag:
-							if (int(v.attrib["nmemb"]) > 1) or forcePointer:
-								f.write(
-									'	free({});\n'.format(v.attrib["name"])
-								)
-							if ("novalidation" not in v.attrib) or (v.attrib["novalidation"] != "true"):
-								f.write(
-									'	free({}C);\n'.format(v.attrib["name"])
+		# Iterate through every variable of every kernel. Only variables allocated with malloc() are
+		# freed, mapped data files are unmapped
+		for k in self._descriptor.kernels:
+			for v in k.ioVariables():
+				if "input" == v.tag and not v.isBufferOwner:
+					continue
+
+				if "input" == v.tag:
+					if v.file is not None:
+						f.write(
+							(
+								'	if({0}Mapping)\n'
+								'		munmap({0}Mapping, {0}MappingSz);\n'.format(v.name)
+							)
+						)
+					elif v.text is None and v.isPointer:
+						f.write(
+							'	free({});\n'.format(v.name)
+						)
+				else:
+					if v.isPointer and v.isBufferOwner:
+						f.write(
+							'	free({});\n'.format(v.name)
+						)
+					if v.isValidated:
+						if v.file is not None:
+							f.write(
+								(
+									'	if({0}CMapping)\n'
+									'		munmap({0}CMapping, {0}CMappingSz);\n'.format(v.name)
 								)
+							)
+						elif v.text is None and v.isPointer:
+							f.write(
+								'	free({}C);\n'.format(v.name)
+							)
+
+		# Records of profiling (reset, as kernels are run again for each size of a sweep)
+		if self._descriptor.isProfiled():
+			f.write(
+				'	free(iterationTimes);\n'
+			)
+			if self._descriptor.params:
+				f.write(
+					(
+						'	iterationTimes = NULL;\n'
+						'	iterationTimesLen = iterationTimesCap = 0;\n'
+					)
+				)
+		if self._descriptor.hasEventProfiling():
+			f.write(
+				'	free(profileRecords);\n'
+			)
+			if self._descriptor.params:
+				f.write(
+					(
+						'	profileRecords = NULL;\n'
+						'	profileRecordsLen = profileRecordsCap = 0;\n'
+					)
+				)
 
 
 	# Print clReleaseKernel section
 	def printFreeKernels(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				'	/* Dealloc kernels */\n'
-			)
+		f = self._out
 
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					f.write(
-						(
-							'	if(kernel{0})\n'
-							'		clReleaseKernel(kernel{0});\n'.format(k.attrib["name"].title())
-						)
+		f.write(
+			'	/* Dealloc kernels */\n'
+		)
+
+		for k in self._descriptor.kernels:
+			if self._descriptor.isMultiDevice():
+				f.write(
+					(
+						'	for(devIdx = 0; devIdx < MAX_DEVICES; devIdx++) {{\n'
+						'		if(kernel{0}[devIdx])\n'
+						'			clReleaseKernel(kernel{0}[devIdx]);\n'
+						'	}}\n'.format(k.title)
 					)
+				)
+				continue
+
+			f.write(
+				(
+					'	if(kernel{0})\n'
+					'		clReleaseKernel(kernel{0});\n'.format(k.title)
+				)
+			)
 
 
 	# Print clReleaseProgram section
 	def printFreeProgram(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
+		self._out.write(
+			(
+				'	/* Dealloc program */\n'
+				'	if(program)\n'
+				'		clReleaseProgram(program);\n'
+				'	if(programContent)\n'
+				'		munmap(programContent, programSz);\n'
+			)
+		)
+
+		if self._descriptor.binaryCache() is not None:
+			self._out.write(
 				(
-					'	/* Dealloc program */\n'
-					'	if(program)\n'
-					'		clReleaseProgram(program);\n'
-					'	if(programContent)\n'
-					'		free(programContent);\n'
-					'	if(programFile)\n'
-					'		fclose(programFile);\n'
+					'	if(programBinary)\n'
+					'		munmap(programBinary, programBinarySz);\n'
 				)
 			)
 
 
 	# Print clReleaseCommandQueue section
 	def printFreeQueues(self):
-		with open(self._targetFile, "a") as f:
+		f = self._out
+
+		f.write(
+			'	/* Dealloc queues */\n'
+		)
+
+		for k in self._descriptor.kernels:
+			if self._descriptor.isMultiDevice():
+				f.write(
+					(
+						'	for(devIdx = 0; devIdx < MAX_DEVICES; devIdx++) {{\n'
+						'		if(queue{0}[devIdx])\n'
+						'			clReleaseCommandQueue(queue{0}[devIdx]);\n'
+						'	}}\n'.format(k.title)
+					)
+				)
+				continue
+
 			f.write(
-				'	/* Dealloc queues */\n'
+				(
+					'	if(queue{0})\n'
+					'		clReleaseCommandQueue(queue{0});\n'.format(k.title)
+				)
 			)
 
-			for k in self._xmlRoot:
-				if "kernel" == k.tag:
-					f.write(
-						(
-							'	if(queue{0})\n'
-							'		clReleaseCommandQueue(queue{0});\n'.format(k.attrib["name"].title())
-						)
+			if self._hasTransferQueues():
+				f.write(
+					(
+						'	if(writeQueue{0})\n'
+						'		clReleaseCommandQueue(writeQueue{0});\n'
+						'	if(readQueue{0})\n'
+						'		clReleaseCommandQueue(readQueue{0});\n'.format(k.title)
 					)
+				)
 
 
 	# Print last OpenCL deallocs
 	def printFreeFinalOpenCL(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'	/* Last OpenCL variables */\n'
-					'	if(context)\n'
-					'		clReleaseContext(context);\n'
-					'	if(devices)\n'
-					'		free(devices);\n'
-					'	if(platforms)\n'
-					'		free(platforms);\n'
-				)
+		self._out.write(
+			(
+				'	/* Last OpenCL variables */\n'
+				'	if(context)\n'
+				'		clReleaseContext(context);\n'
+				'	if(devices)\n'
+				'		free(devices);\n'
+				'	if(platforms)\n'
+				'		free(platforms);\n'
 			)
+		)
 
 
 	# Print cleanup function
 	def printCleanup(self):
-		with open(self._targetFile, "a") as f:
-			# Call CLEANUP function if "cleanup" attribute is "yes"
-			if "cleanup" in self._xmlRoot.attrib and "yes" == self._xmlRoot.attrib["cleanup"]:
-				f.write(
-					'	/* Calling cleanup function */\n'
-					'	CLEANUP('
-				)
+		f = self._out
 
-				# Print arguments
-				firstExec = True
-				for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
-					if not firstExec:
-						f.write(', ')
-					else:
-						firstExec = False
+		# Call CLEANUP function if "cleanup" attribute is "yes"
+		if self._descriptor.isEnabled("cleanup"):
+			f.write(
+				'	/* Calling cleanup function */\n'
+				'	CLEANUP('
+			)
 
-					f.write(v)
+			# Print arguments
+			firstExec = True
+			for v, n in zip(self._varNameList[::2], self._varNameList[1::2]):
+				if not firstExec:
+					f.write(', ')
+				else:
+					firstExec = False
 
-					if int(n) > 1:
-						f.write(', {}'.format(n))
+				f.write(v)
 
-				f.write(
-					');\n'
-				)
+				if descriptor.isArraySize(n):
+					f.write(', {}'.format(n))
+
+			f.write(
+				');\n'
+			)
 
 
 	# Print last part of code
 	def printFooter(self):
-		with open(self._targetFile, "a") as f:
-			f.write(
-				(
-					'	return rv;\n'
-					'}\n'
+		self._out.write(
+			(
+				'	return rv;\n'
+				'}\n'
+			)
+		)
+
+		if self._descriptor.params:
+			self._printMain()
+
+
+	# Print main() with size parameters: parameters are set from descriptor, environment and command line, then
+	# kernels are run once, or once per size of the swept parameter
+	def _printMain(self):
+		f = self._out
+		params = self._descriptor.params
+
+		f.write(
+			(
+				'\n'
+				'/**\n'
+				' * @brief Size parameters have their default value, overridden by the environment variable of the same name,\n'
+				' *        overridden by a "name=value" command-line argument. A parameter set to "first:last[:factor]" is\n'
+				' *        swept: kernels are run for every size of the geometric series (factor defaults to 2), and the\n'
+				' *        throughput of the loop is reported for each size.\n'
+				' */\n'
+				'int main(int argc, char *argv[]) {{\n'
+				'	sizeParam_t params[{0}] = {{\n'
+				'{1}\n'
+				'	}};\n'
+				'	size_t sizes[{0}];\n'
+				'	int nParams = {0}, swept = -1, p, a;\n'
+				'	char *value;\n'
+				'	runStats_t runStats;\n'
+				'	int rv;\n'
+				'\n'
+				'	for(p = 0; p < nParams; p++) {{\n'
+				'		value = getenv(params[p].name);\n'
+				'		if(value)\n'
+				'			params[p].value = value;\n'
+				'	}}\n'
+				'\n'
+				'	for(a = 1; a < argc; a++) {{\n'
+				'		value = strchr(argv[a], \'=\');\n'
+				'		for(p = 0; value && p < nParams; p++) {{\n'
+				'			if(strlen(params[p].name) == (size_t) (value - argv[a]) && !strncmp(argv[a], params[p].name, value - argv[a]))\n'
+				'				break;\n'
+				'		}}\n'
+				'		if(!value || p == nParams) {{\n'
+				'			fprintf(stderr, "Error: unknown argument \\"%s\\" (expected <parameter>=<value>).\\n", argv[a]);\n'
+				'			return EXIT_FAILURE;\n'
+				'		}}\n'
+				'		params[p].value = value + 1;\n'
+				'	}}\n'
+				'\n'
+				'	for(p = 0; p < nParams; p++) {{\n'
+				'		if(!parseSizeParam(&params[p])) {{\n'
+				'			fprintf(stderr, "Error: invalid value \\"%s\\" of parameter %s.\\n", params[p].value, params[p].name);\n'
+				'			return EXIT_FAILURE;\n'
+				'		}}\n'
+				'		if(params[p].first != params[p].last) {{\n'
+				'			if(swept != -1) {{\n'
+				'				fprintf(stderr, "Error: parameters %s and %s are both swept.\\n", params[swept].name, params[p].name);\n'
+				'				return EXIT_FAILURE;\n'
+				'			}}\n'
+				'			swept = p;\n'
+				'		}}\n'
+				'		sizes[p] = params[p].first;\n'
+				'	}}\n'
+				'\n'
+				'	if(-1 == swept)\n'
+				'		return runKernels({2}NULL);\n'
+				'\n'
+				'	/* Sweep: elements are the size of the swept parameter, bytes are the ones of the arrays of kernel arguments */\n'
+				'	for(;;) {{\n'
+				'		rv = runKernels({2}&runStats);\n'
+				'		if(EXIT_SUCCESS != rv)\n'
+				'			return rv;\n'
+				'\n'
+				'		printf("Sweep %s=%zu: %d iterations in %.3lf us; %.3lf us per iteration; %.3lf elements/s; %.3lf GB/s.\\n",\n'
+				'			params[swept].name, sizes[swept], runStats.iterations, runStats.us, runStats.us / runStats.iterations,\n'
+				'			sizes[swept] * runStats.iterations / (runStats.us / 1000000.0), runStats.bytes * runStats.iterations / (runStats.us * 1000.0));\n'
+				'\n'
+				'		if(sizes[swept] > params[swept].last / params[swept].factor)\n'
+				'			break;\n'
+				'		sizes[swept] *= params[swept].factor;\n'
+				'	}}\n'
+				'\n'
+				'	return EXIT_SUCCESS;\n'
+				'}}\n'.format(
+					len(params),
+					",\n".join('		{{"{}", "{}"}}'.format(name, value) for name, value in params.items()),
+					"".join("sizes[{}], ".format(i) for i in range(len(params)))
 				)
 			)
+		)
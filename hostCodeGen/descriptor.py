@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Kernel Descriptor Model                                                                   #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+import io
+import os
+import re
+import tempfile
+from xml.etree import ElementTree
+
+
+# Host memory modes of buffers: "default" (plain transfers), "pinned" (buffer allocated with
+# CL_MEM_ALLOC_HOST_PTR, transferred through map/unmap) and "hostptr" (aligned host array used by the buffer
+# through CL_MEM_USE_HOST_PTR, synchronised through map/unmap)
+MEMORY_MODES = ("default", "pinned", "hostptr")
+
+# Access semantics of variables across loop iterations: "iteration" (written, and read back if output, at
+# each iteration), "constant" (written once before the loop; outputs are still read back at each iteration)
+# and "accumulate" (outputs only: written once before the loop, kept on the device and read back once after it)
+ACCESS_MODES = ("iteration", "constant", "accumulate")
+
+# Value of a size parameter: a size, or a geometric series of sizes ("first:last[:factor]") to sweep
+PARAM_VALUE = re.compile(r"([0-9]+)(?::([0-9]+)(?::([0-9]+))?)?")
+
+# Identifiers in size expressions
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+# Raised when a kernel description is malformed or inconsistent
+class DescriptorError(Exception):
+	pass
+
+
+# Check that a path can be pasted into a C string literal of the host code
+def checkPath(path, what):
+	if '"' in path or "\\" in path or any(ord(c) < 32 for c in path):
+		raise DescriptorError('{} "{}" cannot contain quotes, backslashes or control characters'.format(what, path))
+
+
+# Return True if a number of members (integer or expression of size parameters) makes an array. Expressions
+# are resolved at runtime, so they always make arrays
+def isArraySize(nmemb):
+	return not nmemb.isdigit() or int(nmemb) > 1
+
+
+# An <input>, <output> or <local> node of a kernel
+class Variable:
+	__slots__ = (
+		"tag", "name", "type", "nmemb", "arg", "isPointer", "isValidated", "epsilon", "text", "file", "digest", "memory",
+		"access", "isSplit", "isBufferOwner", "isHostWritten", "isHostRead", "isReadOnly"
+	)
+
+
+	def __init__(self, node):
+		self.tag = node.tag
+		self.name = node.attrib.get("name")
+		self.type = node.attrib["type"]
+		# Expressions of size parameters are parenthesised, as sizes are used in products
+		self.nmemb = node.attrib["nmemb"].strip()
+		if not self.nmemb.isdigit():
+			self.nmemb = "({})".format(self.nmemb)
+		self.arg = node.attrib["arg"]
+		self.epsilon = node.attrib.get("epsilon")
+		# Either a string or SpilledText (streaming mode)
+		self.text = node.text
+
+		# Variables with more than one member (or forced) are passed through cl_mem buffers
+		forcePointer = "true" == node.attrib.get("forcepointer")
+		self.isPointer = isArraySize(self.nmemb) or forcePointer
+
+		# Outputs have a validation variable ("<name>C") unless explicitly disabled
+		self.isValidated = ("output" == self.tag) and ("true" != node.attrib.get("novalidation"))
+
+		# Data (input data or expected output) mapped from a raw binary or .npy file at runtime
+		self.file = node.attrib.get("file")
+		if self.file is not None:
+			checkPath(self.file, 'data file of variable "{}"'.format(self.name))
+			if self.text is not None:
+				raise DescriptorError('variable "{}" has both inline data and a data file'.format(self.name))
+			if ("output" == self.tag) and not self.isValidated:
+				raise DescriptorError('output "{}" has a data file but no validation'.format(self.name))
+
+		# Expected output given by the digest (XXH64) of its bytes. It has no validation variable, unless its expected
+		# data is also in a data file, which is then only compared element-wise if digests differ
+		self.digest = node.attrib.get("digest")
+		if self.digest is not None:
+			if "output" != self.tag:
+				raise DescriptorError('input "{}" cannot have a digest'.format(self.name))
+			if not self.isValidated:
+				raise DescriptorError('output "{}" has a digest but no validation'.format(self.name))
+			if self.text is not None:
+				raise DescriptorError('output "{}" has both inline data and a digest'.format(self.name))
+			try:
+				self.digest = int(self.digest, 0)
+			except ValueError:
+				self.digest = -1
+			if not 0 <= self.digest < (1 << 64):
+				raise DescriptorError('output "{}" has invalid digest "{}"'.format(self.name, node.attrib["digest"]))
+
+			self.isValidated = self.file is not None
+
+		# Host memory mode of the buffer (see Descriptor.memoryMode())
+		self.memory = node.attrib.get("memory")
+		if self.memory is not None:
+			if self.memory not in MEMORY_MODES:
+				raise DescriptorError('variable "{}" has unknown memory mode "{}"'.format(self.name, self.memory))
+			if "default" != self.memory and not self.isPointer:
+				raise DescriptorError('variable "{}" has memory mode "{}" but is not an array'.format(self.name, self.memory))
+			if "hostptr" == self.memory and not self.isHostAllocated():
+				raise DescriptorError('input "{}" has memory mode "hostptr" but its data is not allocated by the host code'.format(self.name))
+
+		self.access = node.attrib.get("access", "iteration")
+		if self.access not in ACCESS_MODES:
+			raise DescriptorError('variable "{}" has unknown access "{}"'.format(self.name, self.access))
+		if "accumulate" == self.access and "output" != self.tag:
+			raise DescriptorError('input "{}" cannot be accumulated'.format(self.name))
+
+		# With several devices, outputs are always split along the global range of their kernel (each device
+		# computes its own slice, slices are merged in the host array). Inputs are sent whole to every device,
+		# unless split
+		self.isSplit = ("output" == self.tag) or ("true" == node.attrib.get("split"))
+
+		# Device buffer of the variable, possibly shared with variables of the same name in other kernels (see
+		# Descriptor._bindSharedBuffers()): its owner declares it, it is written from and read to host only by
+		# the nodes at its ends, and it is read-only for the device if no kernel outputs it
+		self.isBufferOwner = True
+		self.isHostWritten = True
+		self.isHostRead = ("output" == self.tag)
+		self.isReadOnly = ("input" == self.tag)
+
+
+	# Return True if data file is in NumPy format (data preceded by a header)
+	def isNpy(self):
+		return self.file.lower().endswith(".npy")
+
+
+	# Return True if variable is sent to the device at each iteration
+	def isWrittenEachIteration(self):
+		return self.isHostWritten and "iteration" == self.access
+
+
+	# Return True if variable is sent to the device once, before the loop
+	def isWrittenOnce(self):
+		return self.isHostWritten and "iteration" != self.access
+
+
+	# Return True if variable is an output read back at each iteration
+	def isReadEachIteration(self):
+		return self.isHostRead and "accumulate" != self.access
+
+
+	# Return True if variable is an output read back once, after the loop
+	def isReadOnce(self):
+		return self.isHostRead and "accumulate" == self.access
+
+
+	# Return True if the array is allocated by the host code (neither inline data nor data file)
+	def isHostAllocated(self):
+		return self.isPointer and ("output" == self.tag or (self.text is None and self.file is None))
+
+
+# A <kernel> node with its ndrange and arguments
+class Kernel:
+	__slots__ = ("name", "title", "order", "hasNDRange", "dim", "globalSize", "localSize", "variables")
+
+
+	def __init__(self, node):
+		self.name = node.attrib["name"]
+		self.title = self.name.title()
+		self.order = int(node.attrib["order"]) if "order" in node.attrib else None
+		self.hasNDRange = False
+		# If no dim attribute is present, default it to 1
+		self.dim = "1"
+		self.globalSize = None
+		self.localSize = None
+		self.variables = []
+
+		for v in node:
+			if "ndrange" == v.tag:
+				self.hasNDRange = True
+				self.dim = v.attrib.get("dim", "1")
+
+				for d in v:
+					if "global" == d.tag:
+						self.globalSize = d.text
+					elif "local" == d.tag:
+						self.localSize = d.text
+			elif v.tag in ("input", "output", "local"):
+				self.variables.append(Variable(v))
+
+
+	# Iterate through input and output variables only (no __local arguments)
+	def ioVariables(self):
+		return (v for v in self.variables if "local" != v.tag)
+
+
+	# Return True if any variable has its data in a file
+	def hasDataFiles(self):
+		return any(v.file is not None for v in self.ioVariables())
+
+
+# The root <kernels> node: global flags, device selection and all kernels
+class Descriptor:
+	__slots__ = ("attrib", "platform", "device", "params", "kernels", "_spool")
+
+
+	def __init__(self, root=None):
+		self.attrib = {}
+		self.platform = "0"
+		self.device = "0"
+		# Size parameters (name -> default value), in declaration order
+		self.params = {}
+		self.kernels = []
+		self._spool = None
+
+		if root is not None:
+			self._begin(root)
+			for node in root:
+				self._add(node)
+			self._finish()
+
+
+	# First stage of construction: root node (only its tag and attributes are used)
+	def _begin(self, root):
+		if "kernels" != root.tag:
+			raise DescriptorError("root node must be <kernels>, found <{}>".format(root.tag))
+
+		self.attrib = dict(root.attrib)
+
+
+	# Second stage of construction: add a child node of root
+	def _add(self, node):
+		if "devinfo" == node.tag:
+			self.platform = node.attrib.get("platform", "0")
+			self.device = node.attrib.get("device", "0")
+		elif "param" == node.tag:
+			self._addParam(node)
+		elif "kernel" == node.tag:
+			self.kernels.append(Kernel(node))
+
+
+	# Add a size parameter: a C identifier usable in sizes, with its default value
+	def _addParam(self, node):
+		name = node.attrib["name"]
+		value = node.attrib["value"]
+
+		if not IDENTIFIER.fullmatch(name):
+			raise DescriptorError('parameter name "{}" is not a valid identifier'.format(name))
+		if name in self.params:
+			raise DescriptorError('parameter "{}" is declared more than once'.format(name))
+
+		match = PARAM_VALUE.fullmatch(value)
+		if match is None:
+			raise DescriptorError('parameter "{}" has invalid value "{}"'.format(name, value))
+
+		first = int(match.group(1))
+		last = int(match.group(2) or first)
+		factor = int(match.group(3) or 2)
+		if not first or last < first or factor < 2:
+			raise DescriptorError('parameter "{}" has invalid value "{}"'.format(name, value))
+
+		self.params[name] = value
+
+
+	# Last stage of construction: checks that need all nodes
+	def _finish(self):
+		# Program is created either from a binary or from source
+		if "binary" not in self.attrib and "source" not in self.attrib:
+			raise DescriptorError("kernels node must have a binary or a source attribute")
+
+		for attr in ("binary", "source", "binarycache", "profilefile", "eventsfile"):
+			if attr in self.attrib:
+				checkPath(self.attrib[attr], attr)
+
+		# Pipelined loop has two or three sets of buffers
+		if self.attrib.get("pipeline", "1") not in ("1", "2", "3"):
+			raise DescriptorError('pipeline must be 1, 2 or 3, found "{}"'.format(self.attrib["pipeline"]))
+
+		if "eventsfile" in self.attrib and not self.hasEventProfiling():
+			raise DescriptorError('eventsfile can only be used with profile="events"')
+
+		# Only programs built from source are cached
+		if "binarycache" in self.attrib and "source" not in self.attrib:
+			raise DescriptorError("binarycache can only be used with source")
+
+		if self.attrib.get("memory", "default") not in MEMORY_MODES:
+			raise DescriptorError('unknown memory mode "{}"'.format(self.attrib["memory"]))
+
+		# Pipelined loop has its own staging areas
+		if self.pipelineDepth() > 1 and self.hasMemoryMode("pinned", "hostptr"):
+			raise DescriptorError("memory modes other than default cannot be used with a pipelined loop")
+
+		# Outputs of pipelined loop read back at each iteration have one buffer per iteration in flight
+		if self.pipelineDepth() > 1:
+			for k in self.kernels:
+				for v in k.ioVariables():
+					if "output" == v.tag and "constant" == v.access:
+						raise DescriptorError('output "{}" is constant, which cannot be used with a pipelined loop'.format(v.name))
+
+		# If order attribute is found in at least one kernel, all kernels must have it
+		if self.hasOrder():
+			for k in self.kernels:
+				if k.order is None:
+					raise DescriptorError('kernel "{}" has no order attribute, but other kernels do'.format(k.name))
+
+		# Sizes given by expressions may only use size parameters. They are resolved at runtime, so their arrays
+		# cannot have inline data
+		for k in self.kernels:
+			for v in k.variables:
+				if v.name in self.params:
+					raise DescriptorError('variable "{}" has the name of a parameter'.format(v.name))
+				if v.nmemb.isdigit():
+					continue
+
+				for name in IDENTIFIER.findall(v.nmemb):
+					if name not in self.params:
+						raise DescriptorError('variable "{}" has size "{}", but "{}" is not a parameter'.format(v.name, v.nmemb, name))
+				if v.text is not None:
+					raise DescriptorError('variable "{}" has a parametric size and cannot have inline data'.format(v.name))
+
+		self._bindSharedBuffers()
+
+		if self.isMultiDevice():
+			self._finishMultiDevice()
+
+
+	# Variables of the same name in several kernels are bound to a single device buffer, which stays on the device
+	# between kernels. Following kernel dependencies, its first node owns it (declares host variable and buffer)
+	# and is the only one written from host; only its last node is read back to host (and validated), if it is
+	# an output
+	def _bindSharedBuffers(self):
+		buffers = {}
+		for k in sorted(self.kernels, key=lambda k: k.order or 0):
+			for v in k.ioVariables():
+				buffers.setdefault(v.name, []).append(v)
+
+		for name, nodes in buffers.items():
+			if len(nodes) < 2:
+				continue
+
+			first = nodes[0]
+			if self.isMultiDevice() or self.pipelineDepth() > 1:
+				raise DescriptorError('buffer "{}" is shared by several kernels, which cannot be used with several devices nor with a pipelined loop'.format(name))
+
+			for v in nodes:
+				if not v.isPointer:
+					raise DescriptorError('buffer "{}" is shared by several kernels but is not an array'.format(name))
+				if (v.type, v.nmemb, self.memoryMode(v)) != (first.type, first.nmemb, self.memoryMode(first)):
+					raise DescriptorError('buffer "{}" is shared by several kernels with different type, size or memory mode'.format(name))
+				if v is not first and "input" == v.tag and (v.text is not None or v.file is not None):
+					raise DescriptorError('input "{}" gets its data from a previous kernel and cannot have data'.format(name))
+
+				# A buffer first produced by a kernel is only written from host if it is initialised once (access is
+				# "constant" or "accumulate")
+				v.isBufferOwner = v is first
+				v.isHostWritten = v is first and ("input" == v.tag or "iteration" != v.access)
+				v.isHostRead = v is nodes[-1] and "output" == v.tag
+				v.isReadOnly = all("input" == n.tag for n in nodes)
+
+				# Intermediate outputs are not read back, thus not validated
+				if "output" == v.tag and not v.isHostRead:
+					if v.text is not None or v.file is not None or v.digest is not None:
+						raise DescriptorError('output "{}" is consumed by a following kernel and cannot be validated'.format(name))
+					v.isValidated = False
+
+
+	# Checks of multi-device mode: only the plain blocking loop is split across devices
+	def _finishMultiDevice(self):
+		if "all" != self.device:
+			try:
+				indexes = [int(i) for i in self.device.split(",")]
+			except ValueError:
+				raise DescriptorError('device must be an index, a comma-separated list of indexes or "all", found "{}"'.format(self.device))
+			if any(i < 0 for i in indexes):
+				raise DescriptorError('device list "{}" has negative indexes'.format(self.device))
+			if len(set(indexes)) != len(indexes):
+				raise DescriptorError('device list "{}" has repeated devices'.format(self.device))
+
+		# Transfers are blocking and outputs are merged into host arrays after each iteration
+		if self.pipelineDepth() > 1 or self.isEnabled("nonblocking"):
+			raise DescriptorError("pipeline and nonblocking cannot be used with several devices")
+		if self.hasEventProfiling():
+			raise DescriptorError('profile="events" cannot be used with several devices')
+		if self.binaryCache() is not None:
+			raise DescriptorError("binarycache cannot be used with several devices")
+		if self.hasMemoryMode("pinned", "hostptr"):
+			raise DescriptorError("memory modes other than default cannot be used with several devices")
+		if self.isEnabled("autotune"):
+			raise DescriptorError("autotune cannot be used with several devices")
+
+		for k in self.kernels:
+			if k.globalSize is None:
+				raise DescriptorError('kernel "{}" has no global size, which is needed to split it across devices'.format(k.name))
+
+			# Split arrays are sliced in proportion to the first dimension of global range (when it is a constant)
+			try:
+				globalSize = int(k.globalSize.split(",")[0])
+			except ValueError:
+				globalSize = None
+
+			for v in k.ioVariables():
+				if v.isSplit and not v.isPointer:
+					raise DescriptorError('variable "{}" is not an array and cannot be split across devices'.format(v.name))
+				if v.isSplit and globalSize is not None and v.nmemb.isdigit() and int(v.nmemb) % globalSize:
+					raise DescriptorError('variable "{}" has a size that is not a multiple of global size and cannot be split across devices'.format(v.name))
+
+
+	# Return True if root attribute is set to "yes"
+	def isEnabled(self, attr):
+		return "yes" == self.attrib.get(attr)
+
+
+	# Return True if loop is profiled (profile="yes" or "events")
+	def isProfiled(self):
+		return self.attrib.get("profile") in ("yes", "events")
+
+
+	# Return True if every command is also profiled on the device through its event (profile="events")
+	def hasEventProfiling(self):
+		return "events" == self.attrib.get("profile")
+
+
+	# Number of iterations in flight in the loop (loop is pipelined if greater than 1)
+	def pipelineDepth(self):
+		return int(self.attrib.get("pipeline", "1"))
+
+
+	# Directory of program binary cache, or None if programs are not cached
+	def binaryCache(self):
+		return self.attrib.get("binarycache")
+
+
+	# Return memory mode of a variable: its own memory attribute, else the one of root node. A root "hostptr"
+	# only applies to arrays allocated by the host code, other variables use default mode
+	def memoryMode(self, v):
+		if v.memory is not None:
+			return v.memory
+
+		mode = self.attrib.get("memory", "default")
+		if not v.isPointer or ("hostptr" == mode and not v.isHostAllocated()):
+			return "default"
+
+		return mode
+
+
+	# Return True if any variable uses one of the given memory modes
+	def hasMemoryMode(self, *modes):
+		return any(self.memoryMode(v) in modes for k in self.kernels for v in k.ioVariables())
+
+
+	# Return True if kernels are split across several devices (comma-separated list of devices, or "all")
+	def isMultiDevice(self):
+		return "all" == self.device or "," in self.device
+
+
+	# Indexes of devices used in multi-device mode, or None if all devices of platform are used
+	def deviceIndexes(self):
+		return None if "all" == self.device else [int(i) for i in self.device.split(",")]
+
+
+	# Return True if kernels have ordering
+	def hasOrder(self):
+		return any(k.order is not None for k in self.kernels)
+
+
+	# Return True if any variable of any kernel has its data in a file
+	def hasDataFiles(self):
+		return any(k.hasDataFiles() for k in self.kernels)
+
+
+	# Return dict of kernel -> list of kernels it depends on (run before it), in declaration order. A kernel
+	# depends on every kernel of the closest lower order (if kernels have ordering) and on every kernel that
+	# shares a buffer name with it and comes before it (lower order, or same order and declared before)
+	def dependencies(self):
+		deps = {}
+
+		for i, k in enumerate(self.kernels):
+			names = set(v.name for v in k.ioVariables())
+			lower = [o.order for o in self.kernels if o.order is not None and k.order is not None and o.order < k.order]
+			deps[k] = []
+
+			for j, o in enumerate(self.kernels):
+				if o is k:
+					continue
+
+				if lower and o.order == max(lower):
+					deps[k].append(o)
+				elif (o.order == k.order and j < i) or (o.order is not None and k.order is not None and o.order < k.order):
+					if names.intersection(v.name for v in o.ioVariables()):
+						deps[k].append(o)
+
+		return deps
+
+
+# Inline data (text of <input>/<output>) moved out of memory into a spool file while streaming
+class SpilledText:
+	__slots__ = ("_spool", "_offset", "_length")
+
+
+	def __init__(self, spool, text):
+		self._spool = spool
+		self._offset = spool.tell()
+		self._length = len(text)
+		spool.write(text)
+
+
+	def __len__(self):
+		return self._length
+
+
+	# Copy data to a writable object, in chunks
+	def copyTo(self, f, chunkSize=1 << 20):
+		self._spool.seek(self._offset)
+
+		remaining = self._length
+		while remaining > 0:
+			chunk = self._spool.read(min(chunkSize, remaining))
+			if not chunk:
+				raise DescriptorError("spooled inline data is truncated")
+			f.write(chunk)
+			remaining -= len(chunk)
+
+		# Spool is always appended at its end
+		self._spool.seek(0, os.SEEK_END)
+
+
+# Build kernel description from an already parsed root node
+def fromElement(root):
+	try:
+		return Descriptor(root)
+	except KeyError as e:
+		raise DescriptorError("missing mandatory attribute {}".format(e))
+
+
+# Parse kernel description from an XML file (path or file object)
+def parse(xmlFile):
+	try:
+		root = ElementTree.parse(xmlFile).getroot()
+	except ElementTree.ParseError as e:
+		raise DescriptorError("malformed XML: {}".format(e))
+
+	return fromElement(root)
+
+
+# Parse kernel description incrementally. Each root child is modelled and discarded as soon as it ends,
+# and inline data with at least spillSize characters is moved to a temporary spool file, so that only
+# one inline dataset at a time is kept in memory
+def parseStreaming(xmlFile, spillSize=1 << 16):
+	d = Descriptor()
+	root = None
+	depth = 0
+
+	try:
+		for event, node in ElementTree.iterparse(xmlFile, events=("start", "end")):
+			if "start" == event:
+				depth += 1
+
+				if 1 == depth:
+					root = node
+					d._begin(root)
+
+				continue
+
+			depth -= 1
+
+			# Variables of kernels (<kernels><kernel><input/output>)
+			if 2 == depth and node.tag in ("input", "output") and node.text is not None and len(node.text) >= spillSize:
+				if d._spool is None:
+					d._spool = tempfile.TemporaryFile(mode="w+")
+				node.text = SpilledText(d._spool, node.text)
+			# Children of root
+			elif 1 == depth:
+				d._add(node)
+				root.remove(node)
+	except ElementTree.ParseError as e:
+		raise DescriptorError("malformed XML: {}".format(e))
+	except KeyError as e:
+		raise DescriptorError("missing mandatory attribute {}".format(e))
+
+	d._finish()
+
+	return d
+
+
+# Return kernel description from any source: a Descriptor (returned as is), an ElementTree element or tree,
+# an XML document (str or bytes starting with "<"), a file object or a path of an XML file
+def load(source, streaming=False):
+	if isinstance(source, Descriptor):
+		return source
+
+	if isinstance(source, ElementTree.ElementTree):
+		source = source.getroot()
+	if isinstance(source, ElementTree.Element):
+		return fromElement(source)
+
+	if isinstance(source, bytes):
+		source = io.BytesIO(source)
+	elif isinstance(source, str) and source.lstrip().startswith("<"):
+		source = io.StringIO(source)
+
+	return parseStreaming(source) if streaming else parse(source)
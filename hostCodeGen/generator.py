@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Library Interface of the Generator                                                        #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+
+# Host code generation as a library, for programs that generate host codes in-process. Sources of
+# kernel descriptions are anything accepted by descriptor.load(): a path, a file object, an XML string
+# (or bytes) or an already parsed descriptor (see parse()), so that a descriptor can be parsed once and
+# generated several times. Nothing is printed and no file is touched, except by generateFile().
+#
+# Example:
+#     import generator
+#     d = generator.parse("kernelDescriptions/accadd.xml")
+#     code = generator.generate(d)
+#     with open("host.c", "w") as f:
+#         generator.generate(d, f)
+
+
+from codeemitter import CodeEmitter
+from descriptor import DescriptorError, load as parse
+
+
+__all__ = ["DescriptorError", "parse", "generate", "generateFile"]
+
+
+# Generate host code from source. If out is None, the code is returned as a string, otherwise it is
+# written to out (any object with a write() method) in chunks and None is returned. With streaming, see
+# CodeEmitter
+def generate(source, out=None, streaming=False):
+	ce = CodeEmitter(source, streaming=streaming)
+	ce.printAll()
+
+	if out is None:
+		return ce.getSource()
+
+	ce.copySource(out)
+
+
+# Generate host code from source into targetFile, which is only rewritten if its contents changed.
+# Options are those of CodeEmitter (streaming, dataThreshold). Returns the list of files that were written
+# (e.g. only the data source, if only inline data changed)
+def generateFile(source, targetFile, **options):
+	ce = CodeEmitter(source, targetFile, **options)
+	ce.printAll()
+
+	return ce.writeTargetFile()
@@ -25,130 +25,138 @@
 # #############################################################################################
 
 
+import argparse
 import sys
-from codeemitter import CodeEmitter
-
-
-if "__main__" == __name__:
-	if len(sys.argv) != 3:
-		sys.stderr.write("Usage: hostCodeGen KERNELSXML TARGETFILE\n");
-		sys.stderr.write("\tKERNELSXML\tXML with descriptions of kernels\n");
-		sys.stderr.write("\tTARGETFILE\tOutput source code filename\n");
-		exit(1)
-
-	ce = CodeEmitter(sys.argv[1], sys.argv[2])
-
-	print("Printing header...")
-	ce.printHeader()
 
-	print("Printing queue declarations...")
-	ce.printQueueDeclarations()
-
-	print("Printing program declarations...")
-	ce.printProgramDeclarations()
-
-	print("Printing kernel declarations...")
-	ce.printKernelDeclarations()
-
-	print("Printing last declarations...")
-	ce.printLastDeclarations()
-	ce.printSeparator()
-
-	print("Printing variables declaration...")
-	ce.printVariablesDeclaration()
-	ce.printSeparator()
+import batch
+from cache import GenerationCache
+from codeemitter import CodeEmitter
+from descriptor import DescriptorError
+from instrumentation import SectionStats
+from watch import Watcher
 
-	print("Printing getPlatformIDs section...")
-	ce.printGetPlatformIDs()
-	ce.printSeparator()
 
-	print("Printing getDevicesIDs section...")
-	ce.printGetDevicesIDs()
-	ce.printSeparator()
+# Generate a single host code, reporting every section. If statsFormat is "table" or "json", statistics
+# of each section are printed at the end
+def generateSingle(xmlFile, targetFile, cacheDir, options, statsFormat=None):
+	try:
+		# Skip everything if descriptor did not change since last generation
+		if cacheDir is not None:
+			cache = GenerationCache(cacheDir)
+			key = cache.key(xmlFile, options)
 
-	print("Printing createContext section...")
-	ce.printCreateContext()
-	ce.printSeparator()
+			if cache.isFresh(key, targetFile):
+				print("{} is up to date.".format(targetFile))
+				return 0
 
-	print("Printing createCommandQueue sections...")
-	ce.printCreateCommandQueues()
-	ce.printSeparator()
+		ce = CodeEmitter(xmlFile, targetFile, **options)
+	except (DescriptorError, OSError) as e:
+		sys.stderr.write("Error: {}: {}\n".format(xmlFile, e))
+		return 1
 
-	print("Printing createAndBuildProgram sections...")
-	ce.printCreateAndBuildProgram()
-	ce.printSeparator()
+	# All sections are rendered in memory and written to TARGETFILE at once
+	stats = SectionStats() if statsFormat is not None else None
+	ce.printAll(print, stats)
 
-	print("Printing createKernel sections...")
-	ce.printCreateKernels()
-	ce.printSeparator()
+	print("Writing {}...".format(", ".join(ce.targetFiles())))
+	if not ce.writeTargetFile():
+		print("{} is unchanged, not rewritten.".format(targetFile))
 
-	print("Printing createBuffer sections...")
-	ce.printCreateBuffers()
-	ce.printSeparator()
+	if cacheDir is not None:
+		cache.store(key, ce.targetFiles())
 
-	print("Printing setKernelArgs sections...")
-	ce.printSetKernelsArgs()
-	ce.printSeparator()
+	if "table" == statsFormat:
+		print(stats.formatTable())
+	elif "json" == statsFormat:
+		print(stats.toJson())
 
-	print("Printing loop header...")
-	ce.printLoopHeader()
-	ce.printSeparator()
+	return 0
 
-	print("Printing enqueueKernel sections...")
-	ce.printEnqueueKernel()
-	ce.printSeparator()
 
-	print("Printing enqueueReadBuffer sections...")
-	ce.printEnqueueReadBuffer()
-	ce.printSeparator()
+# Generate several host codes in parallel, reporting one line per descriptor
+def generateMany(specs, outDir, workers, cacheDir, options):
+	jobs = batch.expandJobs(specs, outDir, cacheDir, options)
+	failed = 0
 
-	print("Printing loop footer...")
-	ce.printLoopFooter()
-	ce.printSeparator()
+	for xmlFile, targetFile, elapsed, status, error in batch.generateBatch(jobs, workers):
+		if error is None:
+			print("{} -> {} ({}, {:.3f} s)".format(xmlFile, targetFile, status, elapsed))
+		else:
+			sys.stderr.write("Error: {}: {}\n".format(xmlFile, error))
+			failed += 1
 
-	print("Printing postamble...")
-	ce.printPostamble()
-	ce.printSeparator()
+	print("Generated {} of {} host codes.".format(len(jobs) - failed, len(jobs)))
 
-	print("Printing profile section...")
-	ce.printProfileResults()
-	ce.printSeparator()
+	return 1 if failed else 0
 
-	print("Printing validation sections...")
-	ce.printValidation()
-	ce.printSeparator()
 
-	print("Printing error goto label...")
-	ce.printErrorLabel()
-	ce.printSeparator()
+# Regenerate host codes whenever their descriptors change, until interrupted
+def watchAll(patterns, outDir, interval, debounce, options):
+	watcher = Watcher(patterns, outDir, options, debounce)
 
-	print("Printing buffers deallocation sections...")
-	ce.printFreeBuffers()
-	ce.printSeparator()
+	def report(result):
+		xmlFile, targetFile, elapsed, status, error = result
 
-	print("Printing variable deallocs...")
-	ce.printFreeVariables()
-	ce.printSeparator()
+		if error is None:
+			print("{} -> {} ({}, {:.3f} s)".format(xmlFile, targetFile, status, elapsed))
+		else:
+			sys.stderr.write("Error: {}: {}\n".format(xmlFile, error))
 
-	print("Printing kernels deallocation sections...")
-	ce.printFreeKernels()
-	ce.printSeparator()
+		sys.stdout.flush()
 
-	print("Printing program deallocation section...")
-	ce.printFreeProgram()
-	ce.printSeparator()
+	print("Watching {} (interrupt to stop)...".format(", ".join(patterns)))
+	sys.stdout.flush()
 
-	print("Printing queues deallocation sections...")
-	ce.printFreeQueues()
-	ce.printSeparator()
+	try:
+		watcher.run(report, interval)
+	except KeyboardInterrupt:
+		pass
 
-	print("Printing last OpenCL deallocs...")
-	ce.printFreeFinalOpenCL()
-	ce.printSeparator()
+	return 0
 
-	print("Printing cleanup function...")
-	ce.printCleanup()
-	ce.printSeparator()
 
-	print("Printing footer...")
-	ce.printFooter()
+if "__main__" == __name__:
+	parser = argparse.ArgumentParser(
+		prog="hostCodeGen",
+		usage=(
+			"hostCodeGen [-c CACHEDIR] [-s] [-d CHARS] [-t {table,json}] KERNELSXML TARGETFILE\n"
+			"       hostCodeGen --batch [-c CACHEDIR] [-s] [-d CHARS] [-j JOBS] [-o OUTDIR] KERNELSXML[:TARGETFILE]...\n"
+			"       hostCodeGen --watch [-s] [-d CHARS] [-i SECONDS] [-o OUTDIR] XMLDIR..."
+		)
+	)
+	parser.add_argument("files", nargs="+", metavar="FILE", help="KERNELSXML (XML with descriptions of kernels) and TARGETFILE (output source code filename)")
+	parser.add_argument("-b", "--batch", action="store_true", help="generate several descriptors in parallel; each argument is a KERNELSXML (or a quoted glob of them) optionally followed by :TARGETFILE")
+	parser.add_argument("-w", "--watch", action="store_true", help="keep running, regenerating the host code of each descriptor whenever it changes; each argument is a directory of descriptors (or a quoted glob of them)")
+	parser.add_argument("-i", "--interval", type=float, default=0.5, help="seconds between checks for changes in watch mode (default: 0.5)")
+	parser.add_argument("--debounce", type=float, default=0.3, help="seconds a changed descriptor must be left unchanged before being regenerated in watch mode (default: 0.3)")
+	parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes in batch mode (default: number of cores)")
+	parser.add_argument("-c", "--cache", metavar="CACHEDIR", default=None, help="skip descriptors that did not change since they were last generated, keeping track of them in CACHEDIR")
+	parser.add_argument("-s", "--stream", action="store_true", help="parse descriptors incrementally and keep large inline data out of memory (for descriptors with huge datasets)")
+	parser.add_argument("-d", "--data-threshold", type=int, metavar="CHARS", default=None, help="move inline arrays with at least CHARS characters of data to a separate source beside TARGETFILE (e.g. host.c -> hostData.c), so that changing them does not rebuild the host code")
+	parser.add_argument("-t", "--timing", choices=("table", "json"), default=None, help="print elapsed time, bytes emitted and descriptor nodes visited by each section, as a table or JSON (single mode only)")
+	parser.add_argument("-o", "--outdir", default=".", help="directory of targets without explicit TARGETFILE in batch and watch modes, named after KERNELSXML (default: current directory)")
+	args = parser.parse_args()
+
+	# Options of CodeEmitter
+	options = {}
+	if args.stream:
+		options["streaming"] = True
+	if args.data_threshold is not None:
+		options["dataThreshold"] = args.data_threshold
+
+	if args.watch:
+		if args.batch or args.cache is not None or args.timing is not None:
+			parser.error("-w/--watch cannot be used with -b/--batch, -c/--cache or -t/--timing")
+
+		exit(watchAll(args.files, args.outdir, args.interval, args.debounce, options))
+
+	if args.batch:
+		if args.timing is not None:
+			parser.error("-t/--timing is not supported in batch mode")
+
+		exit(generateMany(args.files, args.outdir, args.jobs, args.cache, options))
+
+	if len(args.files) != 2:
+		parser.error("expected KERNELSXML TARGETFILE")
+
+	exit(generateSingle(args.files[0], args.files[1], args.cache, options, args.timing))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Instrumentation of Code Generation                                                        #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+
+import json
+
+
+# Writable object counting the bytes (UTF-8) written through it
+class CountingWriter:
+	__slots__ = ("_f", "count")
+
+
+	def __init__(self, f):
+		self._f = f
+		self.count = 0
+
+
+	def write(self, s):
+		self.count += len(s) if s.isascii() else len(s.encode())
+		return self._f.write(s)
+
+
+	# Return the wrapped writable object
+	def unwrap(self):
+		return self._f
+
+
+# List counting how many of its items are visited by iterations, in a counter shared by several lists
+class CountingList(list):
+	__slots__ = ("_counter",)
+
+
+	def __init__(self, items, counter):
+		super().__init__(items)
+		self._counter = counter
+
+
+	def __iter__(self):
+		for item in super().__iter__():
+			self._counter[0] += 1
+			yield item
+
+
+# Statistics of each section printed by CodeEmitter: elapsed time, bytes emitted and kernel description
+# nodes (<kernel>, <input>, <output> and <local>) visited
+class SectionStats:
+	_sections = []
+
+
+	def __init__(self):
+		self._sections = []
+
+
+	def add(self, section, elapsed, nBytes, nNodes):
+		self._sections.append({"section": section, "time": elapsed, "bytes": nBytes, "nodes": nNodes})
+
+
+	def total(self):
+		return {
+			"section": "total",
+			"time": sum(s["time"] for s in self._sections),
+			"bytes": sum(s["bytes"] for s in self._sections),
+			"nodes": sum(s["nodes"] for s in self._sections)
+		}
+
+
+	# Return statistics as a table, sections sorted by elapsed time if sort is True
+	def formatTable(self, sort=False):
+		sections = sorted(self._sections, key=lambda s: s["time"], reverse=True) if sort else self._sections
+		total = self.total()
+		lines = ["{:<28} {:>10} {:>6} {:>12} {:>8}".format("section", "time (ms)", "%", "bytes", "nodes")]
+
+		for s in sections + [total]:
+			lines.append("{:<28} {:>10.3f} {:>6.1f} {:>12} {:>8}".format(
+				s["section"], s["time"] * 1000, (100 * s["time"] / total["time"]) if total["time"] else 0,
+				s["bytes"], s["nodes"]
+			))
+
+		return "\n".join(lines)
+
+
+	def toJson(self):
+		return json.dumps({"sections": self._sections, "total": self.total()}, indent=1)
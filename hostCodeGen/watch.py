@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# #############################################################################################
+# # Watch Mode: Regeneration on Changes                                                       #
+# # Author: André Bannwart Perina                                                             #
+# #############################################################################################
+# # Copyright (c) 2017 André B. Perina                                                        #
+# #                                                                                           #
+# # Permission is hereby granted, free of charge, to any person obtaining a copy of this      #
+# # software and associated documentation files (the "Software"), to deal in the Software     #
+# # without restriction, including without limitation the rights to use, copy, modify,        #
+# # merge, publish, distribute, sublicense, and/or sell copies of the Software, and to        #
+# # permit persons to whom the Software is furnished to do so, subject to the following       #
+# # conditions:                                                                               #
+# #                                                                                           #
+# # The above copyright notice and this permission notice shall be included in all copies     #
+# # or substantial portions of the Software.                                                  #
+# #                                                                                           #
+# # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,       #
+# # INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR  #
+# # PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE #
+# # FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR      #
+# # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER    #
+# # DEALINGS IN THE SOFTWARE.                                                                 #
+# #############################################################################################
+
+
+
+import glob
+import os
+import time
+
+import descriptor
+from codeemitter import CodeEmitter
+
+
+# Keeps host codes up to date with descriptors matched by a set of patterns (directories are watched for
+# "*.xml"). Descriptors are polled for changes of mtime or size and, once a changed descriptor has been
+# stable for a debounce period, only its host code is regenerated. Models of all descriptors are kept in
+# memory, thus a deleted target is regenerated without parsing its descriptor again
+class Watcher:
+	_patterns = []
+	_outDir = "."
+	_options = {}
+	_debounce = 0.0
+	# Per descriptor: (signature, Descriptor or None if it could not be parsed)
+	_models = {}
+	# Per changed descriptor: (signature, time when it was first seen)
+	_pending = {}
+
+
+	def __init__(self, patterns, outDir=".", options=None, debounce=0.3):
+		self._patterns = [os.path.join(p, "*.xml") if os.path.isdir(p) else p for p in patterns]
+		self._outDir = outDir
+		self._options = options or {}
+		self._debounce = debounce
+		self._models = {}
+		self._pending = {}
+
+
+	# Target of a descriptor: "<outDir>/<basename of KERNELSXML>.c"
+	def targetFile(self, xmlFile):
+		stem = os.path.splitext(os.path.basename(xmlFile))[0]
+		return os.path.join(self._outDir, "{}.c".format(stem))
+
+
+	# Return {descriptor: signature} of all descriptors currently matched
+	def _scan(self):
+		signatures = {}
+
+		for pattern in self._patterns:
+			for xmlFile in glob.glob(pattern):
+				try:
+					st = os.stat(xmlFile)
+				except OSError:
+					continue
+				signatures[xmlFile] = (st.st_mtime_ns, st.st_size)
+
+		return signatures
+
+
+	# Generate host code of a descriptor from its model. Returns "generated" or "unchanged"
+	def _emit(self, d, xmlFile):
+		ce = CodeEmitter(d, self.targetFile(xmlFile), **self._options)
+		ce.printAll()
+		return "generated" if ce.writeTargetFile() else "unchanged"
+
+
+	# Check descriptors once, regenerating what is needed. Returns a list of (xmlFile, targetFile, elapsed
+	# seconds, status, error message or None), as batch.generate(), where status is "generated",
+	# "unchanged" or "restored" (target was missing and was regenerated from the model in memory)
+	def poll(self):
+		now = time.monotonic()
+		signatures = self._scan()
+		results = []
+
+		# Forget descriptors that are gone
+		for xmlFile in list(self._models):
+			if xmlFile not in signatures:
+				del self._models[xmlFile]
+		for xmlFile in list(self._pending):
+			if xmlFile not in signatures:
+				del self._pending[xmlFile]
+
+		for xmlFile, signature in sorted(signatures.items()):
+			known = self._models.get(xmlFile)
+
+			if known is not None and known[0] == signature:
+				# Unchanged descriptor, whose target was deleted
+				if known[1] is not None and not os.path.exists(self.targetFile(xmlFile)):
+					then = time.perf_counter()
+					try:
+						self._emit(known[1], xmlFile)
+						results.append((xmlFile, self.targetFile(xmlFile), time.perf_counter() - then, "restored", None))
+					except OSError as e:
+						results.append((xmlFile, self.targetFile(xmlFile), time.perf_counter() - then, None, str(e)))
+					except Exception as e:
+						results.append((xmlFile, self.targetFile(xmlFile), time.perf_counter() - then, None, "{}: {}".format(type(e).__name__, e)))
+
+				self._pending.pop(xmlFile, None)
+				continue
+
+			# A change must be seen unchanged by a later poll, at least debounce seconds after it was
+			# first seen (period restarts if descriptor changes again, e.g. during a burst of saves)
+			pending = self._pending.get(xmlFile)
+			if pending is None or pending[0] != signature:
+				self._pending[xmlFile] = (signature, now)
+				continue
+			if now - pending[1] < self._debounce:
+				continue
+
+			del self._pending[xmlFile]
+
+			then = time.perf_counter()
+			try:
+				d = descriptor.load(xmlFile, self._options.get("streaming", False))
+				self._models[xmlFile] = (signature, d)
+				status = self._emit(d, xmlFile)
+				results.append((xmlFile, self.targetFile(xmlFile), time.perf_counter() - then, status, None))
+			except (descriptor.DescriptorError, OSError) as e:
+				# Not retried until descriptor changes again
+				self._models[xmlFile] = (signature, None)
+				results.append((xmlFile, self.targetFile(xmlFile), time.perf_counter() - then, None, str(e)))
+			# Any other failure of generation is reported for this descriptor only, and watching goes on
+			except Exception as e:
+				self._models[xmlFile] = (signature, None)
+				results.append((xmlFile, self.targetFile(xmlFile), time.perf_counter() - then, None, "{}: {}".format(type(e).__name__, e)))
+
+		return results
+
+
+	# Poll forever, every interval seconds, calling report(result) for each result of poll()
+	def run(self, report, interval=0.5):
+		while True:
+			for result in self.poll():
+				report(result)
+
+			time.sleep(interval)